@@ -1,54 +1,101 @@
-import sys
 import os
+import time
+
+_IMPORT_STARTED = time.perf_counter()
 
 from dotenv import load_dotenv
 from flask import Flask
 from flask_cors import CORS
-from sqlalchemy import text
-from sqlalchemy.exc import OperationalError
 
+from app.analytics.jobs import maintenance_jobs
 from app.middleware.error_handlers import register_error_handlers
+from app.middleware.lazy_docs import LazyDocsMiddleware
+from app.utils.admission import init_admission
+from app.utils.enrichment import init_enrichment
+from app.utils.health import init_health
+from app.utils.idempotency import init_idempotency
+from app.utils.profiling import init_profiling
+from app.utils.rate_limit import init_rate_limiter
+from app.utils.result_cache import init_result_cache
+from app.utils.scheduler import init_scheduler
+from app.utils.shared_cache import init_shared_cache
+from app.utils.single_flight import init_single_flight
+from app.utils.startup import StartupTimer, dispose_engine_pools, probe_database
 
 from .models import db
-from .routes import auth_bp, dashboard_bp, health_check_bp, api_docs_bp
+from .routes import auth_bp, dashboard_bp, health_check_bp, metrics_bp
 
 load_dotenv()
 
 from .config import Config
 
+_IMPORT_SECONDS = time.perf_counter() - _IMPORT_STARTED
+
 
 def create_app():
+    timer = StartupTimer()
+    timer.record("imports", _IMPORT_SECONDS)
+
     app = Flask(__name__)
     app.config.from_object(Config)
 
-    db.init_app(app)
+    with timer.phase("db.init_app"):
+        db.init_app(app)
 
-    # Test DB connection at startup
-    try:
-        with app.app_context():
-            db.session.execute(text('SELECT 1'))
-    except OperationalError as e:
-        print(f"[FATAL] Database connection failed: {e}", file=sys.stderr)
-        sys.exit(1)
+    # Probe the database without holding on to the connection: under
+    # gunicorn --preload the app is created in the master, and any pooled
+    # connection would otherwise be shared by every forked worker.
+    with timer.phase("db.readiness_probe"):
+        db_ready = False
+        if app.config["DB_STARTUP_CHECK"]:
+            db_ready = probe_database(
+                app,
+                retries=app.config["DB_STARTUP_RETRIES"],
+                delay=app.config["DB_STARTUP_RETRY_DELAY"],
+            )
+            dispose_engine_pools(app)
 
     allowed_origins = os.getenv(
         "ALLOWED_ORIGINS", "http://localhost:3000,http://127.0.0.1:3000"
     ).split(",")
     # Filter out empty strings
     allowed_origins = [origin.strip() for origin in allowed_origins if origin.strip()]
-    CORS(
-        app,
-        origins=allowed_origins,
-        methods=['GET', 'POST', 'OPTIONS'],
-        supports_credentials=True,
-        allow_headers=['Content-Type', 'Authorization'],
-    )
+    with timer.phase("cors"):
+        CORS(
+            app,
+            origins=allowed_origins,
+            methods=['GET', 'POST', 'OPTIONS'],
+            supports_credentials=True,
+            allow_headers=['Content-Type', 'Authorization'],
+        )
 
     register_error_handlers(app)
+    init_health(app)
+    init_rate_limiter(app)
+    init_shared_cache(app)
+    init_result_cache(app)
+    init_single_flight(app)
+    init_idempotency(app)
+    init_enrichment(app)
+    init_scheduler(app, maintenance_jobs(app.config))
+
+    with timer.phase("blueprints"):
+        app.register_blueprint(auth_bp)
+        app.register_blueprint(dashboard_bp)
+        app.register_blueprint(health_check_bp)
+        app.register_blueprint(metrics_bp)
+    init_profiling(app)
+    init_admission(app)
+
+    if app.config["API_DOCS_ENABLED"]:
+        # Swagger docs are built on the first request that asks for them.
+        app.wsgi_app = LazyDocsMiddleware(app.wsgi_app)
 
-    app.register_blueprint(auth_bp)
-    app.register_blueprint(dashboard_bp)
-    app.register_blueprint(health_check_bp)
-    app.register_blueprint(api_docs_bp)
+    app.extensions["startup"] = {
+        "db_ready": db_ready,
+        "timings": timer.report(),
+        "total_ms": round(timer.total * 1000, 2),
+    }
+    app.logger.info(timer.format())
 
     return app
@@ -0,0 +1,3 @@
+"""
+Analytics package for incremental aggregates built from raw metrics.
+"""
@@ -0,0 +1,245 @@
+"""
+Daily active-user bitmaps.
+
+Each site's active users of a day are stored as one bitmap (bit n set = user n was
+active), maintained incrementally from user_login and page_view events.
+DAU/WAU/MAU, stickiness and retention are then plain OR/AND/popcount over a
+handful of in-memory integers instead of self-joins over raw events. User ids
+are dense serial integers, so an uncompressed bitmap is the compact form in
+memory; zlib keeps the stored blobs small.
+"""
+
+import threading
+import zlib
+from collections import defaultdict
+from datetime import timedelta
+
+from sqlalchemy import func, select, tuple_
+
+from app.models import DailyActiveUsers, Metric
+from app.utils.dimensions import dimensions
+
+from .watermarks import lock_watermark, settled_metric_id
+
+WATERMARK = "daily_active_users"
+ACTIVITY_EVENTS = ("user_login", "page_view")
+
+
+def encode_bitmap(bits):
+    raw = bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+    return zlib.compress(raw)
+
+
+def decode_bitmap(blob):
+    return int.from_bytes(zlib.decompress(blob), "little")
+
+
+def popcount(bits):
+    try:
+        return bits.bit_count()
+    except AttributeError:  # Python < 3.10
+        return bin(bits).count("1")
+
+
+def bitmap_from_ids(user_ids):
+    """
+    Bitmap with the bits of `user_ids` set, built in one bytearray: or-ing
+    1 << id into an int would copy the whole integer for every id.
+    """
+    if not user_ids:
+        return 0
+    raw = bytearray(max(user_ids) // 8 + 1)
+    for user_id in user_ids:
+        raw[user_id >> 3] |= 1 << (user_id & 7)
+    return int.from_bytes(raw, "little")
+
+
+def bitmap_size(bits):
+    return (bits.bit_length() + 7) // 8
+
+
+def refresh_daily_active_users(session, batch_size=50000):
+    """
+    Fold metrics rows added since the last run into each site's daily
+    bitmaps.
+    Each batch is committed with the watermark, so the refresh can be
+    interrupted and resumed. Returns the number of events processed.
+    """
+    event_type_ids = dimensions.ids("event_type", ACTIVITY_EVENTS).values()
+    up_to = settled_metric_id(session)
+    processed = 0
+    while True:
+        watermark = lock_watermark(session, WATERMARK)
+        rows = session.execute(
+            select(
+                Metric.id, Metric.site_id, func.date(Metric.timestamp), Metric.user_id
+            )
+            .where(
+                Metric.id > watermark.last_metric_id,
+                Metric.id <= up_to,
+                Metric.event_type_id.in_(event_type_ids),
+                Metric.user_id.isnot(None),
+            )
+            .order_by(Metric.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            watermark.last_metric_id = up_to
+            session.commit()
+            return processed
+
+        users_by_day = defaultdict(set)
+        for _, site_id, day, user_id in rows:
+            users_by_day[(site_id, day)].add(user_id)
+
+        existing = {
+            (row.site_id, row.day): row
+            for row in session.execute(
+                select(DailyActiveUsers)
+                .where(
+                    tuple_(DailyActiveUsers.site_id, DailyActiveUsers.day).in_(
+                        list(users_by_day)
+                    )
+                )
+                .with_for_update()
+            ).scalars()
+        }
+        for (site_id, day), user_ids in users_by_day.items():
+            new_bits = bitmap_from_ids(user_ids)
+            row = existing.get((site_id, day))
+            if row is None:
+                session.add(
+                    DailyActiveUsers(
+                        site_id=site_id,
+                        day=day,
+                        bitmap=encode_bitmap(new_bits),
+                        cardinality=popcount(new_bits),
+                        version=1,
+                    )
+                )
+                continue
+            bits = decode_bitmap(row.bitmap)
+            merged = bits | new_bits
+            if merged != bits:
+                row.bitmap = encode_bitmap(merged)
+                row.cardinality = popcount(merged)
+                row.version = row.version + 1
+
+        watermark.last_metric_id = rows[-1][0]
+        session.commit()
+        processed += len(rows)
+
+
+class ActivityBitmaps:
+    """
+    Per-process cache of decoded daily bitmaps, keyed by (site, day). Only
+    the (day, version) pairs are read on each query; blobs are loaded for
+    days that are new or have changed since they were cached. The cache is
+    bounded by the bitmaps' size, not their number, since a day of a large
+    site can take megabytes; the oldest days are evicted first.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._cache = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _store(self, key, version, bits):
+        previous = self._cache.pop(key, None)
+        if previous is not None:
+            self._bytes -= bitmap_size(previous[1])
+        self._cache[key] = (version, bits)
+        self._bytes += bitmap_size(bits)
+
+    def _evict(self):
+        if self._bytes <= self.max_bytes:
+            return
+        # Oldest days first, whichever site they belong to.
+        for key in sorted(self._cache, key=lambda key: key[1]):
+            self._bytes -= bitmap_size(self._cache.pop(key)[1])
+            if self._bytes <= self.max_bytes:
+                break
+
+    def load(self, session, site_id, start, end):
+        """
+        Return {day: bitmap} for every day in [start, end] on which the site
+        had activity.
+        """
+        versions = dict(
+            session.execute(
+                select(DailyActiveUsers.day, DailyActiveUsers.version).where(
+                    DailyActiveUsers.site_id == site_id,
+                    DailyActiveUsers.day.between(start, end),
+                )
+            ).all()
+        )
+        with self._lock:
+            days = {
+                day: self._cache[(site_id, day)][1]
+                for day, version in versions.items()
+                if self._cache.get((site_id, day), (None,))[0] == version
+            }
+        stale = [day for day in versions if day not in days]
+        if stale:
+            rows = session.execute(
+                select(
+                    DailyActiveUsers.day,
+                    DailyActiveUsers.version,
+                    DailyActiveUsers.bitmap,
+                ).where(
+                    DailyActiveUsers.site_id == site_id,
+                    DailyActiveUsers.day.in_(stale),
+                )
+            ).all()
+            with self._lock:
+                for day, version, blob in rows:
+                    days[day] = decode_bitmap(blob)
+                    self._store((site_id, day), version, days[day])
+                self._evict()
+        return days
+
+
+activity_bitmaps = ActivityBitmaps()
+
+
+def active_user_counts(session, site_id, day):
+    """
+    The site's DAU, WAU and MAU ending on `day`, plus stickiness (DAU / MAU).
+    """
+    days = activity_bitmaps.load(session, site_id, day - timedelta(days=29), day)
+    dau = popcount(days.get(day, 0))
+    wau_bits = mau_bits = 0
+    for d, bits in days.items():
+        mau_bits |= bits
+        if d > day - timedelta(days=7):
+            wau_bits |= bits
+    mau = popcount(mau_bits)
+    return {
+        "date": day.isoformat(),
+        "dau": dau,
+        "wau": popcount(wau_bits),
+        "mau": mau,
+        "stickiness": round(dau / mau, 4) if mau else 0,
+    }
+
+
+def retention_curve(session, site_id, day, days):
+    """
+    Of the users active on the site on `day`, how many were active again N
+    days later for N in 1..days.
+    """
+    bitmaps = activity_bitmaps.load(session, site_id, day, day + timedelta(days=days))
+    cohort = bitmaps.get(day, 0)
+    cohort_size = popcount(cohort)
+    curve = []
+    for n in range(1, days + 1):
+        retained = popcount(cohort & bitmaps.get(day + timedelta(days=n), 0))
+        curve.append(
+            {
+                "day": n,
+                "retained": retained,
+                "rate": round(retained / cohort_size, 4) if cohort_size else 0,
+            }
+        )
+    return {"date": day.isoformat(), "cohort_size": cohort_size, "retention": curve}
@@ -0,0 +1,269 @@
+"""
+Weekly cohort retention for the registration funnel.
+
+cohort_retention holds, for every site and (registration week, activity
+week) pair, the number of distinct users from that registration week who
+logged in to the site during the activity week. New events are folded in
+batch by batch: a login only counts if its (site, user, week) is new in
+user_activity_weeks, and a registration only if its (site, user) is new in
+user_registrations, so each batch is a few set-based statements rather than
+a scan of history, and a redelivered event is not counted twice.
+"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, text
+
+from app.models import CohortRetention, RegistrationCohort
+from app.utils.data_version import bump_data_version
+from app.utils.dimensions import dimensions
+
+from .retention import retention_cutoff
+from .watermarks import lock_watermark, settled_metric_id
+
+WATERMARK = "cohort_retention"
+
+REFRESH_BATCH_SQL = text(
+    """
+    WITH batch AS (
+        SELECT id, site_id, user_id, event_type_id,
+               date_trunc('week', timestamp)::date AS week
+        FROM metrics
+        WHERE id > :last_id AND id <= :up_to
+          AND event_type_id IN (:login_id, :registration_id)
+          AND user_id IS NOT NULL
+        ORDER BY id
+        LIMIT :batch_size
+    ),
+    new_pairs AS (
+        INSERT INTO user_activity_weeks (site_id, user_id, week)
+        SELECT DISTINCT site_id, user_id, week
+        FROM batch WHERE event_type_id = :login_id
+        ON CONFLICT DO NOTHING
+        RETURNING site_id, user_id, week
+    ),
+    cells AS (
+        INSERT INTO cohort_retention (site_id, cohort_week, activity_week, users)
+        SELECT p.site_id, date_trunc('week', u.created_at)::date, p.week, count(*)
+        FROM new_pairs p JOIN users u ON u.id = p.user_id
+        WHERE u.created_at IS NOT NULL
+        GROUP BY 1, 2, 3
+        ON CONFLICT (site_id, cohort_week, activity_week)
+        DO UPDATE SET users = cohort_retention.users + EXCLUDED.users
+    ),
+    new_registrations AS (
+        INSERT INTO user_registrations (site_id, user_id, cohort_week)
+        SELECT DISTINCT b.site_id, b.user_id, date_trunc('week', u.created_at)::date
+        FROM batch b JOIN users u ON u.id = b.user_id
+        WHERE b.event_type_id = :registration_id AND u.created_at IS NOT NULL
+        ON CONFLICT DO NOTHING
+        RETURNING site_id, cohort_week
+    ),
+    sizes AS (
+        INSERT INTO registration_cohorts (site_id, cohort_week, users)
+        SELECT site_id, cohort_week, count(*)
+        FROM new_registrations
+        GROUP BY 1, 2
+        ON CONFLICT (site_id, cohort_week)
+        DO UPDATE SET users = registration_cohorts.users + EXCLUDED.users
+    )
+    SELECT max(id) AS last_id, count(*) AS processed FROM batch
+    """
+)
+
+# The rebuild fills staging copies first and then replaces the live rows of
+# the rebuilt weeks in the same transaction: readers keep seeing the old rows
+# until it commits, and no ACCESS EXCLUSIVE lock (TRUNCATE) blocks them.
+REBUILD_STATEMENTS = [
+    """
+    CREATE TEMP TABLE staged_activity_weeks (LIKE user_activity_weeks)
+    ON COMMIT DROP
+    """,
+    """
+    CREATE TEMP TABLE staged_cohort_retention (LIKE cohort_retention)
+    ON COMMIT DROP
+    """,
+    """
+    CREATE TEMP TABLE staged_user_registrations (LIKE user_registrations)
+    ON COMMIT DROP
+    """,
+    """
+    CREATE TEMP TABLE staged_registration_cohorts (LIKE registration_cohorts)
+    ON COMMIT DROP
+    """,
+    """
+    INSERT INTO staged_activity_weeks (site_id, user_id, week)
+    SELECT DISTINCT site_id, user_id, date_trunc('week', timestamp)::date
+    FROM metrics
+    WHERE event_type_id = :login_id AND user_id IS NOT NULL
+      AND id <= :max_id AND timestamp >= :since
+    """,
+    """
+    INSERT INTO staged_cohort_retention (site_id, cohort_week, activity_week, users)
+    SELECT w.site_id, date_trunc('week', u.created_at)::date, w.week, count(*)
+    FROM staged_activity_weeks w JOIN users u ON u.id = w.user_id
+    WHERE u.created_at IS NOT NULL
+    GROUP BY 1, 2, 3
+    """,
+    """
+    INSERT INTO staged_user_registrations (site_id, user_id, cohort_week)
+    SELECT DISTINCT m.site_id, m.user_id, date_trunc('week', u.created_at)::date
+    FROM metrics m JOIN users u ON u.id = m.user_id
+    WHERE m.event_type_id = :registration_id AND u.created_at >= :since
+      AND m.id <= :max_id
+    """,
+    """
+    INSERT INTO staged_registration_cohorts (site_id, cohort_week, users)
+    SELECT site_id, cohort_week, count(*)
+    FROM staged_user_registrations
+    GROUP BY 1, 2
+    """,
+    "DELETE FROM user_activity_weeks WHERE week >= :since",
+    """
+    INSERT INTO user_activity_weeks (site_id, user_id, week)
+    SELECT site_id, user_id, week FROM staged_activity_weeks
+    """,
+    "DELETE FROM cohort_retention WHERE activity_week >= :since",
+    """
+    INSERT INTO cohort_retention (site_id, cohort_week, activity_week, users)
+    SELECT site_id, cohort_week, activity_week, users FROM staged_cohort_retention
+    """,
+    "DELETE FROM user_registrations WHERE cohort_week >= :since",
+    """
+    INSERT INTO user_registrations (site_id, user_id, cohort_week)
+    SELECT site_id, user_id, cohort_week FROM staged_user_registrations
+    """,
+    "DELETE FROM registration_cohorts WHERE cohort_week >= :since",
+    """
+    INSERT INTO registration_cohorts (site_id, cohort_week, users)
+    SELECT site_id, cohort_week, users FROM staged_registration_cohorts
+    """,
+]
+
+
+def _event_type_ids():
+    ids = dimensions.ids("event_type", ["user_login", "new_registration"])
+    return {"login_id": ids["user_login"], "registration_id": ids["new_registration"]}
+
+
+def refresh_cohorts(session, batch_size=50000):
+    """
+    Fold metrics rows added since the last run into the cohort tables.
+    Returns the number of events processed.
+    """
+    event_type_ids = _event_type_ids()
+    up_to = settled_metric_id(session)
+    processed = 0
+    while True:
+        watermark = lock_watermark(session, WATERMARK)
+        result = session.execute(
+            REFRESH_BATCH_SQL,
+            {
+                "last_id": watermark.last_metric_id,
+                "up_to": up_to,
+                "batch_size": batch_size,
+                **event_type_ids,
+            },
+        ).one()
+        if not result.processed:
+            watermark.last_metric_id = up_to
+            session.commit()
+            return processed
+        watermark.last_metric_id = result.last_id
+        session.commit()
+        processed += result.processed
+
+
+def rebuild_since(retention_days):
+    """
+    The first week the raw metrics still cover completely: the week of the
+    retention cutoff, or the next one when the cutoff falls inside it.
+    Older logins and registrations may only survive in the daily rollups,
+    which have no user ids, so weeks before it cannot be rebuilt.
+    """
+    cutoff = retention_cutoff(retention_days)
+    since = cutoff.date() - timedelta(days=cutoff.weekday())
+    if datetime.combine(since, datetime.min.time()) < cutoff:
+        since += timedelta(weeks=1)
+    return since
+
+
+def rebuild_cohorts(session, retention_days):
+    """
+    Recompute the cohort tables from raw metrics (backfill) for the weeks
+    from rebuild_since() on; earlier weeks are kept as they are. Folds new
+    rows first, then rebuilds up to the same id in one transaction holding
+    the watermark lock, so incremental refreshes wait for it and continue
+    from where it stopped. Returns (metrics.id rebuilt up to, first week).
+    """
+    refresh_cohorts(session)
+    watermark = lock_watermark(session, WATERMARK)
+    max_id = watermark.last_metric_id
+    since = rebuild_since(retention_days)
+    event_type_ids = _event_type_ids()
+    for statement in REBUILD_STATEMENTS:
+        session.execute(
+            text(statement), {"max_id": max_id, "since": since, **event_type_ids}
+        )
+    session.commit()
+    bump_data_version(session)
+    return max_id, since
+
+
+def cohort_table(session, site_id, weeks):
+    """
+    Retention on the site for its last `weeks` registration cohorts. Week 0
+    is the registration week itself.
+    """
+    latest = session.execute(
+        select(RegistrationCohort.cohort_week)
+        .where(RegistrationCohort.site_id == site_id)
+        .order_by(RegistrationCohort.cohort_week.desc())
+        .limit(1)
+    ).scalar()
+    if latest is None:
+        return []
+    first = latest - timedelta(weeks=weeks - 1)
+
+    sizes = dict(
+        session.execute(
+            select(RegistrationCohort.cohort_week, RegistrationCohort.users).where(
+                RegistrationCohort.site_id == site_id,
+                RegistrationCohort.cohort_week >= first,
+            )
+        ).all()
+    )
+    cells = session.execute(
+        select(
+            CohortRetention.cohort_week,
+            CohortRetention.activity_week,
+            CohortRetention.users,
+        )
+        .where(
+            CohortRetention.site_id == site_id,
+            CohortRetention.cohort_week >= first,
+            CohortRetention.activity_week >= CohortRetention.cohort_week,
+        )
+        .order_by(CohortRetention.cohort_week, CohortRetention.activity_week)
+    ).all()
+
+    by_cohort = {week: [] for week in sorted(sizes)}
+    for cohort_week, activity_week, users in cells:
+        if cohort_week not in by_cohort:
+            continue
+        size = sizes[cohort_week]
+        by_cohort[cohort_week].append(
+            {
+                "week": (activity_week - cohort_week).days // 7,
+                "users": users,
+                "rate": round(users / size, 4) if size else 0,
+            }
+        )
+    return [
+        {
+            "cohort_week": cohort_week.isoformat(),
+            "size": sizes[cohort_week],
+            "retention": retention,
+        }
+        for cohort_week, retention in by_cohort.items()
+    ]
@@ -0,0 +1,354 @@
+"""
+Distributions of Metric.value (e.g. page load times) from hourly DDSketches.
+
+A DDSketch (Masson et al., "DDSketch: A Fast and Fully-Mergeable Quantile
+Sketch with Relative-Error Guarantees") puts every value v > 0 into the
+logarithmic bucket ceil(log_gamma(v)), gamma = (1 + a) / (1 - a). Any
+quantile it reports is within a relative error `a` of a true value at that
+rank, and merging two sketches is adding bucket counts, so the result is
+exactly what one sketch over both inputs would give. One sketch is kept per
+site, hour and (event type, device, location); a query merges the hours in
+range.
+"""
+
+import math
+import struct
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, select, tuple_
+
+from app.models import Metric, ValueSketch
+from app.utils.dimensions import dimensions
+
+from .watermarks import lock_watermark, settled_metric_id
+
+WATERMARK = "value_sketches"
+RELATIVE_ACCURACY = 0.01
+MAX_BUCKETS = 2048
+# Values closer to zero than this are counted in the zero bucket.
+MIN_INDEXABLE = 1e-9
+QUANTILES = {"p50": 0.5, "p90": 0.9, "p99": 0.99}
+# Stored in value_sketches.device_id / location_id for "not set".
+UNKNOWN = 0
+
+_FORMAT_VERSION = 1
+_STATS = struct.Struct("<Bddd")  # version, min, max, sum
+
+
+def _write_varint(out, value):
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, offset):
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def _zigzag(value):
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def _unzigzag(value):
+    return value >> 1 if not value & 1 else -(value >> 1) - 1
+
+
+class DDSketch:
+    """
+    Relative-error quantile sketch over integer bucket counts.
+    """
+
+    def __init__(self, relative_accuracy=RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positive = defaultdict(int)  # bucket key -> count
+        self.negative = defaultdict(int)  # keys of -value
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _key(self, value):
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def _value(self, key):
+        # Midpoint (in relative terms) of (gamma^(key-1), gamma^key].
+        return 2 * self.gamma**key / (self.gamma + 1)
+
+    def add(self, value):
+        if value > MIN_INDEXABLE:
+            self.positive[self._key(value)] += 1
+        elif value < -MIN_INDEXABLE:
+            self.negative[self._key(-value)] += 1
+        else:
+            self.zero_count += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self.positive) > MAX_BUCKETS:
+            self._collapse(self.positive)
+
+    @staticmethod
+    def _collapse(store):
+        """
+        Fold the lowest buckets into one so the sketch stays bounded; only
+        the smallest values lose accuracy.
+        """
+        keys = sorted(store)
+        excess = keys[: len(keys) - MAX_BUCKETS + 1]
+        target = keys[len(excess)]
+        for key in excess:
+            store[target] += store.pop(key)
+
+    def merge(self, other):
+        for key, count in other.positive.items():
+            self.positive[key] += count
+        for key, count in other.negative.items():
+            self.negative[key] += count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        if len(self.positive) > MAX_BUCKETS:
+            self._collapse(self.positive)
+        return self
+
+    def quantile(self, q):
+        """
+        Estimate of the value at rank q * (count - 1), or None if empty.
+        """
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        # Negative values from the most negative up, then zero, then positive.
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return max(-self._value(key), self.min)
+        seen += self.zero_count
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return min(self._value(key), self.max)
+        return self.max
+
+    def histogram(self, bins):
+        """
+        Counts in up to `bins` log-spaced buckets over the positive values,
+        plus one bucket for values <= 0 if there are any.
+        """
+        buckets = []
+        non_positive = self.zero_count + sum(self.negative.values())
+        if non_positive:
+            buckets.append({"lower": self.min, "upper": 0.0, "count": non_positive})
+        if self.positive:
+            low, high = min(self.positive), max(self.positive)
+            width = max(1, math.ceil((high - low + 1) / bins))
+            grouped = defaultdict(int)
+            for key, count in self.positive.items():
+                grouped[(key - low) // width] += count
+            for group in sorted(grouped):
+                first = low + group * width
+                buckets.append(
+                    {
+                        "lower": max(self.gamma ** (first - 1), self.min),
+                        "upper": min(self.gamma ** (first + width - 1), self.max),
+                        "count": grouped[group],
+                    }
+                )
+        return buckets
+
+    def summary(self, bins=20):
+        empty = not self.count
+        return {
+            "count": self.count,
+            "mean": None if empty else self.sum / self.count,
+            "min": None if empty else self.min,
+            "max": None if empty else self.max,
+            **{name: self.quantile(q) for name, q in QUANTILES.items()},
+            "relative_accuracy": self.relative_accuracy,
+            "histogram": self.histogram(bins),
+        }
+
+    def to_bytes(self):
+        """
+        Compact encoding: summary stats, then each store as varint bucket
+        count followed by (zigzag key delta, count) varint pairs.
+        """
+        out = bytearray(_STATS.pack(_FORMAT_VERSION, self.min, self.max, self.sum))
+        _write_varint(out, self.zero_count)
+        for store in (self.negative, self.positive):
+            _write_varint(out, len(store))
+            previous = 0
+            for key in sorted(store):
+                _write_varint(out, _zigzag(key - previous))
+                _write_varint(out, store[key])
+                previous = key
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data, relative_accuracy=RELATIVE_ACCURACY):
+        sketch = cls(relative_accuracy)
+        version, sketch.min, sketch.max, sketch.sum = _STATS.unpack_from(data, 0)
+        if version != _FORMAT_VERSION:
+            raise ValueError(f"Unknown sketch format {version}")
+        sketch.zero_count, offset = _read_varint(data, _STATS.size)
+        for store in (sketch.negative, sketch.positive):
+            buckets, offset = _read_varint(data, offset)
+            key = 0
+            for _ in range(buckets):
+                delta, offset = _read_varint(data, offset)
+                key += _unzigzag(delta)
+                store[key], offset = _read_varint(data, offset)
+        sketch.count = (
+            sketch.zero_count
+            + sum(sketch.negative.values())
+            + sum(sketch.positive.values())
+        )
+        return sketch
+
+
+def refresh_value_sketches(session, batch_size=50000):
+    """
+    Fold metrics rows added since the last run into each site's hourly
+    sketches. Returns the number of events processed.
+    """
+    up_to = settled_metric_id(session)
+    processed = 0
+    hour = func.date_trunc("hour", Metric.timestamp)
+    while True:
+        watermark = lock_watermark(session, WATERMARK)
+        rows = session.execute(
+            select(
+                Metric.id,
+                Metric.site_id,
+                hour,
+                Metric.event_type_id,
+                func.coalesce(Metric.device_id, UNKNOWN),
+                func.coalesce(Metric.location_id, UNKNOWN),
+                Metric.value,
+            )
+            .where(
+                Metric.id > watermark.last_metric_id,
+                Metric.id <= up_to,
+                Metric.value.isnot(None),
+            )
+            .order_by(Metric.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            watermark.last_metric_id = up_to
+            session.commit()
+            return processed
+
+        batch = defaultdict(DDSketch)
+        for _, *group, value in rows:
+            batch[tuple(group)].add(value)
+
+        existing = {
+            (
+                row.site_id,
+                row.hour,
+                row.event_type_id,
+                row.device_id,
+                row.location_id,
+            ): row
+            for row in session.execute(
+                select(ValueSketch)
+                .where(
+                    tuple_(ValueSketch.site_id, ValueSketch.hour).in_(
+                        list({group[:2] for group in batch})
+                    )
+                )
+                .with_for_update()
+            ).scalars()
+        }
+        for group, sketch in batch.items():
+            row = existing.get(group)
+            if row is None:
+                site_id, hour_start, event_type_id, device_id, location_id = group
+                session.add(
+                    ValueSketch(
+                        site_id=site_id,
+                        hour=hour_start,
+                        event_type_id=event_type_id,
+                        device_id=device_id,
+                        location_id=location_id,
+                        count=sketch.count,
+                        sketch=sketch.to_bytes(),
+                    )
+                )
+                continue
+            merged = DDSketch.from_bytes(row.sketch).merge(sketch)
+            row.sketch = merged.to_bytes()
+            row.count = merged.count
+
+        watermark.last_metric_id = rows[-1][0]
+        session.commit()
+        processed += len(rows)
+
+
+def hour_range(start=None, end=None, default_hours=7 * 24):
+    """
+    [start, end) widened to whole hours, as naive UTC. `end` defaults to the
+    end of the current hour and `start` to `default_hours` before it.
+    """
+
+    def naive(value):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+    end = naive(end or datetime.now(timezone.utc))
+    floored_end = end.replace(minute=0, second=0, microsecond=0)
+    end = floored_end if floored_end == end else floored_end + timedelta(hours=1)
+    if start is None:
+        start = end - timedelta(hours=default_hours)
+    start = naive(start).replace(minute=0, second=0, microsecond=0)
+    return start, end
+
+
+def merged_sketch(
+    session, site_id, event_type, start, end, device=None, location=None
+):
+    """
+    One sketch for the site's `event_type` over [start, end) (whole hours),
+    optionally restricted to a device and/or location name.
+    """
+    conditions = [
+        ValueSketch.site_id == site_id,
+        ValueSketch.hour >= start,
+        ValueSketch.hour < end,
+    ]
+    for kind, name, column in (
+        ("event_type", event_type, ValueSketch.event_type_id),
+        ("device", device, ValueSketch.device_id),
+        ("location", location, ValueSketch.location_id),
+    ):
+        if name is None:
+            continue
+        value_id = dimensions.id(kind, name)
+        if value_id is None:
+            return DDSketch()
+        conditions.append(column == value_id)
+
+    merged = DDSketch()
+    for (blob,) in session.execute(select(ValueSketch.sketch).where(*conditions)):
+        merged.merge(DDSketch.from_bytes(blob))
+    return merged
@@ -0,0 +1,80 @@
+"""
+Maintenance jobs run by the in-process scheduler (app.utils.scheduler).
+"""
+
+from flask import current_app
+
+from app.models import db
+from app.routes.dashboard import warm_dashboard_results
+from app.utils.data_version import bump_data_version
+from app.utils.scheduler import Cron, Interval, Job
+
+from . import activity, cohorts, distributions, local_time, sketches
+from .retention import apply_retention
+
+# (name, watermark, refresh) for every incremental aggregate. Retention only
+# deletes raw rows all of these watermarks have passed.
+REFRESHERS = [
+    (
+        "daily active users",
+        activity.WATERMARK,
+        activity.refresh_daily_active_users,
+    ),
+    ("cohort retention", cohorts.WATERMARK, cohorts.refresh_cohorts),
+    ("property top-k sketches", sketches.WATERMARK, sketches.refresh_property_top_k),
+    ("value sketches", distributions.WATERMARK, distributions.refresh_value_sketches),
+    ("quarter-hour counts", local_time.WATERMARK, local_time.refresh_quarter_hours),
+]
+REFRESHED_WATERMARKS = [watermark for _, watermark, _ in REFRESHERS]
+
+
+def refresh_aggregates_job():
+    changed = False
+    for name, _, refresh in REFRESHERS:
+        processed = refresh(db.session)
+        changed = changed or bool(processed)
+        current_app.logger.info("Refreshed %s: %s events", name, processed)
+    if changed:
+        bump_data_version(db.session)
+
+
+def apply_retention_job():
+    config = current_app.config
+    deleted, elapsed = apply_retention(
+        db.session,
+        config["METRICS_RETENTION_DAYS"],
+        REFRESHED_WATERMARKS,
+        batch_size=config["RETENTION_BATCH_SIZE"],
+        sleep=config["RETENTION_BATCH_SLEEP"],
+        progress=current_app.logger.info,
+    )
+    current_app.logger.info("Retention removed %s rows in %.1fs", deleted, elapsed)
+
+
+def maintenance_jobs(config):
+    """
+    The job list, with schedules from config.
+    """
+    return [
+        Job(
+            "refresh_aggregates",
+            refresh_aggregates_job,
+            Interval(config["SCHEDULE_REFRESH_AGGREGATES_SECONDS"]),
+            timeout=config["SCHEDULE_REFRESH_AGGREGATES_SECONDS"] * 0.8,
+            jitter=10,
+        ),
+        Job(
+            "warm_dashboard_cache",
+            warm_dashboard_results,
+            Interval(config["SCHEDULE_WARM_CACHE_SECONDS"]),
+            timeout=config["SCHEDULE_WARM_CACHE_SECONDS"] * 0.8,
+            jitter=10,
+        ),
+        Job(
+            "apply_retention",
+            apply_retention_job,
+            Cron(config["SCHEDULE_RETENTION_CRON"]),
+            timeout=3600,
+            jitter=60,
+        ),
+    ]
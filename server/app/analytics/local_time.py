@@ -0,0 +1,283 @@
+"""
+Local-time days and months from quarter-hour aggregates.
+
+Dashboard periods are UTC unless a request passes `tz`. In another zone a
+day or month starts at a different UTC time, is an hour longer or shorter
+across DST changes, and in zones such as Asia/Kolkata (+05:30) or
+Asia/Kathmandu (+05:45) does not start on the hour, so hourly aggregates
+cannot be re-bucketed exactly. Every UTC offset in use today is a whole
+number of quarter hours, so events are counted per 15-minute UTC bucket
+(metric_quarter_hours, folded in incrementally like the other aggregates)
+and a local period is an exact run of buckets:
+
+- the UTC boundaries of the periods come from zoneinfo (period_boundaries),
+- Postgres assigns buckets to periods with width_bucket() over those
+  boundaries, reading at most 96 rows per day and dimension combination,
+- rows not folded in yet (above the watermark) are counted from metrics.
+
+Values for periods that ended more than CLOSED_AFTER ago are cached per site
+and zone in the shared cache. They only change when an event that old arrives; the
+refresh bumps the closed_period_revision sequence when it folds one in, and
+the revision is part of the cache key.
+"""
+
+import json
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from sqlalchemy import func, select, text
+
+from app.models import AggregationWatermark, MetricQuarterHour
+from app.utils.shared_cache import cache_get_json, cache_set_json
+
+from .watermarks import lock_watermark, settled_metric_id
+
+WATERMARK = "quarter_hours"
+REVISION_SEQUENCE = "closed_period_revision"
+CLOSED_AFTER = timedelta(days=1)
+# Stored in metric_quarter_hours.device_id / location_id for "not set".
+UNKNOWN = 0
+
+REFRESH_BATCH_SQL = text(
+    """
+    WITH batch AS (
+        SELECT id, site_id, timestamp, event_type_id, device_id, location_id
+        FROM metrics
+        WHERE id > :last_id AND id <= :up_to
+        ORDER BY id
+        LIMIT :batch_size
+    ),
+    folded AS (
+        INSERT INTO metric_quarter_hours
+            (site_id, bucket, event_type_id, device_id, location_id, events)
+        SELECT site_id, date_bin('15 minutes', timestamp, TIMESTAMP '2000-01-01'),
+               event_type_id, coalesce(device_id, 0), coalesce(location_id, 0),
+               count(*)
+        FROM batch
+        GROUP BY 1, 2, 3, 4, 5
+        ON CONFLICT (site_id, bucket, event_type_id, device_id, location_id)
+        DO UPDATE
+        SET events = metric_quarter_hours.events + EXCLUDED.events
+    )
+    SELECT max(id) AS last_id, count(*) AS processed,
+           coalesce(bool_or(timestamp < :closed_before), false) AS late
+    FROM batch
+    """
+)
+
+FOLDED_COUNTS_SQL = """
+SELECT width_bucket(bucket, CAST(:boundaries AS timestamp[])) AS period{columns},
+       sum(events) AS events
+FROM metric_quarter_hours
+WHERE site_id = :site_id
+  AND event_type_id = :event_type_id
+  AND bucket >= :start AND bucket < :end
+GROUP BY 1{group_by}
+UNION ALL
+SELECT width_bucket(timestamp, CAST(:boundaries AS timestamp[])){columns},
+       count(*)
+FROM metrics
+WHERE id > :folded_up_to
+  AND site_id = :site_id
+  AND event_type_id = :event_type_id
+  AND timestamp >= :start AND timestamp < :end
+GROUP BY 1{group_by}
+"""
+
+# Property filters are not kept in the buckets.
+RAW_COUNTS_SQL = """
+SELECT width_bucket(timestamp, CAST(:boundaries AS timestamp[])) AS period{columns},
+       count(*) AS events
+FROM metrics
+WHERE site_id = :site_id
+  AND event_type_id = :event_type_id
+  AND timestamp >= :start AND timestamp < :end
+  AND properties @> CAST(:properties AS jsonb)
+GROUP BY 1{group_by}
+"""
+
+ROLLED_UP_COUNTS_SQL = text(
+    """
+    SELECT width_bucket(day::timestamp, CAST(:boundaries AS timestamp[])) AS period,
+           sum(events) AS events
+    FROM metric_daily_rollups
+    WHERE site_id = :site_id
+      AND event_type = :event_type
+      AND day >= :start AND day < :end AND day < :buckets_start
+    GROUP BY 1
+    """
+)
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def refresh_quarter_hours(session, batch_size=50000):
+    """
+    Fold metrics rows added since the last run into the quarter-hour
+    buckets. Each batch is committed with the watermark. Returns the number
+    of events processed.
+    """
+    up_to = settled_metric_id(session)
+    processed = 0
+    late = False
+    while True:
+        watermark = lock_watermark(session, WATERMARK)
+        result = session.execute(
+            REFRESH_BATCH_SQL,
+            {
+                "last_id": watermark.last_metric_id,
+                "up_to": up_to,
+                "batch_size": batch_size,
+                "closed_before": _utcnow() - CLOSED_AFTER,
+            },
+        ).one()
+        if not result.processed:
+            watermark.last_metric_id = up_to
+            session.commit()
+            break
+        watermark.last_metric_id = result.last_id
+        session.commit()
+        processed += result.processed
+        late = late or result.late
+
+    if late:
+        # After the commit, so a reader cannot cache the old counts under the
+        # new revision.
+        session.execute(text(f"SELECT nextval('{REVISION_SEQUENCE}')"))
+        session.commit()
+    return processed
+
+
+def local_midnight(day, zone):
+    """
+    The naive-UTC instant `day` begins in `zone`. Where a DST change skips
+    midnight the day begins at the first local time after the gap, and
+    where midnight repeats, at its first occurrence (zoneinfo's fold=0).
+    """
+    start = datetime(day.year, day.month, day.day, tzinfo=zone)
+    return start.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def period_boundaries(zone, starts, end):
+    """
+    UTC boundaries of consecutive local periods beginning on the dates
+    `starts`, the last one ending on the date `end`. Raises ValueError when
+    one is not on a quarter hour (only historical local mean time offsets).
+    """
+    boundaries = [local_midnight(day, zone) for day in [*starts, end]]
+    for boundary in boundaries:
+        if boundary.minute % 15 or boundary.second or boundary.microsecond:
+            raise ValueError(f"{zone.key} is not on a quarter-hour offset")
+    return boundaries
+
+
+def _folded_up_to(session):
+    return (
+        session.execute(
+            select(AggregationWatermark.last_metric_id).where(
+                AggregationWatermark.name == WATERMARK
+            )
+        ).scalar()
+        or 0
+    )
+
+
+def local_period_counts(
+    session, site_id, event_type_id, boundaries, dimensions=(), properties=None
+):
+    """
+    The site's events of `event_type_id` in each period [boundaries[i], boundaries[i+1])
+    as {(i, *dimension ids): count}, split by the `dimensions` columns
+    (device_id, location_id; UNKNOWN where not set). Unfiltered counts come
+    from the buckets plus the rows not folded in yet, property-filtered ones
+    from the raw rows.
+    """
+    columns = "".join(f", coalesce({column}, {UNKNOWN})" for column in dimensions)
+    group_by = "".join(f", {position}" for position in range(2, len(dimensions) + 2))
+    params = {
+        "site_id": site_id,
+        "event_type_id": event_type_id,
+        "boundaries": boundaries,
+        "start": boundaries[0],
+        "end": boundaries[-1],
+    }
+    if properties:
+        sql = RAW_COUNTS_SQL
+        params["properties"] = json.dumps(properties)
+    else:
+        sql = FOLDED_COUNTS_SQL
+        params["folded_up_to"] = _folded_up_to(session)
+
+    counts = defaultdict(int)
+    rows = session.execute(text(sql.format(columns=columns, group_by=group_by)), params)
+    for period, *ids, events in rows:
+        # width_bucket numbers the periods from 1.
+        counts[(period - 1, *ids)] += int(events)
+    return counts
+
+
+def rolled_up_period_counts(session, site_id, event_type, boundaries):
+    """
+    The site's events of `event_type` per period from metric_daily_rollups, for the
+    days before the buckets begin (raw rows removed by retention before the
+    buckets existed), as {(i,): count}. Rollups are per UTC day, so each
+    such day counts in the period its UTC midnight falls in.
+    """
+    buckets_start = session.execute(
+        select(func.min(MetricQuarterHour.bucket)).where(
+            MetricQuarterHour.site_id == site_id
+        )
+    ).scalar()
+    rows = session.execute(
+        ROLLED_UP_COUNTS_SQL,
+        {
+            "site_id": site_id,
+            "event_type": event_type,
+            "boundaries": boundaries,
+            "start": boundaries[0],
+            "end": boundaries[-1],
+            "buckets_start": (buckets_start or boundaries[-1]).date(),
+        },
+    )
+    return {(row.period - 1,): int(row.events) for row in rows}
+
+
+def closed_period_revision(session):
+    return session.execute(text(f"SELECT last_value FROM {REVISION_SEQUENCE}")).scalar()
+
+
+def cached_periods(session, site_id, name, zone, boundaries, compute):
+    """
+    One value per period [boundaries[i], boundaries[i + 1]). Values of
+    periods that ended more than CLOSED_AFTER ago are cached per site,
+    `zone` and `name` (which identifies the query); `compute(boundaries)` is called
+    once, over the span of the remaining periods, and returns a list of
+    JSON-serialisable values, one per period.
+    """
+    revision = closed_period_revision(session)
+    closed_before = _utcnow() - CLOSED_AFTER
+    keys = [
+        (
+            f"local_periods:{revision}:{site_id}:{zone.key}:{name}:"
+            f"{start.isoformat()}/{end.isoformat()}"
+            if end <= closed_before
+            else None
+        )
+        for start, end in zip(boundaries, boundaries[1:])
+    ]
+    values = [cache_get_json(key) if key else None for key in keys]
+    missing = [i for i, value in enumerate(values) if value is None]
+    if not missing:
+        return values
+
+    first, last = missing[0], missing[-1]
+    ttl = current_app.config["CLOSED_PERIOD_CACHE_TTL"]
+    for i, value in enumerate(compute(boundaries[first : last + 2]), first):
+        if values[i] is None:
+            values[i] = value
+            if keys[i]:
+                cache_set_json(keys[i], value, ex=ttl)
+    return values
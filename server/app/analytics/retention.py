@@ -0,0 +1,140 @@
+"""
+Retention policy for raw metrics.
+
+Raw rows older than the retention window are downsampled into per-site
+metric_daily_rollups and deleted in the same statement, in small batches
+walked in id order. Every batch is its own short transaction, so ingest and
+dashboard reads keep running, and the keyset position is saved after each
+batch so an interrupted run resumes where it stopped.
+"""
+
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, text
+
+from app.models import AggregationWatermark
+from app.utils.data_version import bump_data_version
+
+from .watermarks import lock_watermark
+
+WATERMARK = "retention"
+
+DELETE_BATCH_SQL = text(
+    """
+    WITH doomed AS (
+        DELETE FROM metrics
+        WHERE id IN (
+            SELECT id FROM metrics
+            WHERE id > :last_id AND id <= :max_id AND timestamp < :cutoff
+            ORDER BY id
+            LIMIT :batch_size
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING id, site_id, timestamp, event_type_id, device_id, location_id,
+                  value
+    ),
+    rolled_up AS (
+        INSERT INTO metric_daily_rollups
+            (site_id, day, event_type, device, location, events, value_sum)
+        SELECT d.site_id, d.timestamp::date, e.name, coalesce(dv.name, ''),
+               coalesce(l.name, ''), count(*), coalesce(sum(d.value), 0)
+        FROM doomed d
+        JOIN event_types e ON e.id = d.event_type_id
+        LEFT JOIN devices dv ON dv.id = d.device_id
+        LEFT JOIN locations l ON l.id = d.location_id
+        GROUP BY 1, 2, 3, 4, 5
+        ON CONFLICT (site_id, day, event_type, device, location) DO UPDATE
+        SET events = metric_daily_rollups.events + EXCLUDED.events,
+            value_sum = metric_daily_rollups.value_sum + EXCLUDED.value_sum
+    )
+    SELECT max(id) AS last_id, count(*) AS deleted FROM doomed
+    """
+)
+
+
+def retention_cutoff(days):
+    """
+    The naive-UTC timestamp before which raw rows are removed.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    return cutoff.replace(tzinfo=None)
+
+
+def aggregated_up_to(session, watermarks):
+    """
+    Highest metrics.id folded into every aggregate in `watermarks`, or None
+    when one of them has never run. Rows above it are never deleted, so no
+    aggregate misses events.
+    """
+    positions = dict(
+        session.execute(
+            select(
+                AggregationWatermark.name, AggregationWatermark.last_metric_id
+            ).where(AggregationWatermark.name.in_(watermarks))
+        ).all()
+    )
+    if set(positions) != set(watermarks):
+        return None
+    return min(positions.values())
+
+
+def apply_retention(
+    session,
+    days,
+    watermarks,
+    batch_size=5000,
+    sleep=0.05,
+    lock_timeout_ms=2000,
+    max_batches=None,
+    progress=print,
+):
+    """
+    Downsample and delete raw metrics older than `days` days that every
+    incremental aggregate (`watermarks`, see jobs.REFRESHERS) has folded.
+    Deletes nothing while one of them has never run. Returns (rows deleted,
+    seconds elapsed).
+    """
+    cutoff = retention_cutoff(days)
+    max_id = aggregated_up_to(session, watermarks)
+    session.commit()
+    if max_id is None:
+        progress("Not deleting: an incremental aggregate has never been refreshed")
+        return 0, 0.0
+
+    deleted = batches = 0
+    started = time.perf_counter()
+    while max_batches is None or batches < max_batches:
+        watermark = lock_watermark(session, WATERMARK)
+        session.execute(text(f"SET LOCAL lock_timeout = {int(lock_timeout_ms)}"))
+        result = session.execute(
+            DELETE_BATCH_SQL,
+            {
+                "last_id": watermark.last_metric_id,
+                "max_id": max_id,
+                "cutoff": cutoff,
+                "batch_size": batch_size,
+            },
+        ).one()
+        if not result.deleted:
+            # Finished: the next run starts from the beginning with its own cutoff.
+            watermark.last_metric_id = 0
+            session.commit()
+            break
+        watermark.last_metric_id = result.last_id
+        session.commit()
+
+        deleted += result.deleted
+        batches += 1
+        if batches % 20 == 0:
+            elapsed = time.perf_counter() - started
+            progress(
+                f"Deleted {deleted} rows in {batches} batches "
+                f"({deleted / elapsed:.0f} rows/s, at id {result.last_id})"
+            )
+        if sleep:
+            time.sleep(sleep)
+
+    if deleted:
+        bump_data_version(session)
+    return deleted, time.perf_counter() - started
@@ -0,0 +1,206 @@
+"""
+Top-N property values from per-day Space-Saving sketches.
+
+A Space-Saving summary keeps at most `capacity` counters. Each reported count
+overestimates the true count by at most its `error`, and any value whose true
+frequency exceeds total / capacity is guaranteed to be tracked. Daily
+summaries are mergeable, so "top 20 pages over 30 days" reads 30 small JSON
+documents instead of grouping millions of raw rows.
+"""
+
+from collections import Counter, defaultdict
+
+from sqlalchemy import func, select, tuple_
+
+from app.models import Metric, PropertyTopK
+from app.models.metric import INDEXED_PROPERTY_KEYS
+
+from .watermarks import lock_watermark, settled_metric_id
+
+WATERMARK = "property_top_k"
+SKETCH_CAPACITY = 200
+
+
+class SpaceSaving:
+    """
+    Space-Saving heavy-hitter summary with merge support.
+    """
+
+    def __init__(self, capacity=SKETCH_CAPACITY, counters=None, total=0):
+        self.capacity = capacity
+        # value -> [count, error]
+        self.counters = counters or {}
+        self.total = total
+
+    def add(self, value, count=1):
+        self.total += count
+        entry = self.counters.get(value)
+        if entry is not None:
+            entry[0] += count
+            return
+        if len(self.counters) < self.capacity:
+            self.counters[value] = [count, 0]
+            return
+        # Replace the smallest counter; the newcomer inherits its count as
+        # the maximum possible overestimate.
+        victim = min(self.counters, key=lambda v: self.counters[v][0])
+        floor = self.counters.pop(victim)[0]
+        self.counters[value] = [floor + count, floor]
+
+    def _floor(self):
+        if len(self.counters) < self.capacity:
+            return 0
+        return min(count for count, _ in self.counters.values())
+
+    def merge(self, other):
+        """
+        Merge another summary into this one (Agarwal et al., "Mergeable
+        Summaries"): a value missing from one side may have been counted up
+        to that side's smallest counter, which is added to its error.
+        """
+        own_floor, other_floor = self._floor(), other._floor()
+        merged = {}
+        for value in self.counters.keys() | other.counters.keys():
+            count, error = self.counters.get(value, (own_floor, own_floor))
+            other_count, other_error = other.counters.get(
+                value, (other_floor, other_floor)
+            )
+            merged[value] = [count + other_count, error + other_error]
+        top = sorted(merged.items(), key=lambda item: item[1][0], reverse=True)
+        self.counters = dict(top[: self.capacity])
+        self.total += other.total
+        return self
+
+    def top(self, n):
+        """
+        The n most frequent values. `guaranteed` is set when the value's
+        lower bound beats the upper bound of everything ranked after it.
+        """
+        ranked = sorted(self.counters.items(), key=lambda i: i[1][0], reverse=True)
+        next_upper = ranked[n][1][0] if len(ranked) > n else self._floor()
+        return [
+            {
+                "value": value,
+                "count": count,
+                "error": error,
+                "guaranteed": count - error >= next_upper,
+            }
+            for value, (count, error) in ranked[:n]
+        ]
+
+    def to_json(self):
+        return [
+            [value, count, error] for value, (count, error) in self.counters.items()
+        ]
+
+    @classmethod
+    def from_counts(cls, counts, capacity=SKETCH_CAPACITY):
+        """
+        Build a summary from exact counts, keeping the `capacity` largest.
+        Dropped values are no larger than the smallest kept count, which is
+        exactly the bound a full Space-Saving summary gives for them.
+        """
+        top = counts.most_common(capacity)
+        return cls(
+            capacity,
+            {value: [count, 0] for value, count in top},
+            sum(counts.values()),
+        )
+
+    @classmethod
+    def from_json(cls, data, total=0, capacity=SKETCH_CAPACITY):
+        return cls(
+            capacity,
+            {value: [count, error] for value, count, error in data},
+            total,
+        )
+
+
+def refresh_property_top_k(session, batch_size=50000):
+    """
+    Fold metrics rows added since the last run into each site's daily
+    sketches. Returns the number of events processed.
+    """
+    up_to = settled_metric_id(session)
+    processed = 0
+    key_columns = [Metric.properties[key].astext for key in INDEXED_PROPERTY_KEYS]
+    while True:
+        watermark = lock_watermark(session, WATERMARK)
+        rows = session.execute(
+            select(
+                Metric.id, Metric.site_id, func.date(Metric.timestamp), *key_columns
+            )
+            .where(
+                Metric.id > watermark.last_metric_id,
+                Metric.id <= up_to,
+                Metric.properties.isnot(None),
+            )
+            .order_by(Metric.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            watermark.last_metric_id = up_to
+            session.commit()
+            return processed
+
+        counts = defaultdict(Counter)
+        for row in rows:
+            site_id, day = row[1], row[2]
+            for key, value in zip(INDEXED_PROPERTY_KEYS, row[3:]):
+                if value is not None:
+                    counts[(site_id, day, key)][value] += 1
+        batch = {
+            day_key: SpaceSaving.from_counts(day_counts)
+            for day_key, day_counts in counts.items()
+        }
+
+        existing = {
+            (row.site_id, row.day, row.key): row
+            for row in session.execute(
+                select(PropertyTopK)
+                .where(
+                    tuple_(PropertyTopK.site_id, PropertyTopK.day).in_(
+                        list({(site_id, day) for site_id, day, _ in batch})
+                    )
+                )
+                .with_for_update()
+            ).scalars()
+        }
+        for (site_id, day, key), sketch in batch.items():
+            row = existing.get((site_id, day, key))
+            if row is None:
+                session.add(
+                    PropertyTopK(
+                        site_id=site_id,
+                        day=day,
+                        key=key,
+                        sketch=sketch.to_json(),
+                        total=sketch.total,
+                    )
+                )
+                continue
+            merged = SpaceSaving.from_json(row.sketch, row.total).merge(sketch)
+            row.sketch = merged.to_json()
+            row.total = merged.total
+
+        watermark.last_metric_id = rows[-1][0]
+        session.commit()
+        processed += len(rows)
+
+
+def top_property_values(session, site_id, key, start, end, limit):
+    """
+    Merge the site's daily sketches for `key` between two dates and return
+    the `limit` most frequent values.
+    """
+    rows = session.execute(
+        select(PropertyTopK.sketch, PropertyTopK.total).where(
+            PropertyTopK.site_id == site_id,
+            PropertyTopK.key == key,
+            PropertyTopK.day.between(start, end),
+        )
+    ).all()
+    merged = SpaceSaving()
+    for sketch, total in rows:
+        merged.merge(SpaceSaving.from_json(sketch, total))
+    return {"key": key, "total": merged.total, "top": merged.top(limit)}
@@ -0,0 +1,93 @@
+"""
+Helpers for aggregates that are built incrementally from the metrics table.
+
+Refreshers fold rows in id order and remember the highest id folded. Ids are
+handed out when a row is inserted, not when its transaction commits, so a
+slow ingest transaction can commit id N after id N + 1 is already visible.
+Folding only up to settled_metric_id() keeps a refresh from moving past a row
+that is still in flight and skipping it for good. A refresh that finds
+nothing more to fold moves its watermark up to that bound, so an aggregate
+whose events are rare does not hold back retention.
+"""
+
+from sqlalchemy import text
+
+from app.models import AggregationWatermark
+
+# Every metrics.id at or below this one is committed or will never exist.
+SETTLED = "metrics_settled"
+# The sequence position recorded at updated_at, waiting to become settled.
+ALLOCATED = "metrics_allocated"
+
+SEQUENCE_POSITION_SQL = text(
+    """
+    SELECT coalesce(
+        pg_sequence_last_value(pg_get_serial_sequence('metrics', 'id')::regclass), 0
+    )
+    """
+)
+
+NOW_SQL = text("SELECT clock_timestamp() AT TIME ZONE 'UTC'")
+
+# Client sessions only: autovacuum and replication have no metrics ids. Other
+# roles' xact_start is hidden without pg_read_all_stats, so ingest must use
+# the application's role (or the role must be granted it).
+OLDEST_TRANSACTION_SQL = text(
+    """
+    SELECT min(xact_start) AT TIME ZONE 'UTC'
+    FROM pg_stat_activity
+    WHERE datname = current_database()
+      AND backend_type = 'client backend'
+      AND pid <> pg_backend_pid()
+    """
+)
+
+
+def lock_watermark(session, name):
+    """
+    Return the watermark row for `name`, locked FOR UPDATE so concurrent
+    refreshers of the same aggregate run one after another. Creates the row
+    on first use, stamped with the database clock in naive UTC, the form
+    settled_metric_id() compares against.
+    """
+    watermark = session.get(AggregationWatermark, name, with_for_update=True)
+    if watermark is None:
+        watermark = AggregationWatermark(
+            name=name, last_metric_id=0, updated_at=session.execute(NOW_SQL).scalar()
+        )
+        session.add(watermark)
+        session.flush()
+    return watermark
+
+
+def reset_watermark(session, name):
+    """
+    Forget the progress of an aggregate so the next refresh starts over.
+    """
+    watermark = session.get(AggregationWatermark, name)
+    if watermark is not None:
+        watermark.last_metric_id = 0
+
+
+def settled_metric_id(session):
+    """
+    The highest metrics.id below which no row can still appear, so a
+    refresh may fold up to it without skipping rows. A transaction holding
+    an id at or below the sequence position read at time t started before
+    t; once every open transaction started after t, that position is
+    settled. Each call records a new position after the previous one has
+    settled, so the bound trails the sequence by about one refresh.
+    Commits.
+    """
+    settled = lock_watermark(session, SETTLED)
+    allocated = lock_watermark(session, ALLOCATED)
+    oldest = session.execute(OLDEST_TRANSACTION_SQL).scalar()
+    if oldest is None or oldest > allocated.updated_at:
+        settled.last_metric_id = max(settled.last_metric_id, allocated.last_metric_id)
+        # Position first: whoever holds an id at or below it started before
+        # the time read next.
+        allocated.last_metric_id = session.execute(SEQUENCE_POSITION_SQL).scalar()
+        allocated.updated_at = session.execute(NOW_SQL).scalar()
+    up_to = settled.last_metric_id
+    session.commit()
+    return up_to
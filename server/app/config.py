@@ -8,3 +8,134 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SECRET_KEY = os.getenv("SECRET_KEY", "your_super_secret_jwt_key")
     GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
+
+    # Startup: probe the database with retries instead of exiting when it is
+    # not reachable yet.
+    DB_STARTUP_CHECK = os.getenv("DB_STARTUP_CHECK", "true").lower() == "true"
+    DB_STARTUP_RETRIES = int(os.getenv("DB_STARTUP_RETRIES", "3"))
+    DB_STARTUP_RETRY_DELAY = float(os.getenv("DB_STARTUP_RETRY_DELAY", "1.0"))
+    # Swagger docs are loaded lazily on first request; set to false to disable.
+    API_DOCS_ENABLED = os.getenv("API_DOCS_ENABLED", "true").lower() == "true"
+    # Readiness probe results are cached for this many seconds per worker.
+    READINESS_CACHE_TTL = float(os.getenv("READINESS_CACHE_TTL", "5"))
+    READINESS_SLOW_MS = float(os.getenv("READINESS_SLOW_MS", "500"))
+    READINESS_MAX_REPLICATION_LAG = float(
+        os.getenv("READINESS_MAX_REPLICATION_LAG", "30")
+    )
+    # Token-bucket rate limits on auth routes. RATE_LIMIT_STORAGE=mmap shares
+    # buckets between all workers on the host; "memory" is per worker.
+    RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_STORAGE = os.getenv("RATE_LIMIT_STORAGE", "memory")
+    RATE_LIMIT_MMAP_PATH = os.getenv("RATE_LIMIT_MMAP_PATH")
+    RATE_LIMIT_SLOTS = int(os.getenv("RATE_LIMIT_SLOTS", "65536"))
+    RATE_LIMIT_TRUST_PROXY = (
+        os.getenv("RATE_LIMIT_TRUST_PROXY", "false").lower() == "true"
+    )
+    # Per-limit overrides, e.g. "login:ip=20/minute,login:account=5/minute"
+    RATE_LIMITS = os.getenv("RATE_LIMITS", "")
+    # Raw metrics older than this are downsampled into daily rollups and
+    # deleted by the apply-retention command.
+    METRICS_RETENTION_DAYS = int(os.getenv("METRICS_RETENTION_DAYS", "400"))
+    RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "5000"))
+    RETENTION_BATCH_SLEEP = float(os.getenv("RETENTION_BATCH_SLEEP", "0.05"))
+    # statement_timeout (ms) per dashboard query class; on timeout the last
+    # good result is served as stale and refreshed in the background.
+    DASHBOARD_STATEMENT_TIMEOUTS = os.getenv(
+        "DASHBOARD_STATEMENT_TIMEOUTS", "light=2000,standard=5000,heavy=15000"
+    )
+    DASHBOARD_REFRESH_TIMEOUT_MS = int(
+        os.getenv("DASHBOARD_REFRESH_TIMEOUT_MS", "60000")
+    )
+    # Concurrent identical dashboard computations share one execution:
+    # "process" coalesces within a worker, "host" across workers via lock files.
+    SINGLE_FLIGHT_MODE = os.getenv("SINGLE_FLIGHT_MODE", "process")
+    SINGLE_FLIGHT_DIR = os.getenv("SINGLE_FLIGHT_DIR")
+    SINGLE_FLIGHT_WAIT = float(os.getenv("SINGLE_FLIGHT_WAIT", "30"))
+    # Cache shared by the workers on a host: memory://, sqlite:///path or
+    # redis://host:port/db. Backs last good dashboard results and auth lookups.
+    SHARED_CACHE_URL = os.getenv("SHARED_CACHE_URL", "memory://")
+    SHARED_CACHE_MAX_ENTRIES = int(os.getenv("SHARED_CACHE_MAX_ENTRIES", "10000"))
+    DASHBOARD_RESULT_TTL = int(os.getenv("DASHBOARD_RESULT_TTL", "86400"))
+    # Seconds to keep a closed day's or month's counts for one time zone
+    # (dashboard `tz` parameter, app.analytics.local_time).
+    CLOSED_PERIOD_CACHE_TTL = int(os.getenv("CLOSED_PERIOD_CACHE_TTL", "604800"))
+    AUTH_USER_CACHE_TTL = int(os.getenv("AUTH_USER_CACHE_TTL", "60"))
+    # Background maintenance jobs (app.analytics.jobs). Every worker runs the
+    # scheduler; advisory locks make sure each slot runs exactly once.
+    SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "false").lower() == "true"
+    SCHEDULER_AUTOSTART = os.getenv("SCHEDULER_AUTOSTART", "true").lower() == "true"
+    SCHEDULER_POLL_INTERVAL = float(os.getenv("SCHEDULER_POLL_INTERVAL", "1"))
+    SCHEDULE_REFRESH_AGGREGATES_SECONDS = int(
+        os.getenv("SCHEDULE_REFRESH_AGGREGATES_SECONDS", "300")
+    )
+    SCHEDULE_WARM_CACHE_SECONDS = int(os.getenv("SCHEDULE_WARM_CACHE_SECONDS", "300"))
+    SCHEDULE_RETENTION_CRON = os.getenv("SCHEDULE_RETENTION_CRON", "30 3 * * *")
+    # Duplicate suppression for POST /api/metrics (app.utils.idempotency).
+    INGEST_DEDUP_MODE = os.getenv("INGEST_DEDUP_MODE", "verify")
+    INGEST_BLOOM_CAPACITY = int(os.getenv("INGEST_BLOOM_CAPACITY", "1000000"))
+    INGEST_BLOOM_ERROR_RATE = float(os.getenv("INGEST_BLOOM_ERROR_RATE", "0.001"))
+    INGEST_BLOOM_ROTATE_SECONDS = int(os.getenv("INGEST_BLOOM_ROTATE_SECONDS", "3600"))
+    # Ingest adds unseen event type, device and location names to their
+    # dictionary tables (app.utils.dimensions): at most this many per batch
+    # and dimension, and per table in total. Names beyond either map to "Other".
+    INGEST_MAX_NEW_NAMES = int(os.getenv("INGEST_MAX_NEW_NAMES", "10"))
+    DIMENSION_MAX_NAMES = int(os.getenv("DIMENSION_MAX_NAMES", "1000"))
+    # Ingest enrichment (app.utils.enrichment): path of the memory-mapped IP
+    # range table built by `poetry run build-ip-table`; unset skips IP lookups.
+    ENRICH_IP_TABLE = os.getenv("ENRICH_IP_TABLE")
+    # Long-range aggregates split into monthly chunks run in parallel on
+    # separate pooled connections (app.utils.fanout). Chunks per query, and
+    # threads (so connections) per worker process; 1 disables fan-out.
+    FANOUT_CONCURRENCY = int(os.getenv("FANOUT_CONCURRENCY", "4"))
+    FANOUT_MAX_WORKERS = int(os.getenv("FANOUT_MAX_WORKERS", "4"))
+    # Hot dashboard queries run as server-side prepared statements, prepared
+    # once per pooled connection (app.utils.prepared). Disable behind a
+    # transaction-mode pooler, where sessions are not kept per client.
+    PREPARED_STATEMENTS = os.getenv("PREPARED_STATEMENTS", "true").lower() == "true"
+    # Sites with at least this share of metrics rows get custom plans.
+    PREPARED_CUSTOM_PLAN_SHARE = float(os.getenv("PREPARED_CUSTOM_PLAN_SHARE", "0.05"))
+    # Per-request profiling (app.utils.profiling): requests carrying
+    # PROFILE_ADMIN_TOKEN in X-Profile-Token (or ?profile=) are profiled, as
+    # is a PROFILE_SAMPLE_RATE fraction of all requests. Profiles are kept in
+    # PROFILE_DIR (default: a temp directory), at most PROFILE_MAX_FILES.
+    PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN")
+    PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+    PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+    PROFILE_DIR = os.getenv("PROFILE_DIR")
+    PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))
+    # Admission control (app.utils.admission): per route class (auth, cheap,
+    # heavy, ingest), concurrent requests across the workers on a host,
+    # requests allowed to wait for a slot and for how long, and the latency
+    # the adaptive limit aims for. Requests are shed with 503 beyond these,
+    # or when a worker's DB pool is ADMISSION_POOL_SHED_RATIO in use.
+    ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+    ADMISSION_DIR = os.getenv("ADMISSION_DIR")
+    ADMISSION_LIMITS = os.getenv(
+        "ADMISSION_LIMITS", "auth=8,cheap=16,heavy=2,ingest=8"
+    )
+    ADMISSION_QUEUE_LENGTHS = os.getenv(
+        "ADMISSION_QUEUE_LENGTHS", "auth=16,cheap=32,heavy=4,ingest=16"
+    )
+    ADMISSION_QUEUE_TIMEOUTS_MS = os.getenv(
+        "ADMISSION_QUEUE_TIMEOUTS_MS", "auth=2000,cheap=1000,heavy=250,ingest=2000"
+    )
+    ADMISSION_TARGET_LATENCY_MS = os.getenv(
+        "ADMISSION_TARGET_LATENCY_MS", "auth=250,cheap=500,heavy=5000,ingest=1000"
+    )
+    ADMISSION_POOL_SHED_RATIO = float(os.getenv("ADMISSION_POOL_SHED_RATIO", "0.9"))
+    # Database connections per worker process. A gthread worker needs one per
+    # request thread (GUNICORN_THREADS) plus the fan-out threads; the default
+    # sizes the pool for that so requests do not wait on a checkout.
+    DB_POOL_SIZE = int(
+        os.getenv(
+            "DB_POOL_SIZE",
+            str(int(os.getenv("GUNICORN_THREADS", "1")) + FANOUT_MAX_WORKERS),
+        )
+    )
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "5"))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+    }
@@ -0,0 +1,53 @@
+"""
+WSGI middleware that defers loading the Swagger documentation until it is
+first requested.
+
+Building the flask_restx Api and all the documentation models is one of the
+most expensive parts of startup, yet only a handful of requests ever hit the
+docs. The docs are served from a small standalone Flask app that is created
+on the first matching request, inside the worker that receives it.
+"""
+
+import threading
+
+from flask import Flask
+
+DOCS_PATH_PREFIXES = ("/api/docs", "/api/swagger.json", "/swaggerui/")
+DOCS_EXACT_PATHS = ("/api", "/api/")
+
+
+def _build_docs_app():
+    from app.routes.api_docs import api_docs_bp
+
+    docs_app = Flask("app.api_docs")
+    docs_app.register_blueprint(api_docs_bp)
+    return docs_app
+
+
+class LazyDocsMiddleware:
+    """
+    Route documentation paths to a lazily built docs app and everything else
+    to the main application.
+    """
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+        self._docs_app = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def is_docs_path(path):
+        return path in DOCS_EXACT_PATHS or path.startswith(DOCS_PATH_PREFIXES)
+
+    @property
+    def docs_app(self):
+        if self._docs_app is None:
+            with self._lock:
+                if self._docs_app is None:
+                    self._docs_app = _build_docs_app()
+        return self._docs_app
+
+    def __call__(self, environ, start_response):
+        if self.is_docs_path(environ.get("PATH_INFO", "")):
+            return self.docs_app(environ, start_response)
+        return self.wsgi_app(environ, start_response)
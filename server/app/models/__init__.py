@@ -4,6 +4,21 @@ from sqlalchemy.ext.declarative import declarative_base
 db = SQLAlchemy()
 Base = declarative_base()
 
+from .aggregation_watermark import AggregationWatermark
+from .cohort_retention import (
+    CohortRetention,
+    RegistrationCohort,
+    UserActivityWeek,
+    UserRegistration,
+)
+from .daily_active_users import DailyActiveUsers
 from .dashboard_summary import DashboardSummary
+from .dimension import Device, EventType, Location
 from .metric import Metric
+from .metric_quarter_hour import MetricQuarterHour
+from .metric_rollup import MetricRollup
+from .property_top_k import PropertyTopK
+from .scheduled_job import ScheduledJob
+from .site import Site, SiteMember
 from .user import User
+from .value_sketch import ValueSketch
@@ -0,0 +1,22 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import BigInteger, Column, DateTime, String
+
+from . import Base
+
+
+class AggregationWatermark(Base):
+    """
+    Progress marker for incremental aggregates built from the metrics table.
+    Stores the highest metrics.id already folded into the named aggregate.
+    """
+
+    __tablename__ = "aggregation_watermarks"
+    name = Column(String(50), primary_key=True)
+    last_metric_id = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(
+        DateTime,
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+        nullable=False,
+    )
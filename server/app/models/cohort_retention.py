@@ -0,0 +1,52 @@
+from sqlalchemy import Column, Date, ForeignKey, Integer, SmallInteger
+
+from . import Base
+
+
+class RegistrationCohort(Base):
+    """
+    Number of users who registered in each week (the cohort size).
+    """
+
+    __tablename__ = "registration_cohorts"
+    site_id = Column(SmallInteger, ForeignKey("sites.id"), primary_key=True)
+    cohort_week = Column(Date, primary_key=True)
+    users = Column(Integer, nullable=False, default=0)
+
+
+class UserRegistration(Base):
+    """
+    The users counted in a site's cohort sizes, with their registration
+    week. Used to count every user once however often their registration
+    event is delivered.
+    """
+
+    __tablename__ = "user_registrations"
+    site_id = Column(SmallInteger, ForeignKey("sites.id"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    cohort_week = Column(Date, nullable=False)
+
+
+class CohortRetention(Base):
+    """
+    Distinct users from a registration week who logged in during a later
+    activity week. Maintained incrementally; see app.analytics.cohorts.
+    """
+
+    __tablename__ = "cohort_retention"
+    site_id = Column(SmallInteger, ForeignKey("sites.id"), primary_key=True)
+    cohort_week = Column(Date, primary_key=True)
+    activity_week = Column(Date, primary_key=True)
+    users = Column(Integer, nullable=False, default=0)
+
+
+class UserActivityWeek(Base):
+    """
+    The weeks in which each user logged in. Used to count every user at most
+    once per cohort cell when new events arrive.
+    """
+
+    __tablename__ = "user_activity_weeks"
+    site_id = Column(SmallInteger, ForeignKey("sites.id"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    week = Column(Date, primary_key=True)
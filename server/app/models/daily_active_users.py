@@ -0,0 +1,34 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import (
+    Column,
+    Date,
+    DateTime,
+    ForeignKey,
+    Integer,
+    LargeBinary,
+    SmallInteger,
+)
+
+from . import Base
+
+
+class DailyActiveUsers(Base):
+    """
+    Per-site, per-day bitmap of active user ids (bit n set = user n was active).
+    The bitmap is zlib-compressed; version is bumped on every update so
+    readers can cache decoded bitmaps and only reload changed days.
+    """
+
+    __tablename__ = "daily_active_users"
+    site_id = Column(SmallInteger, ForeignKey("sites.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    bitmap = Column(LargeBinary, nullable=False)
+    cardinality = Column(Integer, nullable=False, default=0)
+    version = Column(Integer, nullable=False, default=1)
+    updated_at = Column(
+        DateTime,
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+        nullable=False,
+    )
@@ -1,16 +1,18 @@
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, ForeignKey, Integer, SmallInteger, String
 
 from . import Base
 
 
 class DashboardSummary(Base):
     """
-    Dashboard summary statistics for the main dashboard cards.
+    Dashboard summary statistics for the main dashboard cards, one row per
+    site.
     Stores views, visits, new users, and active users with their changes.
     """
 
     __tablename__ = "dashboard_summary"
     id = Column(Integer, primary_key=True)
+    site_id = Column(SmallInteger, ForeignKey("sites.id"), nullable=False, unique=True)
     views = Column(String(50), nullable=False)
     views_change = Column(String(50), nullable=False)
     views_type = Column(String(10), nullable=False)  # 'increase' or 'decrease'
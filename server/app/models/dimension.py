@@ -0,0 +1,34 @@
+from sqlalchemy import Column, Identity, SmallInteger, String
+
+from . import Base
+
+
+class EventType(Base):
+    """
+    Event type names referenced by metrics.event_type_id. Rows are only ever
+    added, so an id always means the same name (see app.utils.dimensions).
+    """
+
+    __tablename__ = "event_types"
+    id = Column(SmallInteger, Identity(), primary_key=True)
+    name = Column(String(50), nullable=False, unique=True)
+
+
+class Device(Base):
+    """
+    Device names referenced by metrics.device_id.
+    """
+
+    __tablename__ = "devices"
+    id = Column(SmallInteger, Identity(), primary_key=True)
+    name = Column(String(50), nullable=False, unique=True)
+
+
+class Location(Base):
+    """
+    Location names referenced by metrics.location_id.
+    """
+
+    __tablename__ = "locations"
+    id = Column(SmallInteger, Identity(), primary_key=True)
+    name = Column(String(50), nullable=False, unique=True)
@@ -1,33 +1,101 @@
 from datetime import datetime, timezone
 
-from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, String
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    SmallInteger,
+    String,
+    text,
+)
+from sqlalchemy.dialects.postgresql import JSONB
 
 from . import Base
 
+# Property keys with their own expression index, for equality filters and
+# ordering on the most common high-cardinality dimensions.
+INDEXED_PROPERTY_KEYS = ("path", "referrer", "campaign")
+
 
 class Metric(Base):
     """
     Metric model for storing raw event data for analytics.
     Includes event type, timestamp, device, location, and value.
+    Event type, device and location are stored as smallint ids into their
+    dictionary tables (app.models.dimension); app.utils.dimensions maps
+    names to ids and back. Free-form event properties (page path, referrer,
+    campaign, ...) live in the `properties` JSONB column.
     """
 
     __tablename__ = "metrics"
+    __table_args__ = (
+        Index(
+            "ix_metrics_properties",
+            "properties",
+            postgresql_using="gin",
+            postgresql_ops={"properties": "jsonb_path_ops"},
+        ),
+        # Indexes lead with site_id, so a site's queries only read its rows
+        # however large other sites are. Exceptions: the GIN index above,
+        # which the planner ANDs with a site-led one; timestamp, for the
+        # cross-site cohort rebuild; user_id, for the foreign key.
+        *(
+            Index(
+                f"ix_metrics_site_id_property_{key}",
+                "site_id",
+                text(f"(properties ->> '{key}')"),
+            )
+            for key in INDEXED_PROPERTY_KEYS
+        ),
+        # Dashboard charts filter on one event type over a time range.
+        Index(
+            "ix_metrics_site_id_event_type_id_timestamp",
+            "site_id",
+            "event_type_id",
+            "timestamp",
+        ),
+        # Keyset pagination order for GET /api/metrics.
+        Index("ix_metrics_site_id_timestamp_id", "site_id", "timestamp", "id"),
+        # A client idempotency key is accepted once per site and UTC day of
+        # the event.
+        Index(
+            "uq_metrics_site_id_idempotency_key_day",
+            "site_id",
+            "idempotency_key",
+            text("date_trunc('day', timestamp)"),
+            unique=True,
+            postgresql_where=text("idempotency_key IS NOT NULL"),
+        ),
+    )
     id = Column(Integer, primary_key=True)
+    # Rows written without a site belong to the default site.
+    site_id = Column(
+        SmallInteger, ForeignKey("sites.id"), nullable=False, server_default="1"
+    )
     timestamp = Column(
         DateTime, default=lambda: datetime.now(timezone.utc), nullable=False, index=True
     )
-    event_type = Column(
-        String(50), nullable=False, index=True
+    event_type_id = Column(
+        SmallInteger, ForeignKey("event_types.id"), nullable=False
     )  # e.g., 'page_view', 'user_login', 'new_registration'
     user_id = Column(
         Integer, ForeignKey("users.id"), nullable=True, index=True
     )  # Link to user if applicable
-    device = Column(
-        String(50), nullable=True, index=True
+    device_id = Column(
+        SmallInteger, ForeignKey("devices.id"), nullable=True
     )  # e.g., 'Windows', 'Mac', 'iOS', 'Android', 'Linux'
-    location = Column(
-        String(50), nullable=True, index=True
+    location_id = Column(
+        SmallInteger, ForeignKey("locations.id"), nullable=True
     )  # e.g., 'United States', 'Canada', 'Mexico', 'Other'
     value = Column(
         Float, default=1.0
     )  # Generic value, e.g., 1 for a count, or a specific metric value
+    properties = Column(
+        JSONB, nullable=True
+    )  # e.g., {"path": "/pricing", "referrer": "google.com", "campaign": "spring"}
+    idempotency_key = Column(
+        String(64), nullable=True
+    )  # Client-generated event id, so retried deliveries are stored once
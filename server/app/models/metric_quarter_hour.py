@@ -0,0 +1,19 @@
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, SmallInteger
+
+from . import Base
+
+
+class MetricQuarterHour(Base):
+    """
+    Event count per site, 15-minute UTC bucket, event type, device and
+    location (0 where the event had none). Local days and months in any time zone are
+    whole runs of buckets (see app.analytics.local_time).
+    """
+
+    __tablename__ = "metric_quarter_hours"
+    site_id = Column(SmallInteger, ForeignKey("sites.id"), primary_key=True)
+    bucket = Column(DateTime, primary_key=True)
+    event_type_id = Column(SmallInteger, primary_key=True)
+    device_id = Column(SmallInteger, primary_key=True)
+    location_id = Column(SmallInteger, primary_key=True)
+    events = Column(BigInteger, nullable=False, default=0)
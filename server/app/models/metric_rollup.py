@@ -0,0 +1,20 @@
+from sqlalchemy import BigInteger, Column, Date, Float, ForeignKey, SmallInteger, String
+
+from . import Base
+
+
+class MetricRollup(Base):
+    """
+    Daily aggregate of raw metrics removed by the retention policy.
+    Unknown device/location are stored as an empty string so every
+    dimension combination has exactly one row.
+    """
+
+    __tablename__ = "metric_daily_rollups"
+    site_id = Column(SmallInteger, ForeignKey("sites.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    event_type = Column(String(50), primary_key=True)
+    device = Column(String(50), primary_key=True, default="")
+    location = Column(String(50), primary_key=True, default="")
+    events = Column(BigInteger, nullable=False, default=0)
+    value_sum = Column(Float, nullable=False, default=0)
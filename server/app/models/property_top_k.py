@@ -0,0 +1,19 @@
+from sqlalchemy import BigInteger, Column, Date, ForeignKey, SmallInteger, String
+from sqlalchemy.dialects.postgresql import JSONB
+
+from . import Base
+
+
+class PropertyTopK(Base):
+    """
+    Daily Space-Saving sketch of the most frequent values of one event
+    property (e.g. the top page paths), used instead of a GROUP BY over
+    every distinct value.
+    """
+
+    __tablename__ = "property_top_k"
+    site_id = Column(SmallInteger, ForeignKey("sites.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    key = Column(String(50), primary_key=True)  # e.g., 'path', 'referrer'
+    sketch = Column(JSONB, nullable=False)  # [[value, count, error], ...]
+    total = Column(BigInteger, nullable=False, default=0)
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, DateTime, Float, Integer, String
+
+from . import Base
+
+
+class ScheduledJob(Base):
+    """
+    Run history for a background maintenance job, shared by every worker and
+    replica. `last_slot_at` is the scheduled time of the last run that was
+    started, so a slot is only ever run once whichever process wins it.
+    """
+
+    __tablename__ = "scheduled_jobs"
+    name = Column(String(50), primary_key=True)
+    last_slot_at = Column(DateTime, nullable=True)
+    last_started_at = Column(DateTime, nullable=True)
+    last_finished_at = Column(DateTime, nullable=True)
+    last_success_at = Column(DateTime, nullable=True)
+    last_duration_ms = Column(Float, nullable=True)
+    last_status = Column(String(20), nullable=True)
+    last_error = Column(String(255), nullable=True)
+    runs = Column(Integer, nullable=False, default=0)
+    failures = Column(Integer, nullable=False, default=0)
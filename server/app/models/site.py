@@ -0,0 +1,40 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    ForeignKey,
+    Identity,
+    Integer,
+    SmallInteger,
+    String,
+)
+
+from . import Base
+
+# Created by the migration that introduced sites; rows from before then, and
+# requests without an X-Site-Id header, belong to it.
+DEFAULT_SITE_ID = 1
+
+
+class Site(Base):
+    """
+    A tracked property (tenant). Events, the summary cards and every
+    aggregate carry a site_id, and their indexes lead with it so one site's
+    dashboard reads only that site's rows.
+    """
+
+    __tablename__ = "sites"
+    id = Column(SmallInteger, Identity(), primary_key=True)
+    name = Column(String(100), nullable=False, unique=True)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+
+class SiteMember(Base):
+    """
+    Users allowed to read and write a site's data.
+    """
+
+    __tablename__ = "site_members"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    site_id = Column(SmallInteger, ForeignKey("sites.id"), primary_key=True)
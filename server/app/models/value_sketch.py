@@ -0,0 +1,28 @@
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    ForeignKey,
+    LargeBinary,
+    SmallInteger,
+)
+
+from . import Base
+
+
+class ValueSketch(Base):
+    """
+    Hourly DDSketch of Metric.value for one site, event type, device and
+    location
+    (0 where the event had none), merged on read for percentiles and
+    histograms over any range (see app.analytics.distributions).
+    """
+
+    __tablename__ = "value_sketches"
+    site_id = Column(SmallInteger, ForeignKey("sites.id"), primary_key=True)
+    hour = Column(DateTime, primary_key=True)
+    event_type_id = Column(SmallInteger, primary_key=True)
+    device_id = Column(SmallInteger, primary_key=True)
+    location_id = Column(SmallInteger, primary_key=True)
+    count = Column(BigInteger, nullable=False, default=0)
+    sketch = Column(LargeBinary, nullable=False)  # DDSketch.to_bytes()
@@ -5,4 +5,4 @@ Routes package for API endpoints.
 from .auth import auth_bp
 from .dashboard import dashboard_bp
 from .health_check import health_check_bp
-from .api_docs import api_docs_bp
+from .metrics import metrics_bp
@@ -10,7 +10,10 @@ api = Api(
     api_docs_bp,
     title='Analytics Dashboard API',
     version='1.0',
-    description='API documentation for the Analytics Dashboard backend. Use the "Authorize" button above to add your Bearer token for protected endpoints.',
+    description='API documentation for the Analytics Dashboard backend. Use the "Authorize" button above to add your Bearer token for protected endpoints. '
+    'Protected endpoints read and write the site given by an X-Site-Id header '
+    '(default 1); the user must be a member of it (403 otherwise). '
+    'GET /api/auth/sites lists the sites of the current user.',
     doc='/docs',
     authorizations={
         'Bearer': {
@@ -29,6 +32,9 @@ dashboard_ns = api.namespace(
     'dashboard', description='Dashboard data operations (requires authentication)'
 )
 health_ns = api.namespace('health-check', description='Health check operations')
+metrics_ns = api.namespace(
+    'metrics', description='Raw event operations (requires authentication)'
+)
 
 # Standard response model
 standard_response_model = api.model(
@@ -39,6 +45,10 @@ standard_response_model = api.model(
         ),
         'data': fields.Raw(description='The response data'),
         'message': fields.String(description='A message for the client'),
+        'meta': fields.Raw(
+            description='Present when the data is a stale cached result: '
+            '{"stale": true, "age_seconds": ...}'
+        ),
     },
 )
 
@@ -122,6 +132,37 @@ traffic_location = api.model(
     },
 )
 
+# Metrics request models
+metric_event = api.model(
+    'MetricEvent',
+    {
+        'event_type': fields.String(required=True, description='e.g. page_view'),
+        'timestamp': fields.DateTime(description='Event time (default: now)'),
+        'user_id': fields.Integer(description='User the event belongs to'),
+        'device': fields.String(description='Device name'),
+        'location': fields.String(description='Location name'),
+        'value': fields.Float(description='Event value (default 1)'),
+        'properties': fields.Raw(description='Free-form event properties'),
+        'idempotency_key': fields.String(
+            description='Client event id (max 64 chars); stored once per UTC day'
+        ),
+        'user_agent': fields.String(
+            description='Client User-Agent; sets device when device is omitted'
+        ),
+        'ip': fields.String(
+            description='Client IPv4/IPv6 address; sets location when omitted'
+        ),
+    },
+)
+ingest_request = api.model(
+    'IngestRequest',
+    {
+        'events': fields.List(
+            fields.Nested(metric_event), required=True, description='1-1000 events'
+        )
+    },
+)
+
 # Health check response model
 health_data = api.model(
     'HealthData', {'status': fields.String(description='API status message')}
@@ -136,6 +177,7 @@ class Signup(Resource):
     @auth_ns.response(201, 'Success', standard_response_model)
     @auth_ns.response(400, 'Bad Request', standard_response_model)
     @auth_ns.response(409, 'Conflict', standard_response_model)
+    @auth_ns.response(429, 'Too Many Requests', standard_response_model)
     @auth_ns.response(500, 'Internal Server Error', standard_response_model)
     def post(self):
         """
@@ -152,6 +194,7 @@ class Login(Resource):
     @auth_ns.response(200, 'Success', standard_response_model)
     @auth_ns.response(400, 'Bad Request', standard_response_model)
     @auth_ns.response(401, 'Unauthorized', standard_response_model)
+    @auth_ns.response(429, 'Too Many Requests', standard_response_model)
     def post(self):
         """
         Log in a user with email and password. Returns a JWT token on success.
@@ -166,6 +209,7 @@ class GoogleLogin(Resource):
     @auth_ns.response(200, 'Success', standard_response_model)
     @auth_ns.response(400, 'Bad Request', standard_response_model)
     @auth_ns.response(401, 'Unauthorized', standard_response_model)
+    @auth_ns.response(429, 'Too Many Requests', standard_response_model)
     @auth_ns.response(500, 'Internal Server Error', standard_response_model)
     def post(self):
         """
@@ -186,12 +230,38 @@ class VerifyToken(Resource):
         pass
 
 
+@auth_ns.route('/sites')
+class Sites(Resource):
+    @auth_ns.doc('get_sites', security='Bearer')
+    @auth_ns.response(200, 'Success', standard_response_model)
+    @auth_ns.response(401, 'Unauthorized', standard_response_model)
+    def get(self):
+        """
+        List the sites the current user is a member of ({id, name}), the
+        values accepted in the X-Site-Id header.
+        """
+        pass
+
+
+# Query parameter shared by the chart endpoints
+property_filter_param = {
+    'filter': 'Event property filter as key:value, e.g. path:/pricing '
+    '(repeat to combine)'
+}
+chart_params = {
+    **property_filter_param,
+    'tz': 'IANA time zone for day and month boundaries, e.g. Asia/Kolkata '
+    '(default UTC)',
+}
+
+
 # Dashboard endpoints documentation
 @dashboard_ns.route('/summary')
 class DashboardSummary(Resource):
     @dashboard_ns.doc('get_dashboard_summary', security='Bearer')
     @dashboard_ns.response(200, 'Success', standard_response_model)
     @dashboard_ns.response(401, 'Unauthorized', standard_response_model)
+    @dashboard_ns.response(503, 'Service Unavailable', standard_response_model)
     @dashboard_ns.response(404, 'Not Found', standard_response_model)
     def get(self):
         """
@@ -203,39 +273,216 @@ class DashboardSummary(Resource):
 
 @dashboard_ns.route('/total-users')
 class TotalUsers(Resource):
-    @dashboard_ns.doc('get_total_users_chart_data', security='Bearer')
+    @dashboard_ns.doc(
+        'get_total_users_chart_data', security='Bearer', params=chart_params
+    )
+    @dashboard_ns.response(400, 'Bad Request', standard_response_model)
     @dashboard_ns.response(200, 'Success', standard_response_model)
     @dashboard_ns.response(401, 'Unauthorized', standard_response_model)
+    @dashboard_ns.response(503, 'Service Unavailable', standard_response_model)
     def get(self):
         """
         Get user registration data for the total users graph (this year vs last year).
         Returns a list of months with user counts for this year and last year.
+        Months are local to `tz` when given.
         """
         pass
 
 
 @dashboard_ns.route('/traffic-by-device')
 class TrafficByDevice(Resource):
-    @dashboard_ns.doc('get_traffic_by_device_chart_data', security='Bearer')
+    @dashboard_ns.doc(
+        'get_traffic_by_device_chart_data', security='Bearer', params=chart_params
+    )
+    @dashboard_ns.response(400, 'Bad Request', standard_response_model)
     @dashboard_ns.response(200, 'Success', standard_response_model)
     @dashboard_ns.response(401, 'Unauthorized', standard_response_model)
+    @dashboard_ns.response(503, 'Service Unavailable', standard_response_model)
     def get(self):
         """
-        Get traffic breakdown by device for the last 30 days.
-        Returns a list of devices and their traffic counts.
+        Get traffic breakdown by device for the last 30 days (calendar days
+        in `tz` if given). Returns a list of devices and their traffic counts.
         """
         pass
 
 
 @dashboard_ns.route('/traffic-by-location')
 class TrafficByLocation(Resource):
-    @dashboard_ns.doc('get_traffic_by_location_chart_data', security='Bearer')
+    @dashboard_ns.doc(
+        'get_traffic_by_location_chart_data', security='Bearer', params=chart_params
+    )
+    @dashboard_ns.response(400, 'Bad Request', standard_response_model)
+    @dashboard_ns.response(200, 'Success', standard_response_model)
+    @dashboard_ns.response(401, 'Unauthorized', standard_response_model)
+    @dashboard_ns.response(503, 'Service Unavailable', standard_response_model)
+    def get(self):
+        """
+        Get traffic breakdown by location for the last 30 days (calendar days
+        in `tz` if given). Returns a list of locations with traffic counts and
+        percentages.
+        """
+        pass
+
+
+@dashboard_ns.route('/overview')
+class Overview(Resource):
+    @dashboard_ns.doc('get_overview', security='Bearer', params=chart_params)
+    @dashboard_ns.response(400, 'Bad Request', standard_response_model)
+    @dashboard_ns.response(200, 'Success', standard_response_model)
+    @dashboard_ns.response(401, 'Unauthorized', standard_response_model)
+    @dashboard_ns.response(503, 'Service Unavailable', standard_response_model)
+    def get(self):
+        """
+        Get the summary cards and the total users, traffic by device and
+        traffic by location charts in one response, computed concurrently.
+        """
+        pass
+
+
+@dashboard_ns.route('/active-users')
+class ActiveUsers(Resource):
+    @dashboard_ns.doc(
+        'get_active_users',
+        security='Bearer',
+        params={'date': 'Day to report (YYYY-MM-DD, default today UTC)'},
+    )
+    @dashboard_ns.response(200, 'Success', standard_response_model)
+    @dashboard_ns.response(400, 'Bad Request', standard_response_model)
+    @dashboard_ns.response(401, 'Unauthorized', standard_response_model)
+    @dashboard_ns.response(503, 'Service Unavailable', standard_response_model)
+    def get(self):
+        """
+        Get DAU, WAU, MAU and stickiness for a day.
+        Computed from the daily active-user bitmaps.
+        """
+        pass
+
+
+@dashboard_ns.route('/retention')
+class Retention(Resource):
+    @dashboard_ns.doc(
+        'get_retention',
+        security='Bearer',
+        params={
+            'date': 'Cohort day: users active on this day (YYYY-MM-DD)',
+            'days': 'Number of following days to report (1-90, default 7)',
+        },
+    )
+    @dashboard_ns.response(200, 'Success', standard_response_model)
+    @dashboard_ns.response(400, 'Bad Request', standard_response_model)
+    @dashboard_ns.response(401, 'Unauthorized', standard_response_model)
+    @dashboard_ns.response(503, 'Service Unavailable', standard_response_model)
+    def get(self):
+        """
+        Get N-day retention for the users active on a given day.
+        """
+        pass
+
+
+@dashboard_ns.route('/cohorts')
+class Cohorts(Resource):
+    @dashboard_ns.doc(
+        'get_cohorts',
+        security='Bearer',
+        params={'weeks': 'Number of registration cohorts to return (1-52)'},
+    )
+    @dashboard_ns.response(200, 'Success', standard_response_model)
+    @dashboard_ns.response(400, 'Bad Request', standard_response_model)
+    @dashboard_ns.response(401, 'Unauthorized', standard_response_model)
+    @dashboard_ns.response(503, 'Service Unavailable', standard_response_model)
+    def get(self):
+        """
+        Get weekly cohort retention for the last N registration cohorts.
+        """
+        pass
+
+
+@dashboard_ns.route('/top-properties')
+class TopProperties(Resource):
+    @dashboard_ns.doc(
+        'get_top_properties',
+        security='Bearer',
+        params={
+            'key': 'Property to rank: path, referrer or campaign',
+            'limit': 'Number of values to return (1-100, default 20)',
+            'days': 'Number of days to cover (1-365, default 30)',
+        },
+    )
     @dashboard_ns.response(200, 'Success', standard_response_model)
+    @dashboard_ns.response(400, 'Bad Request', standard_response_model)
     @dashboard_ns.response(401, 'Unauthorized', standard_response_model)
+    @dashboard_ns.response(503, 'Service Unavailable', standard_response_model)
     def get(self):
         """
-        Get traffic breakdown by location for the last 30 days.
-        Returns a list of locations with traffic counts and percentages.
+        Get the most frequent values of an event property over the last N days.
+        Merged from daily top-k sketches; counts carry an error bound.
+        """
+        pass
+
+
+@dashboard_ns.route('/value-distribution')
+class ValueDistribution(Resource):
+    @dashboard_ns.doc(
+        'get_value_distribution',
+        security='Bearer',
+        params={
+            'event_type': 'Event type whose values to summarize (required)',
+            'device': 'Only events from this device',
+            'location': 'Only events from this location',
+            'start': 'ISO 8601 start, rounded down to the hour (default: end - 7 days)',
+            'end': 'ISO 8601 end, rounded up to the hour (default: now)',
+            'bins': 'Maximum number of histogram buckets (1-100, default 20)',
+        },
+    )
+    @dashboard_ns.response(200, 'Success', standard_response_model)
+    @dashboard_ns.response(400, 'Bad Request', standard_response_model)
+    @dashboard_ns.response(401, 'Unauthorized', standard_response_model)
+    @dashboard_ns.response(503, 'Service Unavailable', standard_response_model)
+    def get(self):
+        """
+        Get count, mean, min, max, p50/p90/p99 and a log-scale histogram of
+        event values (e.g. load times) over a time range.
+        Merged from hourly DDSketches; percentiles are within 1% of the true value.
+        """
+        pass
+
+
+# Raw event endpoints documentation
+@metrics_ns.route('')
+class Metrics(Resource):
+    @metrics_ns.doc(
+        'get_metrics',
+        security='Bearer',
+        params={
+            'event_type': 'Only events of this type',
+            'device': 'Only events from this device',
+            'location': 'Only events from this location',
+            'user_id': 'Only events of this user',
+            'start': 'Inclusive lower bound on timestamp (ISO 8601)',
+            'end': 'Exclusive upper bound on timestamp (ISO 8601)',
+            'limit': 'Page size (1-500, default 100)',
+            'cursor': 'next_cursor from the previous page',
+        },
+    )
+    @metrics_ns.response(200, 'Success', standard_response_model)
+    @metrics_ns.response(400, 'Bad Request', standard_response_model)
+    @metrics_ns.response(401, 'Unauthorized', standard_response_model)
+    def get(self):
+        """
+        List raw events, newest first, with keyset pagination.
+        Returns `events` and an opaque `next_cursor` (null on the last page).
+        """
+        pass
+
+    @metrics_ns.doc('post_metrics', security='Bearer')
+    @metrics_ns.expect(ingest_request)
+    @metrics_ns.response(201, 'Created', standard_response_model)
+    @metrics_ns.response(400, 'Bad Request', standard_response_model)
+    @metrics_ns.response(401, 'Unauthorized', standard_response_model)
+    def post(self):
+        """
+        Ingest a batch of events. Retried events with the same idempotency_key
+        are counted in `duplicates` and stored only once.
         """
         pass
 
@@ -253,6 +500,90 @@ class HealthCheck(Resource):
         pass
 
 
+@health_ns.route('/live')
+class Liveness(Resource):
+    @health_ns.doc('liveness')
+    @health_ns.response(200, 'Success', standard_response_model)
+    def get(self):
+        """
+        Liveness probe. Never touches the database or any other dependency.
+        """
+        pass
+
+
+@health_ns.route('/ready')
+class Readiness(Resource):
+    @health_ns.doc('readiness')
+    @health_ns.response(200, 'Ready or degraded', standard_response_model)
+    @health_ns.response(503, 'Not ready', standard_response_model)
+    def get(self):
+        """
+        Readiness probe with per-component status and latency (cached briefly).
+        """
+        pass
+
+
+@health_ns.route('/stats')
+class Stats(Resource):
+    @health_ns.doc('stats')
+    @health_ns.response(200, 'Success', standard_response_model)
+    def get(self):
+        """
+        Operational counters for the worker that served the request.
+        """
+        pass
+
+
+@health_ns.route('/jobs')
+class Jobs(Resource):
+    @health_ns.doc('jobs')
+    @health_ns.response(200, 'Success', standard_response_model)
+    def get(self):
+        """
+        Background maintenance jobs with their schedule, last run duration,
+        status and last success time.
+        """
+        pass
+
+
+profile_token_header = {
+    'X-Profile-Token': {
+        'in': 'header',
+        'description': 'Profiling admin token (PROFILE_ADMIN_TOKEN)',
+        'required': True,
+    }
+}
+
+
+@health_ns.route('/profiles')
+class Profiles(Resource):
+    @health_ns.doc(
+        'profiles',
+        params={'limit': 'Number of profiles to return (default 50)', **profile_token_header},
+    )
+    @health_ns.response(200, 'Success', standard_response_model)
+    @health_ns.response(403, 'Admin token required', standard_response_model)
+    def get(self):
+        """
+        Most recent request profiles on this host, newest first: wall time
+        split into auth, SQL, compute and serialization.
+        """
+        pass
+
+
+@health_ns.route('/profiles/<string:profile_id>')
+class ProfileStacks(Resource):
+    @health_ns.doc('profile_stacks', params=profile_token_header)
+    @health_ns.response(200, 'Collapsed stacks (text/plain)')
+    @health_ns.response(403, 'Admin token required', standard_response_model)
+    @health_ns.response(404, 'Profile not found', standard_response_model)
+    def get(self):
+        """
+        Collapsed stacks of one profile, for flamegraph.pl or speedscope.
+        """
+        pass
+
+
 # Add a simple documentation page
 @api_docs_bp.route('/')
 @cross_origin()
@@ -5,15 +5,15 @@ Authentication routes for user signup, login, and Google OAuth.
 import os
 from typing import Any, cast
 
-from flask import Blueprint, request
-from google.auth.transport import requests as google_requests
-from google.oauth2 import id_token
+from flask import Blueprint, g, request
 from marshmallow import ValidationError
 from werkzeug.security import check_password_hash, generate_password_hash
 
-from app.models import User, db
+from app.models import Site, SiteMember, User, db
+from app.models.site import DEFAULT_SITE_ID
 
 from ..utils.auth_utils import generate_jwt, token_required
+from ..utils.rate_limit import client_ip, rate_limit, request_email
 from ..utils.response import standard_response
 from ..utils.validation import (
     GoogleLoginData,
@@ -27,7 +27,16 @@ from ..utils.validation import (
 auth_bp = Blueprint("auth", __name__, url_prefix="/api/auth")
 
 
+def join_default_site(user):
+    """
+    Make a new user (added to the session) a member of the default site.
+    """
+    db.session.flush()
+    db.session.add(SiteMember(user_id=user.id, site_id=DEFAULT_SITE_ID))
+
+
 @auth_bp.route("/signup", methods=["POST"])
+@rate_limit("signup:ip", "10/hour", key=client_ip)
 def signup():
     """
     Register a new user with name, email, and password.
@@ -56,6 +65,7 @@ def signup():
     new_user = User(name=name, email=email, password_hash=hashed_password)
     db.session.add(new_user)
     try:
+        join_default_site(new_user)
         db.session.commit()
         token = generate_jwt(new_user.id)
         return standard_response(
@@ -70,6 +80,8 @@ def signup():
 
 
 @auth_bp.route("/login", methods=["POST"])
+@rate_limit("login:ip", "30/minute", key=client_ip)
+@rate_limit("login:account", "10/minute", key=request_email)
 def login():
     """
     Log in a user with email and password. Returns a JWT token on success.
@@ -106,6 +118,7 @@ def login():
 
 
 @auth_bp.route("/google-login", methods=["POST"])
+@rate_limit("google-login:ip", "30/minute", key=client_ip)
 def google_login():
     """
     Log in or register a user using Google OAuth. Returns a JWT token on success.
@@ -125,6 +138,11 @@ def google_login():
         if not CLIENT_ID:
             raise ValueError("GOOGLE_CLIENT_ID environment variable not set.")
 
+        # google-auth is imported lazily: it is slow to import and only
+        # needed by this endpoint.
+        from google.auth.transport import requests as google_requests
+        from google.oauth2 import id_token
+
         idinfo = id_token.verify_oauth2_token(
             google_id_token, google_requests.Request(), CLIENT_ID
         )
@@ -148,6 +166,7 @@ def google_login():
             else:
                 new_user = User(name=name, email=email, google_id=google_user_id)
                 db.session.add(new_user)
+                join_default_site(new_user)
                 db.session.commit()
                 user = new_user
 
@@ -177,3 +196,23 @@ def verify_token():
         "Token has been verified!",
         200,
     )
+
+
+@auth_bp.route("/sites", methods=["GET"])
+@token_required
+def get_sites():
+    """
+    List the sites the current user is a member of, for the X-Site-Id header.
+    """
+    sites = db.session.execute(
+        db.select(Site)
+        .join(SiteMember, SiteMember.site_id == Site.id)
+        .where(SiteMember.user_id == g.current_user.id)
+        .order_by(Site.id)
+    ).scalars()
+    return standard_response(
+        True,
+        [{"id": site.id, "name": site.name} for site in sites],
+        "Sites retrieved successfully",
+        200,
+    )
@@ -3,97 +3,309 @@ Dashboard routes for analytics and summary data.
 Provides endpoints for summary cards, user growth, device and location traffic breakdowns.
 """
 
-from datetime import datetime, timedelta, timezone
+import json
+from collections import Counter, namedtuple
+from datetime import date, datetime, timedelta, timezone
 
-from flask import Blueprint
-from sqlalchemy import extract, func
+from flask import Blueprint, current_app, g, request
+from marshmallow import ValidationError
+from sqlalchemy import func, select
 
-from app.models import DashboardSummary, Metric, db
+from app.analytics.activity import active_user_counts, retention_curve
+from app.analytics.cohorts import cohort_table
+from app.analytics.distributions import hour_range, merged_sketch
+from app.analytics.local_time import (
+    UNKNOWN,
+    cached_periods,
+    local_period_counts,
+    period_boundaries,
+    rolled_up_period_counts,
+)
+from app.analytics.sketches import top_property_values
+from app.models import DashboardSummary, Metric, Site, db
 
 from ..utils.auth_utils import token_required
+from ..utils.data_version import conditional_get
+from ..utils.dimensions import dimensions
+from ..utils.fanout import fan_out, month_chunks, run_concurrently
+from ..utils.prepared import PreparedStatement, execute, execute_all
 from ..utils.response import standard_response
+from ..utils.result_cache import cache_key, last_good_results, serve_dashboard_query
+from ..utils.validation import (
+    ActiveUsersQuerySchema,
+    CohortsQuerySchema,
+    RetentionQuerySchema,
+    TopPropertiesQuerySchema,
+    ValueDistributionQuerySchema,
+    parse_property_filters,
+    parse_time_zone,
+)
 
 dashboard_bp = Blueprint("dashboard", __name__, url_prefix="/api/dashboard")
 
 
+def parse_chart_args(args):
+    """
+    Property filters and time zone of a chart request, and the parameters
+    its result is cached under. Raises ValidationError.
+    """
+    properties = parse_property_filters(args)
+    zone = parse_time_zone(args)
+    params = {"properties": properties}
+    if zone is not None:
+        params["tz"] = zone.key
+    return properties, zone, params
+
+
+def property_conditions(properties):
+    """
+    SQL conditions for parsed `filter=key:value` parameters.
+    """
+    return [Metric.properties.contains(properties)] if properties else []
+
+
+REGISTRATIONS_BY_MONTH = """
+SELECT to_char(timestamp, 'Mon') AS month, count(*) AS count
+FROM metrics
+WHERE site_id = :site_id
+  AND event_type_id = :event_type_id
+  AND timestamp >= :year_start AND timestamp < :year_end{filter}
+GROUP BY 1, extract(month FROM timestamp)
+ORDER BY extract(month FROM timestamp)
+"""
+
+ROLLED_UP_REGISTRATIONS_BY_MONTH = PreparedStatement(
+    "dashboard_rolled_up_registrations_by_month",
+    """
+SELECT to_char(day, 'Mon') AS month, sum(events) AS count
+FROM metric_daily_rollups
+WHERE site_id = :site_id
+  AND event_type = 'new_registration'
+  AND day >= :year_start AND day < :year_end
+GROUP BY 1
+""",
+)
+
+TRAFFIC_BY = """
+SELECT {column}, count(*) AS traffic
+FROM metrics
+WHERE site_id = :site_id
+  AND event_type_id = :event_type_id
+  AND timestamp >= :since
+  AND {column} IS NOT NULL{filter}
+GROUP BY {column}
+ORDER BY count(*) DESC
+"""
+
+# A separate statement with the property filter rather than
+# "(:properties IS NULL OR ...)", which a generic plan cannot use the GIN
+# index for.
+PROPERTY_FILTER = "\n  AND properties @> CAST(:properties AS jsonb)"
+
+
+def _statements(name, sql, **format_args):
+    """
+    The unfiltered and property-filtered variants of a hot statement.
+    """
+    return {
+        filtered: PreparedStatement(
+            f"{name}_filtered" if filtered else name,
+            sql.format(filter=PROPERTY_FILTER if filtered else "", **format_args),
+        )
+        for filtered in (False, True)
+    }
+
+
+REGISTRATIONS_BY_MONTH_STATEMENTS = _statements(
+    "dashboard_registrations_by_month", REGISTRATIONS_BY_MONTH
+)
+TRAFFIC_BY_DEVICE_STATEMENTS = _statements(
+    "dashboard_traffic_by_device", TRAFFIC_BY, column="device_id"
+)
+TRAFFIC_BY_LOCATION_STATEMENTS = _statements(
+    "dashboard_traffic_by_location", TRAFFIC_BY, column="location_id"
+)
+
+
+def property_params(properties):
+    """
+    Statement variant key and extra parameters for parsed property filters.
+    """
+    if not properties:
+        return False, {}
+    return True, {"properties": json.dumps(properties)}
+
+
+def year_params(year, type_=datetime):
+    return {"year_start": type_(year, 1, 1), "year_end": type_(year + 1, 1, 1)}
+
+
+def summary_data(site_id):
+    """
+    Summary card values of a site, or None when it has no summary row yet.
+    """
+    summary = db.session.execute(
+        db.select(DashboardSummary).filter_by(site_id=site_id)
+    ).scalar_one_or_none()
+    if summary is None:
+        return None
+    return {
+        "views": {
+            "value": summary.views,
+            "change": summary.views_change,
+            "type": summary.views_type,
+        },
+        "visits": {
+            "value": summary.visits,
+            "change": summary.visits_change,
+            "type": summary.visits_type,
+        },
+        "newUsers": {
+            "value": summary.new_users,
+            "change": summary.new_users_change,
+            "type": summary.new_users_type,
+        },
+        "activeUsers": {
+            "value": summary.active_users,
+            "change": summary.active_users_change,
+            "type": summary.active_users_type,
+        },
+    }
+
+
 @dashboard_bp.route("/summary", methods=["GET"])
+@conditional_get
 @token_required
 def get_summary_data():
     """
     Get dashboard summary statistics for cards (views, visits, new users, active users).
     Returns a JSON response with the summary data.
     """
-    summary = db.session.execute(db.select(DashboardSummary)).scalar_one_or_none()
-    if summary:
-        data = {
-            "views": {
-                "value": summary.views,
-                "change": summary.views_change,
-                "type": summary.views_type,
-            },
-            "visits": {
-                "value": summary.visits,
-                "change": summary.visits_change,
-                "type": summary.visits_type,
-            },
-            "newUsers": {
-                "value": summary.new_users,
-                "change": summary.new_users_change,
-                "type": summary.new_users_type,
-            },
-            "activeUsers": {
-                "value": summary.active_users,
-                "change": summary.active_users_change,
-                "type": summary.active_users_type,
-            },
-        }
-        return standard_response(True, data, "Summary data fetched successfully.", 200)
-    else:
-        return standard_response(False, None, "No summary data found", 404)
+    site_id = g.site_id
+    return serve_dashboard_query(
+        "summary",
+        "light",
+        {},
+        lambda: summary_data(site_id),
+        "Summary data fetched successfully.",
+    )
 
 
-@dashboard_bp.route("/total-users", methods=["GET"])
-@token_required
-def get_total_users_chart_data():
+def registrations_by_month(site_id, years, registration_id, properties):
     """
-    Get user registration data for the total users graph (this year vs last year).
-    Returns a list of months with user counts for this year and last year.
+    The site's registrations per month of each of `years`, one prepared statement per
+    year sent together (see app.utils.prepared), as {year: {"Jan": n}}.
     """
-    current_year = datetime.now(timezone.utc).year
-    last_year = current_year - 1
+    filtered, params = property_params(properties)
+    statement = REGISTRATIONS_BY_MONTH_STATEMENTS[filtered]
+    results = execute_all(
+        [
+            (
+                statement,
+                {
+                    "site_id": site_id,
+                    "event_type_id": registration_id,
+                    **year_params(year),
+                    **params,
+                },
+            )
+            for year in years
+        ]
+    )
+    return {
+        year: {row.month: row.count for row in rows}
+        for year, rows in zip(years, results)
+    }
 
-    this_year_data = (
-        db.session.query(
-            func.to_char(Metric.timestamp, "Mon").label("month"),
-            func.count(Metric.id).label("count"),
-        )
-        .filter(
-            Metric.event_type == "new_registration",
-            extract("year", Metric.timestamp) == current_year,
-        )
-        .group_by(
-            func.to_char(Metric.timestamp, "Mon"),
-            extract("month", Metric.timestamp),
+
+def registrations_by_month_parallel(site_id, years, registration_id, conditions):
+    """
+    The site's registrations per month for each of `years`, one month per statement
+    run concurrently (see app.utils.fanout). Returns {year: {"Jan": n}}.
+    """
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    months = month_chunks(datetime(min(years), 1, 1), datetime(max(years) + 1, 1, 1))
+    # No statements for months still ahead.
+    chunks = [chunk for chunk in months if chunk[0] <= now]
+
+    def statement_for(chunk_start, chunk_end):
+        return select(func.count(Metric.id)).where(
+            Metric.site_id == site_id,
+            Metric.event_type_id == registration_id,
+            Metric.timestamp >= chunk_start,
+            Metric.timestamp < chunk_end,
+            *conditions,
         )
-        .order_by(extract("month", Metric.timestamp))
-        .all()
-    )
 
-    last_year_data = (
-        db.session.query(
-            func.to_char(Metric.timestamp, "Mon").label("month"),
-            func.count(Metric.id).label("count"),
+    counts = {year: {} for year in years}
+    for (chunk_start, _), rows in zip(chunks, fan_out(chunks, statement_for)):
+        if chunk_start.year in counts and rows[0][0]:
+            counts[chunk_start.year][chunk_start.strftime("%b")] = rows[0][0]
+    return counts
+
+
+def local_registrations_by_month(site_id, zone, properties):
+    """
+    The site's registrations per calendar month in `zone` of this year and
+    last year, from the quarter-hour aggregates (see app.analytics.local_time),
+    as {year: {"Jan": n}}. Closed months are cached per site and zone.
+    """
+    registration_id = dimensions.id("event_type", "new_registration")
+    current_year = datetime.now(zone).year
+    years = [current_year - 1, current_year]
+    starts = [date(year, month, 1) for year in years for month in range(1, 13)]
+    boundaries = period_boundaries(zone, starts, date(current_year + 1, 1, 1))
+
+    def compute(span):
+        counts = local_period_counts(
+            db.session, site_id, registration_id, span, properties=properties
         )
-        .filter(
-            Metric.event_type == "new_registration",
-            extract("year", Metric.timestamp) == last_year,
+        # Rollups have no event properties, so they only apply unfiltered.
+        if not properties:
+            rolled_up = rolled_up_period_counts(
+                db.session, site_id, "new_registration", span
+            )
+            for key, events in rolled_up.items():
+                counts[key] += events
+        return [counts.get((i,), 0) for i in range(len(span) - 1)]
+
+    name = f"registrations:{json.dumps(properties, sort_keys=True)}"
+    counts = {year: {} for year in years}
+    for start, count in zip(
+        starts, cached_periods(db.session, site_id, name, zone, boundaries, compute)
+    ):
+        if count:
+            counts[start.year][start.strftime("%b")] = count
+    return counts
+
+
+def total_users_chart_data(site_id, properties, parallel=None, zone=None):
+    """
+    The site's registrations per month for this year and last year. The two years are
+    split into months queried in parallel unless fan-out is disabled
+    (FANOUT_CONCURRENCY=1) or `parallel` is False; then they are two
+    prepared statements sent together. With a time zone, months are local
+    to it and counted from the quarter-hour aggregates.
+    """
+    conditions = property_conditions(properties)
+    registration_id = dimensions.id("event_type", "new_registration")
+
+    current_year = datetime.now(zone or timezone.utc).year
+    last_year = current_year - 1
+
+    if parallel is None:
+        parallel = current_app.config["FANOUT_CONCURRENCY"] > 1
+    if zone is not None:
+        by_year = local_registrations_by_month(site_id, zone, properties)
+    elif parallel:
+        by_year = registrations_by_month_parallel(
+            site_id, [last_year, current_year], registration_id, conditions
         )
-        .group_by(
-            func.to_char(Metric.timestamp, "Mon"), extract("month", Metric.timestamp)
+    else:
+        by_year = registrations_by_month(
+            site_id, [last_year, current_year], registration_id, properties
         )
-        .order_by(extract("month", Metric.timestamp))
-        .all()
-    )
+    this_year_dict, last_year_dict = by_year[current_year], by_year[last_year]
 
     chart_data = []
     months_order = [
@@ -111,8 +323,22 @@ def get_total_users_chart_data():
         "Dec",
     ]
 
-    this_year_dict = {row.month: row.count for row in this_year_data}
-    last_year_dict = {row.month: row.count for row in last_year_data}
+    # Rollups have no event properties, so they only apply unfiltered.
+    # The local-time path has already added them.
+    if not conditions and zone is None:
+        years = [(this_year_dict, current_year), (last_year_dict, last_year)]
+        rolled_up = execute_all(
+            [
+                (
+                    ROLLED_UP_REGISTRATIONS_BY_MONTH,
+                    {"site_id": site_id, **year_params(year, date)},
+                )
+                for _, year in years
+            ]
+        )
+        for (counts, _), rows in zip(years, rolled_up):
+            for row in rows:
+                counts[row.month] = counts.get(row.month, 0) + int(row.count)
 
     for month in months_order:
         if month in this_year_dict or month in last_year_dict:
@@ -124,66 +350,391 @@ def get_total_users_chart_data():
                 }
             )
 
-    return standard_response(True, chart_data, "Total users chart data fetched.", 200)
+    return chart_data
 
 
-@dashboard_bp.route("/traffic-by-device", methods=["GET"])
+@dashboard_bp.route("/total-users", methods=["GET"])
+@conditional_get
 @token_required
-def get_traffic_by_device_chart_data():
+def get_total_users_chart_data():
     """
-    Get traffic breakdown by device for the last 30 days.
-    Returns a list of devices and their traffic counts.
+    Get user registration data for the total users graph (this year vs last year).
+    Returns a list of months with user counts for this year and last year.
+    Months are local to `tz` when given.
     """
-    thirty_days_ago = datetime.now(timezone.utc) - timedelta(days=30)
+    try:
+        properties, zone, params = parse_chart_args(request.args)
+    except ValidationError as err:
+        return standard_response(False, None, err.messages, 400)
 
-    traffic_by_device = (
-        db.session.query(Metric.device, func.count(Metric.id).label("traffic"))
-        .filter(
-            Metric.event_type == "page_view",
-            Metric.timestamp >= thirty_days_ago,
-            Metric.device.isnot(None),
+    site_id = g.site_id
+    return serve_dashboard_query(
+        "total_users",
+        "heavy",
+        params,
+        lambda: total_users_chart_data(site_id, properties, zone=zone),
+        "Total users chart data fetched.",
+    )
+
+
+def traffic_by(site_id, statements, properties):
+    """
+    The site's page views per device or location id over the last 30 days.
+    """
+    filtered, params = property_params(properties)
+    thirty_days_ago = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(
+        days=30
+    )
+    return execute(
+        statements[filtered],
+        {
+            "site_id": site_id,
+            "event_type_id": dimensions.id("event_type", "page_view"),
+            "since": thirty_days_ago,
+            **params,
+        },
+    )
+
+
+def local_traffic_by(site_id, column, zone, properties):
+    """
+    The site's page views per `column` id (device_id or location_id) over
+    the last 30 calendar days in `zone`, today included, from the
+    quarter-hour aggregates. Closed days are cached per site and zone.
+    """
+    page_view_id = dimensions.id("event_type", "page_view")
+    today = datetime.now(zone).date()
+    starts = [today - timedelta(days=days) for days in range(29, -1, -1)]
+    boundaries = period_boundaries(zone, starts, today + timedelta(days=1))
+
+    def compute(span):
+        days = [{} for _ in span[1:]]
+        counts = local_period_counts(
+            db.session, site_id, page_view_id, span, (column,), properties
         )
-        .group_by(Metric.device)
-        .order_by(func.count(Metric.id).desc())
-        .all()
+        for (i, value_id), events in counts.items():
+            if value_id != UNKNOWN:
+                days[i][str(value_id)] = events
+        return days
+
+    name = f"page_views:{column}:{json.dumps(properties, sort_keys=True)}"
+    totals = Counter()
+    for day in cached_periods(db.session, site_id, name, zone, boundaries, compute):
+        totals.update(day)
+    row = namedtuple("Row", [column, "traffic"])
+    return [row(int(value_id), traffic) for value_id, traffic in totals.most_common()]
+
+
+def traffic_by_device_data(site_id, properties, zone=None):
+    """
+    The site's page views per device over the last 30 days (calendar days in `zone`
+    if given).
+    """
+    traffic_by_device = (
+        traffic_by(site_id, TRAFFIC_BY_DEVICE_STATEMENTS, properties)
+        if zone is None
+        else local_traffic_by(site_id, "device_id", zone, properties)
     )
 
-    data = [{"device": row.device, "traffic": row.traffic} for row in traffic_by_device]
-    return standard_response(True, data, "Traffic by device fetched.", 200)
+    return [
+        {"device": dimensions.name("device", row.device_id), "traffic": row.traffic}
+        for row in traffic_by_device
+    ]
 
 
-@dashboard_bp.route("/traffic-by-location", methods=["GET"])
+@dashboard_bp.route("/traffic-by-device", methods=["GET"])
+@conditional_get
 @token_required
-def get_traffic_by_location_chart_data():
+def get_traffic_by_device_chart_data():
     """
-    Get traffic breakdown by location for the last 30 days.
-    Returns a list of locations with traffic counts and percentages.
+    Get traffic breakdown by device for the last 30 days (calendar days in
+    `tz` if given). Returns a list of devices and their traffic counts.
     """
-    thirty_days_ago = datetime.now(timezone.utc) - timedelta(days=30)
+    try:
+        properties, zone, params = parse_chart_args(request.args)
+    except ValidationError as err:
+        return standard_response(False, None, err.messages, 400)
+
+    site_id = g.site_id
+    return serve_dashboard_query(
+        "traffic_by_device",
+        "standard",
+        params,
+        lambda: traffic_by_device_data(site_id, properties, zone),
+        "Traffic by device fetched.",
+    )
+
 
+def traffic_by_location_data(site_id, properties, zone=None):
+    """
+    The site's page views per location over the last 30 days (calendar days in `zone`
+    if given), with percentages.
+    """
     traffic_by_location = (
-        db.session.query(Metric.location, func.count(Metric.id).label("value"))
-        .filter(
-            Metric.event_type == "page_view",
-            Metric.timestamp >= thirty_days_ago,
-            Metric.location.isnot(None),
-        )
-        .group_by(Metric.location)
-        .order_by(func.count(Metric.id).desc())
-        .all()
+        traffic_by(site_id, TRAFFIC_BY_LOCATION_STATEMENTS, properties)
+        if zone is None
+        else local_traffic_by(site_id, "location_id", zone, properties)
     )
 
-    total_traffic = sum(item.value for item in traffic_by_location)
+    total_traffic = sum(item.traffic for item in traffic_by_location)
 
     data = []
     for item in traffic_by_location:
-        percentage = (item.value / total_traffic) * 100 if total_traffic > 0 else 0
+        percentage = (item.traffic / total_traffic) * 100 if total_traffic > 0 else 0
         data.append(
             {
-                "name": item.location,
-                "value": item.value,
+                "name": dimensions.name("location", item.location_id),
+                "value": item.traffic,
                 "percentage": f"{percentage:.1f}%",
             }
         )
 
-    return standard_response(True, data, "Traffic by location fetched.", 200)
+    return data
+
+
+@dashboard_bp.route("/traffic-by-location", methods=["GET"])
+@conditional_get
+@token_required
+def get_traffic_by_location_chart_data():
+    """
+    Get traffic breakdown by location for the last 30 days (calendar days in
+    `tz` if given). Returns a list of locations with traffic counts and
+    percentages.
+    """
+    try:
+        properties, zone, params = parse_chart_args(request.args)
+    except ValidationError as err:
+        return standard_response(False, None, err.messages, 400)
+
+    site_id = g.site_id
+    return serve_dashboard_query(
+        "traffic_by_location",
+        "standard",
+        params,
+        lambda: traffic_by_location_data(site_id, properties, zone),
+        "Traffic by location fetched.",
+    )
+
+
+def overview_data(site_id, properties, zone=None):
+    """
+    A site's summary cards and the three charts in one payload. The parts run
+    concurrently on separate connections (see run_concurrently), so the
+    response takes about as long as its slowest part.
+    """
+    parts = {
+        "summary": lambda: summary_data(site_id),
+        # Already one of the concurrent parts, so not split by month.
+        "totalUsers": lambda: total_users_chart_data(
+            site_id, properties, parallel=False, zone=zone
+        ),
+        "trafficByDevice": lambda: traffic_by_device_data(site_id, properties, zone),
+        "trafficByLocation": lambda: traffic_by_location_data(
+            site_id, properties, zone
+        ),
+    }
+    return dict(zip(parts, run_concurrently(list(parts.values()))))
+
+
+@dashboard_bp.route("/overview", methods=["GET"])
+@conditional_get
+@token_required
+def get_overview():
+    """
+    Get the summary cards and the total users, traffic by device and traffic
+    by location charts in one response.
+    """
+    try:
+        properties, zone, params = parse_chart_args(request.args)
+    except ValidationError as err:
+        return standard_response(False, None, err.messages, 400)
+
+    site_id = g.site_id
+    return serve_dashboard_query(
+        "overview",
+        "heavy",
+        params,
+        lambda: overview_data(site_id, properties, zone),
+        "Dashboard overview fetched.",
+    )
+
+
+# Unfiltered chart views whose last good results the scheduler keeps warm:
+# (name, params, compute(site_id)) exactly as the routes pass them.
+DEFAULT_VIEWS = [
+    ("summary", {}, summary_data),
+    (
+        "total_users",
+        {"properties": {}},
+        lambda site_id: total_users_chart_data(site_id, {}),
+    ),
+    (
+        "traffic_by_device",
+        {"properties": {}},
+        lambda site_id: traffic_by_device_data(site_id, {}),
+    ),
+    (
+        "traffic_by_location",
+        {"properties": {}},
+        lambda site_id: traffic_by_location_data(site_id, {}),
+    ),
+]
+
+
+def warm_dashboard_results():
+    """
+    Recompute the default views of every site so a stale copy is always
+    available to serve if the database slows down.
+    """
+    site_ids = db.session.execute(select(Site.id).order_by(Site.id)).scalars().all()
+    for site_id in site_ids:
+        for name, params, compute in DEFAULT_VIEWS:
+            data = compute(site_id)
+            db.session.commit()
+            if data is not None:
+                last_good_results.set(cache_key(name, site_id, params), data)
+
+
+@dashboard_bp.route("/active-users", methods=["GET"])
+@conditional_get
+@token_required
+def get_active_users():
+    """
+    Get DAU, WAU, MAU and stickiness for a day (default: today, UTC).
+    Computed from the daily active-user bitmaps.
+    """
+    try:
+        params = ActiveUsersQuerySchema().load(request.args)
+    except ValidationError as err:
+        return standard_response(False, None, err.messages, 400)
+    day = params["date"] or datetime.now(timezone.utc).date()
+    site_id = g.site_id
+
+    return serve_dashboard_query(
+        "active_users",
+        "light",
+        {"date": day},
+        lambda: active_user_counts(db.session, site_id, day),
+        "Active users fetched.",
+    )
+
+
+@dashboard_bp.route("/retention", methods=["GET"])
+@conditional_get
+@token_required
+def get_retention():
+    """
+    Get N-day retention for the users active on a given day.
+    Returns how many of them were active again on each of the next N days.
+    """
+    try:
+        params = RetentionQuerySchema().load(request.args)
+    except ValidationError as err:
+        return standard_response(False, None, err.messages, 400)
+    site_id = g.site_id
+
+    return serve_dashboard_query(
+        "retention",
+        "light",
+        params,
+        lambda: retention_curve(db.session, site_id, params["date"], params["days"]),
+        "Retention fetched.",
+    )
+
+
+@dashboard_bp.route("/cohorts", methods=["GET"])
+@conditional_get
+@token_required
+def get_cohorts():
+    """
+    Get weekly cohort retention for the last N registration cohorts.
+    Reads only the incrementally maintained cohort tables.
+    """
+    try:
+        params = CohortsQuerySchema().load(request.args)
+    except ValidationError as err:
+        return standard_response(False, None, err.messages, 400)
+    site_id = g.site_id
+
+    return serve_dashboard_query(
+        "cohorts",
+        "light",
+        params,
+        lambda: cohort_table(db.session, site_id, params["weeks"]),
+        "Cohort retention fetched.",
+    )
+
+
+@dashboard_bp.route("/top-properties", methods=["GET"])
+@conditional_get
+@token_required
+def get_top_properties():
+    """
+    Get the most frequent values of an event property (path, referrer or
+    campaign) over the last N days, merged from the daily top-k sketches.
+    Counts are upper bounds with their maximum overestimate in `error`.
+    """
+    try:
+        params = TopPropertiesQuerySchema().load(request.args)
+    except ValidationError as err:
+        return standard_response(False, None, err.messages, 400)
+    end = datetime.now(timezone.utc).date()
+    start = end - timedelta(days=params["days"] - 1)
+    site_id = g.site_id
+
+    return serve_dashboard_query(
+        "top_properties",
+        "light",
+        {**params, "end": end},
+        lambda: top_property_values(
+            db.session, site_id, params["key"], start, end, params["limit"]
+        ),
+        "Top property values fetched.",
+    )
+
+
+def value_distribution_data(site_id, params):
+    """
+    Summary of the site's Metric.value for the validated query, with
+    `start`/`end` already widened to whole hours.
+    """
+    sketch = merged_sketch(
+        db.session,
+        site_id,
+        params["event_type"],
+        params["start"],
+        params["end"],
+        params["device"],
+        params["location"],
+    )
+    return {
+        "start": params["start"].isoformat(),
+        "end": params["end"].isoformat(),
+        **sketch.summary(params["bins"]),
+    }
+
+
+@dashboard_bp.route("/value-distribution", methods=["GET"])
+@conditional_get
+@token_required
+def get_value_distribution():
+    """
+    Get count, mean, min, max, p50/p90/p99 and a log-scale histogram of
+    Metric.value for one event type over whole hours in [start, end),
+    merged from the hourly value sketches.
+    """
+    try:
+        params = ValueDistributionQuerySchema().load(request.args)
+    except ValidationError as err:
+        return standard_response(False, None, err.messages, 400)
+    start, end = hour_range(params["start"], params["end"])
+    params = {**params, "start": start, "end": end}
+    site_id = g.site_id
+
+    return serve_dashboard_query(
+        "value_distribution",
+        "light",
+        params,
+        lambda: value_distribution_data(site_id, params),
+        "Value distribution fetched.",
+    )
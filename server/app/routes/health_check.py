@@ -1,9 +1,15 @@
 """
-Health check route for API status monitoring.
+Health check routes for API status monitoring.
+`/live` answers as long as the process can serve requests, `/ready` reports
+whether the app's dependencies are usable.
 """
 
-from flask import Blueprint
+from flask import Blueprint, current_app, request
+from sqlalchemy.exc import DBAPIError
 
+from ..utils.counters import counters
+from ..utils.health import STATUS_DOWN, get_readiness_probes
+from ..utils.profiling import get_profile_store, is_admin_request
 from ..utils.response import standard_response
 
 health_check_bp = Blueprint("health_check", __name__, url_prefix="/api/health-check")
@@ -18,3 +24,73 @@ def health_check():
     return standard_response(
         True, {"status": "API is running!"}, "Health check successful.", 200
     )
+
+
+@health_check_bp.route("/live", methods=["GET"])
+def liveness():
+    """
+    Liveness probe. Never touches the database or any other dependency.
+    """
+    return standard_response(True, {"status": "alive"}, "Process is alive.", 200)
+
+
+@health_check_bp.route("/ready", methods=["GET"])
+def readiness():
+    """
+    Readiness probe with per-component status and latency.
+    Results are cached for READINESS_CACHE_TTL seconds. Degraded components
+    still return 200; any critical component being down returns 503.
+    """
+    result = get_readiness_probes(current_app).check()
+    if result["status"] == STATUS_DOWN:
+        return standard_response(False, result, "Service is not ready.", 503)
+    return standard_response(True, result, f"Service is {result['status']}.", 200)
+
+
+@health_check_bp.route("/stats", methods=["GET"])
+def stats():
+    """
+    Operational counters (rate limiting, ...) for the worker that served
+    the request.
+    """
+    return standard_response(True, counters.snapshot(), "Counters fetched.", 200)
+
+
+@health_check_bp.route("/jobs", methods=["GET"])
+def jobs():
+    """
+    Background maintenance jobs: schedule, last run duration and status, and
+    last success, shared across workers and replicas.
+    """
+    try:
+        data = current_app.extensions["scheduler"].status()
+    except DBAPIError:
+        return standard_response(False, None, "Job history is unavailable.", 503)
+    return standard_response(True, data, "Scheduled jobs fetched.", 200)
+
+
+@health_check_bp.route("/profiles", methods=["GET"])
+def profiles():
+    """
+    Summaries of the most recent request profiles on this host, newest
+    first (`?limit=`, default 50). Requires the profiling admin token.
+    """
+    if not is_admin_request():
+        return standard_response(False, None, "Admin token required.", 403)
+    limit = request.args.get("limit", 50, type=int)
+    data = get_profile_store().list(max(1, min(limit, 500)))
+    return standard_response(True, data, "Profiles fetched.", 200)
+
+
+@health_check_bp.route("/profiles/<profile_id>", methods=["GET"])
+def profile_stacks(profile_id):
+    """
+    Collapsed stacks of one profile, for flamegraph.pl or speedscope.
+    Requires the profiling admin token.
+    """
+    if not is_admin_request():
+        return standard_response(False, None, "Admin token required.", 403)
+    collapsed = get_profile_store().collapsed(profile_id)
+    if collapsed is None:
+        return standard_response(False, None, "Profile not found.", 404)
+    return collapsed, 200, {"Content-Type": "text/plain; charset=utf-8"}
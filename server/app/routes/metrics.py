@@ -0,0 +1,241 @@
+"""
+Raw event routes.
+Ingests events with idempotency keys and lists individual metrics rows,
+newest first, with keyset pagination.
+"""
+
+from datetime import datetime, timezone
+
+from flask import Blueprint, g, request
+from marshmallow import ValidationError
+from sqlalchemy import false, func, literal_column, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+
+from app.models import Metric, db
+
+from ..utils.auth_utils import token_required
+from ..utils.counters import counters
+from ..utils.data_version import bump_data_version
+from ..utils.dimensions import DIMENSIONS, dimension_column, dimensions
+from ..utils.enrichment import get_enricher
+from ..utils.idempotency import dedup_key, get_recent_keys
+from ..utils.pagination import decode_cursor, encode_cursor
+from ..utils.response import standard_response
+from ..utils.validation import IngestSchema, MetricsQuerySchema
+
+metrics_bp = Blueprint("metrics", __name__, url_prefix="/api/metrics")
+
+
+def _naive_utc(value):
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def list_events(site_id, params, after=None):
+    """
+    One page of the site's events matching `params`, ordered by (timestamp,
+    id) descending and starting strictly after the `after` sort key. The row
+    comparison lets Postgres seek straight to the position through
+    ix_metrics_site_id_timestamp_id, so every page costs the same as the
+    first. Returns (rows, next sort key or None).
+    """
+    query = select(Metric).where(Metric.site_id == site_id)
+    for kind in DIMENSIONS:
+        if params[kind] is not None:
+            value_id = dimensions.id(kind, params[kind])
+            if value_id is None:
+                query = query.where(false())  # a name never stored
+            else:
+                query = query.where(dimension_column(kind) == value_id)
+    if params["user_id"] is not None:
+        query = query.where(Metric.user_id == params["user_id"])
+    if params["start"] is not None:
+        query = query.where(Metric.timestamp >= _naive_utc(params["start"]))
+    if params["end"] is not None:
+        query = query.where(Metric.timestamp < _naive_utc(params["end"]))
+    if after is not None:
+        query = query.where(tuple_(Metric.timestamp, Metric.id) < tuple_(*after))
+
+    limit = params["limit"]
+    rows = (
+        db.session.execute(
+            query.order_by(Metric.timestamp.desc(), Metric.id.desc()).limit(limit + 1)
+        )
+        .scalars()
+        .all()
+    )
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, (rows[-1].timestamp, rows[-1].id)
+
+
+def serialize_event(metric):
+    return {
+        "id": metric.id,
+        "timestamp": metric.timestamp.isoformat(),
+        "event_type": dimensions.name("event_type", metric.event_type_id),
+        "user_id": metric.user_id,
+        "device": dimensions.name("device", metric.device_id),
+        "location": dimensions.name("location", metric.location_id),
+        "value": metric.value,
+        "properties": metric.properties,
+    }
+
+
+@metrics_bp.route("", methods=["GET"])
+@token_required
+def get_metrics():
+    """
+    List raw events, newest first, filtered by event_type, device, location,
+    user_id and a [start, end) time range. Pass `next_cursor` from a response
+    as `cursor` to get the following page.
+    """
+    try:
+        params = MetricsQuerySchema().load(request.args)
+        after = decode_cursor(params["cursor"]) if params["cursor"] else None
+    except ValidationError as err:
+        return standard_response(False, None, err.messages, 400)
+
+    rows, next_key = list_events(g.site_id, params, after)
+    data = {
+        "events": [serialize_event(row) for row in rows],
+        "next_cursor": encode_cursor(*next_key) if next_key else None,
+    }
+    return standard_response(True, data, "Events fetched.", 200)
+
+
+def stored_dedup_keys(site_id, events):
+    """
+    Filter keys (see app.utils.idempotency.dedup_key) of `events` that the
+    site already stored, read through the unique idempotency index.
+    """
+    day = func.date_trunc(literal_column("'day'"), Metric.timestamp)
+    rows = db.session.execute(
+        select(Metric.idempotency_key, Metric.timestamp).where(
+            Metric.site_id == site_id,
+            Metric.idempotency_key.in_({event["idempotency_key"] for event in events}),
+            day.in_(
+                {
+                    datetime.combine(event["timestamp"].date(), datetime.min.time())
+                    for event in events
+                }
+            ),
+        )
+    )
+    return {dedup_key(site_id, key, timestamp) for key, timestamp in rows}
+
+
+def ingest_events(site_id, events):
+    """
+    Insert a batch of validated events for a site and return (accepted,
+    duplicates).
+    Missing device and location are derived from `user_agent` and `ip`
+    first (see app.utils.enrichment). In reject mode, keys this worker's
+    filter has seen are dropped up front once the unique index confirms
+    them (see app.utils.idempotency); everything else is inserted in one
+    statement, and the unique index silently skips keys the site stored
+    earlier the same day.
+    """
+    recent_keys = get_recent_keys()
+    enrich = get_enricher().enrich
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+
+    keyed, unkeyed = {}, []
+    for event in events:
+        enrich(event)
+        event["timestamp"] = _naive_utc(event["timestamp"]) or now
+        key = event["idempotency_key"]
+        if key is None:
+            unkeyed.append(event)
+        else:
+            keyed.setdefault(dedup_key(site_id, key, event["timestamp"]), event)
+    to_insert, seen = recent_keys.split(keyed)
+    rejected = []
+    if seen:
+        stored = stored_dedup_keys(site_id, [keyed[key] for key in seen])
+        rejected = [key for key in seen if key in stored]
+        to_insert += [key for key in seen if key not in stored]
+        counters.incr("ingest.bloom_false_positives", len(seen) - len(rejected))
+
+    batch = unkeyed + [keyed[key] for key in to_insert]
+    ids = {
+        kind: dimensions.ids(kind, {event[kind] for event in batch}, create=True)
+        for kind in DIMENSIONS
+    }
+    rows = [
+        {
+            "site_id": site_id,
+            "timestamp": event["timestamp"],
+            "event_type_id": ids["event_type"][event["event_type"]],
+            "user_id": event["user_id"],
+            "device_id": ids["device"][event["device"]],
+            "location_id": ids["location"][event["location"]],
+            "value": event["value"],
+            "properties": event["properties"],
+            "idempotency_key": event["idempotency_key"],
+        }
+        for event in batch
+    ]
+    inserted_keys = []
+    if rows:
+        statement = (
+            insert(Metric)
+            .values(rows)
+            .on_conflict_do_nothing(
+                # Must match the index expression exactly, so no bound param.
+                index_elements=[
+                    Metric.site_id,
+                    Metric.idempotency_key,
+                    func.date_trunc(literal_column("'day'"), Metric.timestamp),
+                ],
+                index_where=Metric.idempotency_key.isnot(None),
+            )
+            .returning(Metric.idempotency_key, Metric.timestamp)
+        )
+        inserted = db.session.execute(statement).all()
+        db.session.commit()
+        if inserted:
+            bump_data_version(db.session)
+        inserted_keys = [
+            dedup_key(site_id, key, timestamp)
+            for key, timestamp in inserted
+            if key is not None
+        ]
+    recent_keys.remember(to_insert, inserted_keys)
+
+    accepted = len(unkeyed) + len(inserted_keys)
+    duplicates = len(events) - accepted
+    counters.incr("ingest.accepted", accepted)
+    counters.incr("ingest.duplicates", duplicates)
+    counters.incr("ingest.rejected_by_filter", len(rejected))
+    return accepted, duplicates
+
+
+@metrics_bp.route("", methods=["POST"])
+@token_required
+def post_metrics():
+    """
+    Ingest a batch of up to 1000 events into the request's site. Events
+    with an `idempotency_key` the site already stored for the same UTC day
+    are counted as duplicates and not stored again, so clients can safely
+    retry.
+    """
+    try:
+        data = IngestSchema().load(request.get_json(silent=True) or {})
+    except ValidationError as err:
+        return standard_response(False, None, err.messages, 400)
+
+    try:
+        accepted, duplicates = ingest_events(g.site_id, data["events"])
+    except IntegrityError:
+        db.session.rollback()
+        return standard_response(False, None, "Unknown user_id in batch.", 400)
+    return standard_response(
+        True,
+        {"accepted": accepted, "duplicates": duplicates},
+        "Events ingested.",
+        201,
+    )
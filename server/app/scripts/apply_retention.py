@@ -0,0 +1,49 @@
+import argparse
+
+from app import create_app
+from app.analytics.jobs import REFRESHED_WATERMARKS
+from app.analytics.retention import apply_retention as apply
+from app.models import db
+
+
+def apply_retention():
+    """
+    Downsample raw metrics older than the retention window into daily rollups
+    and delete them in small, throttled batches. Resumable and safe to run
+    while the API is serving traffic.
+    """
+    app = create_app()
+    parser = argparse.ArgumentParser(description=apply_retention.__doc__)
+    parser.add_argument(
+        "--days", type=int, default=app.config["METRICS_RETENTION_DAYS"]
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=app.config["RETENTION_BATCH_SIZE"]
+    )
+    parser.add_argument(
+        "--sleep",
+        type=float,
+        default=app.config["RETENTION_BATCH_SLEEP"],
+        help="Seconds to pause between batches",
+    )
+    parser.add_argument("--max-batches", type=int, default=None)
+    args = parser.parse_args()
+
+    with app.app_context():
+        deleted, elapsed = apply(
+            db.session,
+            args.days,
+            REFRESHED_WATERMARKS,
+            batch_size=args.batch_size,
+            sleep=args.sleep,
+            max_batches=args.max_batches,
+        )
+    rate = deleted / elapsed if elapsed else 0
+    print(
+        f"Retention done: {deleted} rows removed in {elapsed:.1f}s "
+        f"({rate:.0f} rows/s)"
+    )
+
+
+if __name__ == "__main__":
+    apply_retention()
@@ -0,0 +1,115 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from app.utils.enrichment import (
+    LOCATIONS,
+    Enricher,
+    IPRangeTable,
+    classify_user_agent,
+    write_ip_table,
+)
+
+USER_AGENT_TEMPLATES = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/{v}.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 "
+    "(KHTML, like Gecko) Version/17.{v} Safari/605.1.15",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_{v} like Mac OS X) "
+    "AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148",
+    "Mozilla/5.0 (Linux; Android 14; Pixel {v}) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0.0.0 Mobile Safari/537.36",
+    "Mozilla/5.0 (X11; Linux x86_64; rv:{v}.0) Gecko/20100101 Firefox/{v}.0",
+    "curl/8.{v}.0",
+]
+
+
+def synthetic_table(path, ranges):
+    """
+    Write a table of `ranges` random, non-overlapping IPv4 ranges
+    (real IP-to-country tables hold a few hundred thousand).
+    """
+    bounds = sorted(random.sample(range(2**32), 2 * ranges))
+    v4 = [
+        (bounds[i], bounds[i + 1], random.choice(LOCATIONS[:-1]))
+        for i in range(0, len(bounds), 2)
+    ]
+    v6 = [
+        (
+            (0x2001 << 112 | i << 80).to_bytes(16, "big"),
+            (0x2001 << 112 | i << 80 | (1 << 80) - 1).to_bytes(16, "big"),
+            random.choice(LOCATIONS[:-1]),
+        )
+        for i in range(ranges // 10)
+    ]
+    write_ip_table(path, v4, v6)
+
+
+def synthetic_events(count, user_agents, ipv6_share):
+    agents = [
+        random.choice(USER_AGENT_TEMPLATES).format(v=i) for i in range(user_agents)
+    ]
+    events = []
+    for _ in range(count):
+        if random.random() < ipv6_share:
+            ip = f"2001:0:{random.randrange(65536):x}::{random.randrange(65536):x}"
+        else:
+            ip = ".".join(str(random.randrange(256)) for _ in range(4))
+        events.append(
+            {
+                "device": None,
+                "location": None,
+                "user_agent": random.choice(agents),
+                "ip": ip,
+            }
+        )
+    return events
+
+
+def _events_per_second(fn, events):
+    started = time.perf_counter()
+    for event in events:
+        fn(event)
+    return len(events) / (time.perf_counter() - started)
+
+
+def bench_enrichment():
+    """
+    Measure ingest enrichment throughput (events/sec on one core) for
+    User-Agent classification and IP range lookups. Uses --table if given,
+    otherwise a synthetic table of --ranges IPv4 ranges.
+    """
+    parser = argparse.ArgumentParser(description=bench_enrichment.__doc__)
+    parser.add_argument("--table", help="IP range table (default: synthetic)")
+    parser.add_argument("--ranges", type=int, default=300_000)
+    parser.add_argument("--events", type=int, default=500_000)
+    parser.add_argument("--user-agents", type=int, default=2_000)
+    parser.add_argument("--ipv6-share", type=float, default=0.1)
+    args = parser.parse_args()
+
+    path = args.table
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), "ip-ranges.bin")
+        synthetic_table(path, args.ranges)
+    table = IPRangeTable(path)
+    enricher = Enricher(table)
+    events = synthetic_events(args.events, args.user_agents, args.ipv6_share)
+    print(f"{len(events):,} events, {args.user_agents:,} distinct User-Agents")
+    print(f"{table.ranges:,} IP ranges in {path}")
+
+    classify_user_agent.cache_clear()
+    user_agent = _events_per_second(
+        lambda event: classify_user_agent(event["user_agent"]), events
+    )
+    ip = _events_per_second(lambda event: table.lookup(event["ip"]), events)
+    full = _events_per_second(lambda event: enricher.enrich(dict(event)), events)
+    print(f"  {'User-Agent only':<18} {user_agent:>12,.0f} events/s")
+    print(f"  {'IP only':<18} {ip:>12,.0f} events/s")
+    print(f"  {'enrich()':<18} {full:>12,.0f} events/s")
+    print(f"  User-Agent cache: {classify_user_agent.cache_info()}")
+
+
+if __name__ == "__main__":
+    bench_enrichment()
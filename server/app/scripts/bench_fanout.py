@@ -0,0 +1,127 @@
+import argparse
+import statistics
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import func, select
+
+from app import create_app
+from app.models import Metric, db
+from app.models.site import DEFAULT_SITE_ID
+from app.routes.dashboard import total_users_chart_data
+from app.scripts.bench_metrics_pagination import populate
+from app.utils.dimensions import dimensions
+from app.utils.fanout import fan_out, month_chunks
+
+
+def months_back(end, months):
+    """
+    First day of the month `months - 1` months before `end`'s month.
+    """
+    year, month = end.year, end.month - (months - 1)
+    while month < 1:
+        year, month = year - 1, month + 12
+    return datetime(year, month, 1)
+
+
+def monthly_counts_single(event_type_id, start, end):
+    month = func.date_trunc("month", Metric.timestamp)
+    rows = db.session.execute(
+        select(month, func.count(Metric.id))
+        .where(
+            Metric.event_type_id == event_type_id,
+            Metric.timestamp >= start,
+            Metric.timestamp < end,
+        )
+        .group_by(month)
+    ).all()
+    return {month_start: count for month_start, count in rows if count}
+
+
+def monthly_counts_fan_out(event_type_id, start, end, concurrency):
+    chunks = month_chunks(start, end)
+
+    def statement_for(chunk_start, chunk_end):
+        return select(func.count(Metric.id)).where(
+            Metric.event_type_id == event_type_id,
+            Metric.timestamp >= chunk_start,
+            Metric.timestamp < chunk_end,
+        )
+
+    results = fan_out(chunks, statement_for, 600_000, concurrency)
+    return {
+        chunk_start: rows[0][0]
+        for (chunk_start, _), rows in zip(chunks, results)
+        if rows[0][0]
+    }
+
+
+def _median_ms(fn, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - started) * 1000)
+        db.session.rollback()
+    return statistics.median(timings), result
+
+
+def bench_fanout():
+    """
+    Compare long-range aggregates run as one statement with the same
+    aggregate split into monthly chunks on parallel connections: page views
+    per month over --months, and the total-users (registrations) chart.
+    Use --populate to grow metrics to --rows synthetic events first.
+    """
+    parser = argparse.ArgumentParser(description=bench_fanout.__doc__)
+    parser.add_argument("--months", type=int, default=24)
+    parser.add_argument("--concurrency", default="2,4,8")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--rows", type=int, default=50_000_000)
+    parser.add_argument("--populate", action="store_true")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        if args.populate:
+            populate(args.rows)
+        page_view = dimensions.id("event_type", "page_view")
+        end = datetime.now(timezone.utc).replace(tzinfo=None)
+        start = months_back(end, args.months)
+
+        print(f"page views per month, {args.months} months from {start.date()}")
+        single, expected = _median_ms(
+            lambda: monthly_counts_single(page_view, start, end), args.repeat
+        )
+        print(f"  {'single statement':<22} {single:>10.1f} ms")
+        for concurrency in (int(value) for value in args.concurrency.split(",")):
+            elapsed, result = _median_ms(
+                lambda: monthly_counts_fan_out(page_view, start, end, concurrency),
+                args.repeat,
+            )
+            check = "" if result == expected else "  MISMATCH"
+            print(
+                f"  {f'fan-out x{concurrency}':<22} {elapsed:>10.1f} ms "
+                f"({single / elapsed:.1f}x){check}"
+            )
+
+        print("total-users chart (this year and last year)")
+        single, expected = _median_ms(
+            lambda: total_users_chart_data(DEFAULT_SITE_ID, {}, parallel=False),
+            args.repeat,
+        )
+        parallel, result = _median_ms(
+            lambda: total_users_chart_data(DEFAULT_SITE_ID, {}, parallel=True),
+            args.repeat,
+        )
+        check = "" if result == expected else "  MISMATCH"
+        print(f"  {'single statements':<22} {single:>10.1f} ms")
+        print(
+            f"  {'fan-out':<22} {parallel:>10.1f} ms "
+            f"({single / parallel:.1f}x){check}"
+        )
+
+
+if __name__ == "__main__":
+    bench_fanout()
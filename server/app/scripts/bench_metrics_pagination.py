@@ -0,0 +1,131 @@
+import argparse
+import statistics
+import time
+
+from sqlalchemy import select, text
+
+from app import create_app
+from app.models import Metric, db
+from app.models.site import DEFAULT_SITE_ID
+from app.routes.metrics import list_events
+from app.utils.dimensions import dimensions
+
+POPULATE_SQL = text(
+    """
+    INSERT INTO metrics (timestamp, event_type_id, device_id, location_id, value)
+    SELECT now() - random() * interval '365 days',
+           (CAST(:event_type_ids AS smallint[]))[1 + floor(random() * 4)::int],
+           (CAST(:device_ids AS smallint[]))[1 + floor(random() * 5)::int],
+           (CAST(:location_ids AS smallint[]))[1 + floor(random() * 4)::int],
+           1.0
+    FROM generate_series(1, :rows)
+    """
+)
+
+NO_FILTERS = {
+    "event_type": None,
+    "device": None,
+    "location": None,
+    "user_id": None,
+    "start": None,
+    "end": None,
+}
+
+
+def populate(target, chunk=1_000_000):
+    """
+    Insert synthetic page views until metrics holds about `target` rows.
+    """
+    names = {
+        "event_type": ["page_view", "page_view", "page_view", "user_login"],
+        "device": ["Windows", "Mac", "iOS", "Android", "Linux"],
+        "location": ["United States", "Canada", "Mexico", "Other"],
+    }
+    ids = {
+        f"{kind}_ids": [dimensions.id(kind, name, create=True) for name in values]
+        for kind, values in names.items()
+    }
+    existing = db.session.execute(text("SELECT count(*) FROM metrics")).scalar()
+    while existing < target:
+        rows = min(chunk, target - existing)
+        db.session.execute(POPULATE_SQL, {"rows": rows, **ids})
+        db.session.commit()
+        existing += rows
+        print(f"  metrics: {existing:,} rows")
+    db.session.execute(text("ANALYZE metrics"))
+    db.session.commit()
+    return existing
+
+
+def _median_ms(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+        db.session.rollback()
+    return statistics.median(timings)
+
+
+def bench_metrics_pagination():
+    """
+    Compare page latency of GET /api/metrics keyset pagination with
+    OFFSET pagination at increasing page depths. Use --populate to grow the
+    metrics table to --rows synthetic events first (50M by default).
+    """
+    parser = argparse.ArgumentParser(description=bench_metrics_pagination.__doc__)
+    parser.add_argument("--rows", type=int, default=50_000_000)
+    parser.add_argument("--populate", action="store_true")
+    parser.add_argument("--depths", default="0,10000,1000000,10000000,40000000")
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--skip-offset", action="store_true", help="Only time keyset pages"
+    )
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        if args.populate:
+            populate(args.rows)
+        total = db.session.execute(text("SELECT count(*) FROM metrics")).scalar()
+        print(f"metrics: {total:,} rows, page size {args.limit}")
+        print(f"  {'depth':>12} {'keyset ms':>10} {'offset ms':>10}")
+
+        params = {**NO_FILTERS, "limit": args.limit}
+        ordered = (
+            select(Metric)
+            .where(Metric.site_id == DEFAULT_SITE_ID)
+            .order_by(Metric.timestamp.desc(), Metric.id.desc())
+        )
+        for depth in (int(value) for value in args.depths.split(",")):
+            if depth >= total:
+                continue
+            # Sort key of the row just before the page (setup, not timed).
+            after = None
+            if depth:
+                after = db.session.execute(
+                    select(Metric.timestamp, Metric.id)
+                    .where(Metric.site_id == DEFAULT_SITE_ID)
+                    .order_by(Metric.timestamp.desc(), Metric.id.desc())
+                    .offset(depth - 1)
+                    .limit(1)
+                ).one()
+            keyset = _median_ms(
+                lambda: list_events(DEFAULT_SITE_ID, params, after), args.repeat
+            )
+
+            offset = None
+            if not args.skip_offset:
+                offset = _median_ms(
+                    lambda: db.session.execute(
+                        ordered.offset(depth).limit(args.limit)
+                    ).all(),
+                    args.repeat,
+                )
+            offset_ms = f"{offset:>10.1f}" if offset is not None else f"{'-':>10}"
+            print(f"  {depth:>12,} {keyset:>10.1f} {offset_ms}")
+
+
+if __name__ == "__main__":
+    bench_metrics_pagination()
@@ -0,0 +1,222 @@
+import argparse
+import json
+import statistics
+import time
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import event, extract, func
+
+from app import create_app
+from app.models import Metric, MetricRollup, db
+from app.models.site import DEFAULT_SITE_ID
+from app.routes.dashboard import (
+    REGISTRATIONS_BY_MONTH_STATEMENTS,
+    ROLLED_UP_REGISTRATIONS_BY_MONTH,
+    TRAFFIC_BY_DEVICE_STATEMENTS,
+    TRAFFIC_BY_LOCATION_STATEMENTS,
+    year_params,
+)
+from app.scripts.bench_metrics_pagination import populate
+from app.utils.counters import counters
+from app.utils.dimensions import dimensions
+from app.utils.prepared import execute_all
+
+EXPLAIN = "EXPLAIN (ANALYZE, SUMMARY, FORMAT JSON) "
+
+
+def orm_traffic(column, page_view, since):
+    """
+    The ORM query the traffic charts built on every request.
+    """
+    return (
+        db.session.query(column, func.count(Metric.id).label("traffic"))
+        .filter(
+            Metric.event_type_id == page_view,
+            Metric.timestamp >= since,
+            column.isnot(None),
+        )
+        .group_by(column)
+        .order_by(func.count(Metric.id).desc())
+    )
+
+
+def orm_registrations(year, registration_id):
+    return (
+        db.session.query(
+            func.to_char(Metric.timestamp, "Mon").label("month"),
+            func.count(Metric.id).label("count"),
+        )
+        .filter(
+            Metric.event_type_id == registration_id,
+            extract("year", Metric.timestamp) == year,
+        )
+        .group_by(
+            func.to_char(Metric.timestamp, "Mon"), extract("month", Metric.timestamp)
+        )
+        .order_by(extract("month", Metric.timestamp))
+    )
+
+
+def orm_rolled_up(year):
+    return (
+        db.session.query(
+            func.to_char(MetricRollup.day, "Mon").label("month"),
+            func.sum(MetricRollup.events).label("count"),
+        )
+        .filter(
+            MetricRollup.event_type == "new_registration",
+            extract("year", MetricRollup.day) == year,
+        )
+        .group_by(func.to_char(MetricRollup.day, "Mon"))
+    )
+
+
+def views():
+    """
+    (name, ORM queries, prepared calls) for the unfiltered hot views; each
+    list is what one response runs.
+    """
+    page_view = dimensions.id("event_type", "page_view")
+    registration_id = dimensions.id("event_type", "new_registration")
+    since = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=30)
+    this_year = datetime.now(timezone.utc).year
+    years = [this_year, this_year - 1]
+    traffic = {"site_id": DEFAULT_SITE_ID, "event_type_id": page_view, "since": since}
+    return [
+        (
+            "traffic by device",
+            lambda: [orm_traffic(Metric.device_id, page_view, since)],
+            [(TRAFFIC_BY_DEVICE_STATEMENTS[False], traffic)],
+        ),
+        (
+            "traffic by location",
+            lambda: [orm_traffic(Metric.location_id, page_view, since)],
+            [(TRAFFIC_BY_LOCATION_STATEMENTS[False], traffic)],
+        ),
+        (
+            "total users",
+            lambda: [orm_registrations(year, registration_id) for year in years]
+            + [orm_rolled_up(year) for year in years],
+            [
+                (
+                    REGISTRATIONS_BY_MONTH_STATEMENTS[False],
+                    {
+                        "site_id": DEFAULT_SITE_ID,
+                        "event_type_id": registration_id,
+                        **year_params(year),
+                    },
+                )
+                for year in years
+            ]
+            + [
+                (
+                    ROLLED_UP_REGISTRATIONS_BY_MONTH,
+                    {"site_id": DEFAULT_SITE_ID, **year_params(year, date)},
+                )
+                for year in years
+            ],
+        ),
+    ]
+
+
+def _plan(value):
+    return (json.loads(value) if isinstance(value, str) else value)[0]
+
+
+def orm_planning_ms(query):
+    compiled = query.statement.compile(dialect=db.engine.dialect)
+    plan = (
+        db.session.connection()
+        .exec_driver_sql(EXPLAIN + str(compiled), compiled.params)
+        .scalar()
+    )
+    return _plan(plan)["Planning Time"]
+
+
+def prepared_planning_ms(statement, params):
+    execute_all([(statement, params)])
+    dbapi_connection = db.session.connection().connection.dbapi_connection
+    with dbapi_connection.cursor() as cursor:
+        cursor.execute(EXPLAIN + statement.execute_sql, statement.values(params))
+        return _plan(cursor.fetchone()[0])["Planning Time"]
+
+
+def _measure(run, round_trips, repeat):
+    """
+    Median ms and round trips per response over `repeat` runs.
+    """
+    timings = []
+    trips = []
+    for _ in range(repeat):
+        before = round_trips()
+        started = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - started) * 1000)
+        trips.append(round_trips() - before)
+        db.session.rollback()
+    return statistics.median(timings), statistics.median(trips)
+
+
+def bench_prepared():
+    """
+    Compare the hot dashboard queries built as ORM queries on every request
+    with the same queries as server-side prepared statements: response
+    time, network round trips per response and Postgres planning time.
+    Planning time is measured after --repeat runs, so the prepared side
+    shows the cached plan, unless the site gets custom plans (see
+    app.utils.prepared). Use --populate to grow metrics first.
+    """
+    parser = argparse.ArgumentParser(description=bench_prepared.__doc__)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--populate", action="store_true")
+    args = parser.parse_args()
+
+    app = create_app()
+    app.config["PREPARED_STATEMENTS"] = True
+    with app.app_context():
+        if args.populate:
+            populate(args.rows)
+
+        statements = 0
+
+        @event.listens_for(db.engine, "before_cursor_execute")
+        def count(*_):
+            nonlocal statements
+            statements += 1
+
+        driver = type(db.engine.dialect).__module__.rsplit(".", 1)[-1]
+        print(f"driver: {driver}, {args.repeat} runs per view")
+        print(
+            f"  {'view':<20} {'path':<9} {'ms':>8} {'round trips':>12} "
+            f"{'planning ms':>12}"
+        )
+        for name, orm_queries, calls in views():
+            results = {}
+            orm_ms, orm_trips = _measure(
+                lambda: [query.all() for query in orm_queries()],
+                lambda: statements,
+                args.repeat,
+            )
+            results["orm"] = orm_ms, orm_trips, sum(
+                orm_planning_ms(query) for query in orm_queries()
+            )
+            db.session.rollback()
+            prepared_ms, prepared_trips = _measure(
+                lambda: execute_all(calls),
+                lambda: counters.get("prepared.round_trips"),
+                args.repeat,
+            )
+            results["prepared"] = prepared_ms, prepared_trips, sum(
+                prepared_planning_ms(statement, params) for statement, params in calls
+            )
+            db.session.rollback()
+            for path, (elapsed, trips, planning) in results.items():
+                print(
+                    f"  {name:<20} {path:<9} {elapsed:>8.2f} {trips:>12g} "
+                    f"{planning:>12.3f}"
+                )
+
+
+if __name__ == "__main__":
+    bench_prepared()
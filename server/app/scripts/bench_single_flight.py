@@ -0,0 +1,119 @@
+import argparse
+import multiprocessing
+import tempfile
+import threading
+import time
+
+from sqlalchemy import event
+
+from app import create_app
+from app.models import db
+from app.models.site import DEFAULT_SITE_ID
+from app.routes.dashboard import traffic_by_device_data
+from app.utils.counters import counters
+from app.utils.single_flight import FileSingleFlight, SingleFlight
+
+
+class NoFlight:
+    def do(self, key, fn):
+        return fn(), False
+
+
+def _flights(mode, directory):
+    if mode == "host":
+        return FileSingleFlight(directory)
+    if mode == "process":
+        return SingleFlight()
+    return NoFlight()
+
+
+def _herd(mode, directory, threads, start_barrier, results):
+    """
+    One worker process: `threads` requests for the same chart released at
+    once. Puts (queries executed, slowest request in seconds) on `results`.
+    """
+    app = create_app()
+    flights = _flights(mode, directory)
+    queries = 0
+    latencies = []
+    lock = threading.Lock()
+
+    with app.app_context():
+
+        @event.listens_for(db.engine, "before_cursor_execute")
+        def count(conn, cursor, statement, *args):
+            nonlocal queries
+            if statement.lstrip().upper().startswith("SELECT"):
+                with lock:
+                    queries += 1
+
+    thread_barrier = threading.Barrier(threads)
+
+    def request():
+        with app.app_context():
+            thread_barrier.wait()
+            started = time.perf_counter()
+            flights.do(
+                "traffic_by_device",
+                lambda: traffic_by_device_data(DEFAULT_SITE_ID, {}),
+            )
+            with lock:
+                latencies.append(time.perf_counter() - started)
+            db.session.remove()
+
+    # Prepared statements bypass SQLAlchemy's cursor events.
+    executes = counters.get("prepared.executes")
+    start_barrier.wait()
+    workers = [threading.Thread(target=request) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    queries += counters.get("prepared.executes") - executes
+    results.put((int(queries), max(latencies)))
+
+
+def bench_single_flight():
+    """
+    Thundering-herd benchmark: release many identical traffic-by-device
+    requests at once across several worker processes and count how many
+    aggregate queries reach Postgres with and without request coalescing.
+    """
+    parser = argparse.ArgumentParser(description=bench_single_flight.__doc__)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=25)
+    parser.add_argument(
+        "--modes", default="off,process,host", help="Comma-separated modes to run"
+    )
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("fork")
+    total = args.processes * args.threads
+    print(f"{total} concurrent requests ({args.processes} x {args.threads} threads)")
+    for mode in args.modes.split(","):
+        directory = tempfile.mkdtemp(prefix="single-flight-bench-")
+        start_barrier = context.Barrier(args.processes)
+        results = context.Queue()
+        processes = [
+            context.Process(
+                target=_herd,
+                args=(mode, directory, args.threads, start_barrier, results),
+            )
+            for _ in range(args.processes)
+        ]
+        for process in processes:
+            process.start()
+        outcomes = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+        queries = sum(q for q, _ in outcomes)
+        slowest = max(latency for _, latency in outcomes)
+        print(
+            f"  {mode:<8} {queries:>5} queries for {total} requests, "
+            f"slowest request {slowest * 1000:.0f} ms"
+        )
+
+
+if __name__ == "__main__":
+    bench_single_flight()
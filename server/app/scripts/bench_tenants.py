@@ -0,0 +1,183 @@
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, text
+from sqlalchemy.dialects.postgresql import insert
+
+from app import create_app
+from app.models import Site, db
+from app.routes.dashboard import (
+    TRAFFIC_BY_DEVICE_STATEMENTS,
+    total_users_chart_data,
+    traffic_by_device_data,
+)
+from app.routes.metrics import list_events
+from app.scripts.bench_metrics_pagination import NO_FILTERS
+from app.utils.dimensions import dimensions
+
+SITE_PREFIX = "bench-site-"
+
+POPULATE_SQL = text(
+    """
+    INSERT INTO metrics
+        (site_id, timestamp, event_type_id, device_id, location_id, value)
+    SELECT :site_id,
+           now() - random() * interval '365 days',
+           (CAST(:event_type_ids AS smallint[]))[1 + floor(random() * 5)::int],
+           (CAST(:device_ids AS smallint[]))[1 + floor(random() * 5)::int],
+           (CAST(:location_ids AS smallint[]))[1 + floor(random() * 4)::int],
+           1.0
+    FROM generate_series(1, :rows)
+    """
+)
+
+SITE_ROWS_SQL = text("SELECT site_id, count(*) AS events FROM metrics GROUP BY 1")
+
+EXPLAIN = "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) "
+
+
+def zipf_shares(total, sites, exponent):
+    """
+    Rows per site when the site of rank k gets a share proportional to
+    1 / k ** exponent, largest first.
+    """
+    weights = [1 / rank**exponent for rank in range(1, sites + 1)]
+    return [max(1, round(total * weight / sum(weights))) for weight in weights]
+
+
+def populate(total, sites, exponent, chunk=1_000_000):
+    """
+    Create `sites` benchmark sites and insert about `total` synthetic events
+    split between them with Zipf-skewed sizes.
+    """
+    names = {
+        "event_type": [
+            "page_view",
+            "page_view",
+            "page_view",
+            "user_login",
+            "new_registration",
+        ],
+        "device": ["Windows", "Mac", "iOS", "Android", "Linux"],
+        "location": ["United States", "Canada", "Mexico", "Other"],
+    }
+    ids = {
+        f"{kind}_ids": [dimensions.id(kind, name, create=True) for name in values]
+        for kind, values in names.items()
+    }
+    site_names = [f"{SITE_PREFIX}{rank}" for rank in range(1, sites + 1)]
+    db.session.execute(
+        insert(Site)
+        .values([{"name": name} for name in site_names])
+        .on_conflict_do_nothing(index_elements=[Site.name])
+    )
+    site_ids = dict(
+        db.session.execute(
+            select(Site.name, Site.id).where(Site.name.in_(site_names))
+        ).all()
+    )
+    for name, rows in zip(site_names, zipf_shares(total, sites, exponent)):
+        for offset in range(0, rows, chunk):
+            db.session.execute(
+                POPULATE_SQL,
+                {"site_id": site_ids[name], "rows": min(chunk, rows - offset), **ids},
+            )
+            db.session.commit()
+        print(f"  {name}: {rows:,} rows")
+    db.session.execute(text("ANALYZE metrics"))
+    db.session.commit()
+
+
+def _median_ms(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+        db.session.rollback()
+    return statistics.median(timings)
+
+
+def traffic_buffers(site_id):
+    """
+    Shared buffers (hit + read) the traffic-by-device statement touches for
+    a site, and whether its plan reads the metrics heap sequentially.
+    """
+    statement = TRAFFIC_BY_DEVICE_STATEMENTS[False]
+    params = {
+        "site_id": site_id,
+        "event_type_id": dimensions.id("event_type", "page_view"),
+        "since": datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=30),
+    }
+    value = db.session.execute(text(EXPLAIN + statement.sql), params).scalar()
+    plan = (json.loads(value) if isinstance(value, str) else value)[0]["Plan"]
+    db.session.rollback()
+    return (
+        plan["Shared Hit Blocks"] + plan["Shared Read Blocks"],
+        '"Seq Scan"' in json.dumps(plan),
+    )
+
+
+def bench_tenants():
+    """
+    Check that a small site's dashboard does not pay for large sites. With
+    --populate, creates --sites benchmark sites and inserts --rows events
+    split with Zipf-skewed sizes (--skew), so one site holds most rows.
+    Then times the traffic-by-device and total-users charts and the first
+    page of GET /api/metrics for the smallest and the largest site, and
+    reports the buffers the traffic query touches for each. With indexes
+    leading with site_id, the small site's numbers track its own size.
+    """
+    parser = argparse.ArgumentParser(description=bench_tenants.__doc__)
+    parser.add_argument("--populate", action="store_true")
+    parser.add_argument("--rows", type=int, default=20_000_000)
+    parser.add_argument("--sites", type=int, default=50)
+    parser.add_argument("--skew", type=float, default=1.2)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        if args.populate:
+            populate(args.rows, args.sites, args.skew)
+        sizes = dict(db.session.execute(SITE_ROWS_SQL).all())
+        db.session.rollback()
+        if len(sizes) < 2:
+            print("Fewer than two sites have events; use --populate.")
+            return
+        small = min(sizes, key=sizes.get)
+        large = max(sizes, key=sizes.get)
+        print(
+            f"metrics: {sum(sizes.values()):,} rows in {len(sizes)} sites; "
+            f"smallest site {small} ({sizes[small]:,} rows), "
+            f"largest site {large} ({sizes[large]:,} rows)"
+        )
+
+        queries = [
+            ("traffic by device", lambda site_id: traffic_by_device_data(site_id, {})),
+            (
+                "total users",
+                lambda site_id: total_users_chart_data(site_id, {}, parallel=False),
+            ),
+            (
+                "metrics first page",
+                lambda site_id: list_events(site_id, {**NO_FILTERS, "limit": 100}),
+            ),
+        ]
+        print(f"  {'query':<22} {'small ms':>10} {'large ms':>10}")
+        for name, query in queries:
+            small_ms = _median_ms(lambda: query(small), args.repeat)
+            large_ms = _median_ms(lambda: query(large), args.repeat)
+            print(f"  {name:<22} {small_ms:>10.1f} {large_ms:>10.1f}")
+
+        for label, site_id in (("small", small), ("large", large)):
+            buffers, seq_scan = traffic_buffers(site_id)
+            scan = " (sequential scan of metrics)" if seq_scan else ""
+            print(f"  traffic buffers, {label} site: {buffers:,}{scan}")
+
+
+if __name__ == "__main__":
+    bench_tenants()
@@ -0,0 +1,96 @@
+import argparse
+import csv
+import ipaddress
+
+from app.utils.enrichment import IPRangeTable, write_ip_table
+
+# Country codes or names in the source data, mapped to dashboard locations.
+COUNTRIES = {
+    "US": "United States",
+    "UNITED STATES": "United States",
+    "CA": "Canada",
+    "CANADA": "Canada",
+    "MX": "Mexico",
+    "MEXICO": "Mexico",
+}
+
+
+def _address(value):
+    value = value.strip()
+    if value.isdigit():
+        number = int(value)
+        if number < 2**32:
+            return ipaddress.IPv4Address(number)
+        return ipaddress.IPv6Address(number)
+    return ipaddress.ip_address(value)
+
+
+def _merge(ranges):
+    """
+    Sort ranges, drop "Other" (the lookup default) and join ranges that
+    touch and share a location. Overlapping ranges are an error.
+    """
+    merged = []
+    previous_end = -1
+    for start, end, location in sorted(ranges):
+        if start <= previous_end:
+            raise ValueError(f"Overlapping ranges at {start}")
+        previous_end = end
+        if location == "Other":
+            continue
+        if merged and merged[-1][2] == location and start == merged[-1][1] + 1:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end, location])
+    return merged
+
+
+def read_ranges(path):
+    """
+    Read `start,end,country` rows (addresses as text or integers; extra
+    columns ignored) into (IPv4, IPv6) range lists of ints.
+    """
+    v4, v6 = [], []
+    with open(path, newline="") as f:
+        for row in csv.reader(f):
+            if len(row) < 3 or row[0].startswith("#"):
+                continue
+            try:
+                start, end = _address(row[0]), _address(row[1])
+            except ValueError:
+                continue  # header line
+            location = COUNTRIES.get(row[2].strip().upper(), "Other")
+            if start.version != end.version or int(start) > int(end):
+                raise ValueError(f"Bad range: {row[0]} - {row[1]}")
+            target = v4 if start.version == 4 else v6
+            target.append((int(start), int(end), location))
+    return _merge(v4), _merge(v6)
+
+
+def build_ip_table():
+    """
+    Build the memory-mapped IP range table used by ingest enrichment
+    (ENRICH_IP_TABLE) from a CSV of IP ranges and country codes, e.g. a
+    free IP-to-country database export.
+    """
+    parser = argparse.ArgumentParser(description=build_ip_table.__doc__)
+    parser.add_argument("source", help="CSV with start_ip,end_ip,country rows")
+    parser.add_argument("output", help="Table file to write")
+    args = parser.parse_args()
+
+    v4, v6 = read_ranges(args.source)
+    packed_v6 = [
+        (start.to_bytes(16, "big"), end.to_bytes(16, "big"), location)
+        for start, end, location in v6
+    ]
+    write_ip_table(args.output, v4, packed_v6)
+    IPRangeTable(args.output)  # validates the header
+
+    print(f"Wrote {args.output}: {len(v4):,} IPv4 and {len(v6):,} IPv6 ranges")
+    for location in sorted({location for _, _, location in v4 + v6}):
+        count = sum(1 for _, _, name in v4 + v6 if name == location)
+        print(f"  {location}: {count:,}")
+
+
+if __name__ == "__main__":
+    build_ip_table()
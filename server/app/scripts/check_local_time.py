@@ -0,0 +1,201 @@
+import argparse
+import sys
+from bisect import bisect_right
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import select, text
+
+from app import create_app
+from app.analytics.local_time import (
+    local_period_counts,
+    period_boundaries,
+    refresh_quarter_hours,
+)
+from app.models import EventType, db
+from app.models.site import DEFAULT_SITE_ID
+
+# DST at 02:00 or 01:00 UTC, DST at midnight, a 30-minute DST shift, no DST,
+# and offsets of :30 and :45.
+ZONES = [
+    "America/New_York",
+    "Europe/London",
+    "America/Santiago",
+    "America/Havana",
+    "Australia/Lord_Howe",
+    "America/St_Johns",
+    "Asia/Kolkata",
+    "Asia/Kathmandu",
+    "Pacific/Chatham",
+    "UTC",
+]
+# Not a divisor of 15 minutes, so every second-of-bucket position is hit.
+STEP = timedelta(minutes=7, seconds=13)
+WINDOW = timedelta(days=2)
+
+EXACT_DAILY_COUNTS_SQL = text(
+    """
+    SELECT date_trunc('day', timezone(:tz, timezone('UTC', timestamp)))::date AS day,
+           count(*) AS events
+    FROM metrics
+    WHERE site_id = :site_id
+      AND event_type_id = :event_type_id
+      AND timestamp >= :start AND timestamp < :end
+    GROUP BY 1
+    """
+)
+
+
+def quarter_hour(instant):
+    """
+    Python equivalent of the refresh's date_bin('15 minutes', ...).
+    """
+    return instant.replace(minute=instant.minute - instant.minute % 15, second=0)
+
+
+def transitions(zone, year):
+    """
+    Naive-UTC instants in `year` at which `zone` changes its UTC offset.
+    """
+    found = []
+    instant = datetime(year, 1, 1)
+    offset = instant.replace(tzinfo=timezone.utc).astimezone(zone).utcoffset()
+    while instant.year == year:
+        # Offsets only change on the quarter hour.
+        instant += timedelta(minutes=15)
+        current = instant.replace(tzinfo=timezone.utc).astimezone(zone).utcoffset()
+        if current != offset:
+            found.append(instant)
+            offset = current
+    return found
+
+
+def month_start(day, months=0):
+    month = day.year * 12 + day.month - 1 + months
+    return date(month // 12, month % 12 + 1, 1)
+
+
+def check_window(zone, center):
+    """
+    Assign events around `center` (naive UTC) to local days and months the
+    way the dashboard does (quarter-hour bucket, then the period whose UTC
+    boundaries contain it) and compare with converting each event's own
+    timestamp. Returns the number of mismatches.
+    """
+    local_center = center.replace(tzinfo=timezone.utc).astimezone(zone).date()
+    days = [local_center + timedelta(days=n) for n in range(-3, 4)]
+    day_bounds = period_boundaries(zone, days[:-1], days[-1])
+    months = [month_start(local_center, n) for n in (-1, 0, 1, 2)]
+    month_bounds = period_boundaries(zone, months[:-1], months[-1])
+
+    mismatches = 0
+    instant = center - WINDOW
+    while instant < center + WINDOW:
+        local = instant.replace(tzinfo=timezone.utc).astimezone(zone).date()
+        bucket = quarter_hour(instant)
+        # width_bucket(bucket, boundaries) - 1
+        day = days[bisect_right(day_bounds, bucket) - 1]
+        month = months[bisect_right(month_bounds, bucket) - 1]
+        if day != local or month != local.replace(day=1):
+            if mismatches < 5:
+                print(f"  {instant.isoformat()}Z: local {local}, got {day} / {month}")
+            mismatches += 1
+        instant += STEP
+    return mismatches
+
+
+def check_offline(years):
+    failures = 0
+    for name in ZONES:
+        zone = ZoneInfo(name)
+        centers = [t for year in years for t in transitions(zone, year)]
+        # Month ends exercise the :30 and :45 offsets without a DST change.
+        centers += [
+            datetime(year, month, 1) for year in years for month in (1, 3, 7, 10)
+        ]
+        mismatches = sum(check_window(zone, center) for center in centers)
+        print(
+            f"{name}: {len(centers)} windows "
+            f"({len(centers) - 4 * len(years)} offset changes) "
+            f"{'ok' if not mismatches else f'{mismatches} mismatches'}"
+        )
+        failures += bool(mismatches)
+    return failures
+
+
+def check_database(site_id, days, refresh):
+    """
+    Compare the site's local daily counts from the quarter-hour aggregates
+    with converting every raw row's timestamp in Postgres.
+    """
+    failures = 0
+    if refresh:
+        refresh_quarter_hours(db.session)
+    event_types = db.session.execute(select(EventType)).scalars().all()
+    for name in ZONES:
+        zone = ZoneInfo(name)
+        today = datetime.now(zone).date()
+        starts = [today - timedelta(days=n) for n in range(days - 1, -1, -1)]
+        boundaries = period_boundaries(zone, starts, today + timedelta(days=1))
+        mismatches = 0
+        for event_type in event_types:
+            counts = local_period_counts(
+                db.session, site_id, event_type.id, boundaries
+            )
+            exact = {
+                row.day: row.events
+                for row in db.session.execute(
+                    EXACT_DAILY_COUNTS_SQL,
+                    {
+                        "tz": name,
+                        "site_id": site_id,
+                        "event_type_id": event_type.id,
+                        "start": boundaries[0],
+                        "end": boundaries[-1],
+                    },
+                )
+            }
+            for i, day in enumerate(starts):
+                if counts.get((i,), 0) != exact.get(day, 0):
+                    print(
+                        f"  {event_type.name} {day}: aggregates "
+                        f"{counts.get((i,), 0)}, raw rows {exact.get(day, 0)}"
+                    )
+                    mismatches += 1
+        print(f"{name}: {'ok' if not mismatches else f'{mismatches} mismatches'}")
+        failures += bool(mismatches)
+        db.session.rollback()
+    return failures
+
+
+def check_local_time():
+    """
+    Check that local days and months built from 15-minute UTC buckets match
+    converting each event's timestamp, around every DST change of this year
+    and last year in zones with unusual rules (DST at midnight, 30-minute
+    DST, :30 and :45 offsets). With --database, also compare daily counts
+    from the quarter-hour aggregates with the raw rows (e.g. on seeded
+    data). Exits 1 on any mismatch.
+    """
+    parser = argparse.ArgumentParser(description=check_local_time.__doc__)
+    parser.add_argument("--database", action="store_true")
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--site-id", type=int, default=DEFAULT_SITE_ID)
+    parser.add_argument("--refresh", action="store_true", help="Fold new rows first")
+    args = parser.parse_args()
+
+    this_year = datetime.now(timezone.utc).year
+    failures = check_offline([this_year - 1, this_year])
+    if args.database:
+        app = create_app()
+        with app.app_context():
+            failures += check_database(args.site_id, args.days, args.refresh)
+
+    if failures:
+        print(f"{failures} zone check(s) failed.")
+        sys.exit(1)
+    print("Local periods match per-event conversion in every zone.")
+
+
+if __name__ == "__main__":
+    check_local_time()
@@ -0,0 +1,218 @@
+import argparse
+import ast
+import os
+import re
+import sys
+
+from app.utils.online_migrations import LARGE_TABLES
+
+VERSIONS_DIR = os.path.join(
+    os.path.dirname(__file__), os.pardir, os.pardir, "migrations", "versions"
+)
+
+# Revisions written before these rules existed; they ran against small
+# tables and are not rewritten.
+BASELINE_REVISIONS = {
+    "ae8bf8e6b2ce",
+    "4a210b588be3",
+    "335e96da33b0",
+    "587a13f4db0a",
+    "b7c41e9d2f60",
+}
+
+# op.* calls that take an ACCESS EXCLUSIVE (or SHARE) lock on their table.
+LOCKING_OPS = {
+    "add_column",
+    "alter_column",
+    "drop_column",
+    "create_foreign_key",
+    "create_unique_constraint",
+    "create_check_constraint",
+    "create_primary_key",
+    "drop_constraint",
+}
+INDEX_OPS = {
+    "create_index": "create_index_concurrently",
+    "drop_index": "drop_index_concurrently",
+}
+# Helpers that commit the migration transaction (they run in an autocommit
+# block), which ends a SET LOCAL lock_timeout taken before them.
+AUTOCOMMIT_HELPERS = {
+    "create_index_concurrently",
+    "drop_index_concurrently",
+    "backfill_in_batches",
+    "add_foreign_key",
+}
+BULK_DML = re.compile(r"^\s*(UPDATE|DELETE\s+FROM)\s+(\w+)", re.IGNORECASE)
+
+
+def _string(node):
+    return node.value if isinstance(node, ast.Constant) else None
+
+
+def _op_call(node):
+    """
+    The name of an `op.<name>(...)` call, or of a bare helper call.
+    """
+    if not isinstance(node, ast.Call):
+        return None
+    if isinstance(node.func, ast.Attribute) and isinstance(node.func.value, ast.Name):
+        if node.func.value.id == "op":
+            return f"op.{node.func.attr}"
+    if isinstance(node.func, ast.Name):
+        return node.func.id
+    return None
+
+
+def _autocommit_boundaries(function):
+    """
+    Source positions where an `autocommit_block()` is entered or left.
+    """
+    for node in ast.walk(function):
+        if isinstance(node, ast.With) and any(
+            isinstance(item.context_expr, ast.Call)
+            and isinstance(item.context_expr.func, ast.Attribute)
+            and item.context_expr.func.attr == "autocommit_block"
+            for item in node.items
+        ):
+            yield node.lineno, node.col_offset
+            yield node.end_lineno, node.end_col_offset
+
+
+def _table_of(name, node):
+    keywords = {kw.arg: kw.value for kw in node.keywords}
+    if name == "op.create_index":
+        target = node.args[1] if len(node.args) > 1 else keywords.get("table_name")
+    elif name == "op.drop_index":
+        target = keywords.get("table_name")
+        target = target or (node.args[1] if len(node.args) > 1 else None)
+    elif name in ("op.create_foreign_key", "op.create_unique_constraint"):
+        target = node.args[1] if len(node.args) > 1 else keywords.get("source_table")
+    else:
+        target = node.args[0] if node.args else keywords.get("table_name")
+    return _string(target) if target is not None else None
+
+
+def check_function(function, large_tables):
+    """
+    Problems in one upgrade()/downgrade() body, as (line, message) pairs.
+    Calls are checked in source order so a lock_timeout guard only covers
+    the DDL after it, up to the next transaction boundary.
+    """
+    problems = []
+    guarded = False
+    # A None entry marks an autocommit block boundary.
+    events = sorted(
+        [
+            ((node.lineno, node.col_offset), node)
+            for node in ast.walk(function)
+            if _op_call(node)
+        ]
+        + [(position, None) for position in _autocommit_boundaries(function)],
+        key=lambda event: event[0],
+    )
+    for _, node in events:
+        if node is None or _op_call(node) in AUTOCOMMIT_HELPERS:
+            guarded = False
+            continue
+        name = _op_call(node)
+        if name == "set_lock_timeout":
+            guarded = True
+            continue
+        if name == "op.execute" and node.args:
+            match = BULK_DML.match(_string(node.args[0]) or "")
+            if match and match.group(2) in large_tables:
+                problems.append(
+                    (
+                        node.lineno,
+                        f"{match.group(1).upper()} on {match.group(2)} in one "
+                        "statement; use backfill_in_batches()",
+                    )
+                )
+            continue
+        if not name.startswith("op."):
+            continue
+        op_name = name[3:]
+        table = _table_of(name, node)
+        if table not in large_tables:
+            continue
+        if op_name in INDEX_OPS:
+            problems.append(
+                (
+                    node.lineno,
+                    f"op.{op_name} on {table} blocks writes while it runs; "
+                    f"use {INDEX_OPS[op_name]}()",
+                )
+            )
+        elif op_name == "add_column":
+            problems.append(
+                (node.lineno, f"op.add_column on {table}; use add_column()")
+            )
+        elif op_name in LOCKING_OPS and not guarded:
+            problems.append(
+                (
+                    node.lineno,
+                    f"op.{op_name} on {table} without set_lock_timeout() first",
+                )
+            )
+    return problems
+
+
+def check_file(path, large_tables):
+    with open(path) as f:
+        tree = ast.parse(f.read(), filename=path)
+    revision = None
+    for node in tree.body:
+        if isinstance(node, ast.AnnAssign):
+            targets = [node.target]
+        elif isinstance(node, ast.Assign):
+            targets = node.targets
+        else:
+            continue
+        if any(getattr(target, "id", None) == "revision" for target in targets):
+            revision = _string(node.value)
+    if revision in BASELINE_REVISIONS:
+        return []
+    problems = []
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef) and node.name in ("upgrade", "downgrade"):
+            problems.extend(check_function(node, large_tables))
+    return problems
+
+
+def check_migrations():
+    """
+    Review Alembic migrations for DDL that would block writes on large
+    tables: non-concurrent index builds, unbatched UPDATE/DELETE, and
+    locking ALTERs without a lock_timeout guard. Exits 1 on any finding.
+    """
+    parser = argparse.ArgumentParser(description=check_migrations.__doc__)
+    parser.add_argument("paths", nargs="*", help="Migration files (default: all)")
+    parser.add_argument(
+        "--large-tables",
+        default=",".join(sorted(LARGE_TABLES)),
+        help="Comma-separated tables the rules apply to",
+    )
+    args = parser.parse_args()
+
+    large_tables = {table.strip() for table in args.large_tables.split(",")}
+    versions = os.path.normpath(VERSIONS_DIR)
+    paths = args.paths or sorted(
+        os.path.join(versions, name)
+        for name in os.listdir(versions)
+        if name.endswith(".py")
+    )
+
+    findings = 0
+    for path in paths:
+        for line, message in check_file(path, large_tables):
+            print(f"{os.path.relpath(path)}:{line}: {message}")
+            findings += 1
+    if findings:
+        print(f"{findings} problem(s) found.")
+        sys.exit(1)
+    print(f"Checked {len(paths)} migration(s): no blocking DDL on large tables.")
+
+
+if __name__ == "__main__":
+    check_migrations()
@@ -0,0 +1,98 @@
+import argparse
+import sys
+
+from sqlalchemy import select
+
+from app import create_app
+from app.analytics.distributions import (
+    QUANTILES,
+    RELATIVE_ACCURACY,
+    WATERMARK,
+    hour_range,
+    merged_sketch,
+    refresh_value_sketches,
+)
+from app.models import AggregationWatermark, EventType, Metric, db
+from app.models.site import DEFAULT_SITE_ID
+
+
+def exact_values(site_id, event_type_id, start, end, max_id):
+    return (
+        db.session.execute(
+            select(Metric.value)
+            .where(
+                Metric.site_id == site_id,
+                Metric.event_type_id == event_type_id,
+                Metric.timestamp >= start,
+                Metric.timestamp < end,
+                Metric.id <= max_id,
+                Metric.value.isnot(None),
+            )
+            .order_by(Metric.value)
+        )
+        .scalars()
+        .all()
+    )
+
+
+def check_value_sketches():
+    """
+    Compare percentiles from the hourly value sketches with exact
+    percentiles over the raw metrics rows (e.g. on seeded data), per event
+    type of one site. Only rows already folded into the sketches are compared. Exits 1
+    if any estimate is further than the sketch's relative accuracy from
+    the exact value.
+    """
+    parser = argparse.ArgumentParser(description=check_value_sketches.__doc__)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--site-id", type=int, default=DEFAULT_SITE_ID)
+    parser.add_argument("--refresh", action="store_true", help="Fold new rows first")
+    args = parser.parse_args()
+
+    app = create_app()
+    failures = 0
+    with app.app_context():
+        if args.refresh:
+            refresh_value_sketches(db.session)
+        max_id = db.session.execute(
+            select(AggregationWatermark.last_metric_id).where(
+                AggregationWatermark.name == WATERMARK
+            )
+        ).scalar()
+        if not max_id:
+            print("No rows folded into the value sketches yet; use --refresh.")
+            sys.exit(1)
+        start, end = hour_range(default_hours=args.days * 24)
+        print(f"{start.isoformat()} to {end.isoformat()}, metrics.id <= {max_id}")
+
+        for event_type in db.session.execute(select(EventType)).scalars():
+            values = exact_values(args.site_id, event_type.id, start, end, max_id)
+            if not values:
+                continue
+            sketch = merged_sketch(
+                db.session, args.site_id, event_type.name, start, end
+            )
+            print(f"{event_type.name}: {len(values):,} values")
+            if sketch.count != len(values):
+                print(f"  count mismatch: sketch {sketch.count:,}")
+                failures += 1
+            for name, q in QUANTILES.items():
+                exact = values[int(q * (len(values) - 1))]
+                estimate = sketch.quantile(q)
+                error = abs(estimate - exact) / abs(exact) if exact else abs(estimate)
+                ok = error <= RELATIVE_ACCURACY + 1e-9
+                failures += not ok
+                print(
+                    f"  {name}: exact {exact:,.2f} sketch {estimate:,.2f} "
+                    f"error {error:.3%} {'ok' if ok else 'FAIL'}"
+                )
+        db.session.rollback()
+
+    if failures:
+        print(f"{failures} check(s) failed.")
+        sys.exit(1)
+    print(f"All percentiles within {RELATIVE_ACCURACY:.0%} relative error.")
+
+
+if __name__ == "__main__":
+    check_value_sketches()
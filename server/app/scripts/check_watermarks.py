@@ -0,0 +1,125 @@
+import sys
+from datetime import datetime
+
+from sqlalchemy import delete, func, insert, select
+
+from app import create_app
+from app.analytics.jobs import REFRESHED_WATERMARKS, REFRESHERS
+from app.models import (
+    AggregationWatermark,
+    Metric,
+    MetricQuarterHour,
+    Site,
+    ValueSketch,
+    db,
+)
+from app.utils.dimensions import dimensions
+
+SITE_NAME = "check-watermarks"
+# A quarter hour no real event falls in.
+TIMESTAMP = datetime(2001, 1, 1)
+
+
+def insert_event(connection, site_id, event_type_id):
+    return connection.execute(
+        insert(Metric)
+        .values(
+            site_id=site_id,
+            timestamp=TIMESTAMP,
+            event_type_id=event_type_id,
+            value=1.0,
+        )
+        .returning(Metric.id)
+    ).scalar()
+
+
+def refresh():
+    for _, _, refresh_aggregate in REFRESHERS:
+        refresh_aggregate(db.session)
+
+
+def watermark_positions():
+    positions = dict(
+        db.session.execute(
+            select(AggregationWatermark.name, AggregationWatermark.last_metric_id)
+        ).all()
+    )
+    db.session.rollback()
+    return {name: positions.get(name, 0) for name in REFRESHED_WATERMARKS}
+
+
+def folded_events(site_id):
+    quarter_hours = db.session.execute(
+        select(func.coalesce(func.sum(MetricQuarterHour.events), 0)).where(
+            MetricQuarterHour.site_id == site_id
+        )
+    ).scalar()
+    sketched = db.session.execute(
+        select(func.coalesce(func.sum(ValueSketch.count), 0)).where(
+            ValueSketch.site_id == site_id
+        )
+    ).scalar()
+    db.session.rollback()
+    return {"quarter_hours": quarter_hours, "value_sketches": sketched}
+
+
+def cleanup(site_id):
+    for model in (MetricQuarterHour, ValueSketch, Metric):
+        db.session.execute(delete(model).where(model.site_id == site_id))
+    db.session.execute(delete(Site).where(Site.id == site_id))
+    db.session.commit()
+
+
+def check_watermarks():
+    """
+    Check that the incremental aggregates do not skip a row whose
+    transaction commits after a later id is visible. Two ingest
+    transactions interleave: the slow one inserts id N and stays open while
+    the fast one inserts N + 1 and commits; refreshes then run before and
+    after the slow one commits. No watermark may pass N while it is open,
+    and both events must be folded once it has committed. Writes two
+    events at 2001-01-01 to a scratch site and removes them afterwards.
+    Exits 1 on failure.
+    """
+    app = create_app()
+    failures = 0
+    with app.app_context():
+        site = Site(name=SITE_NAME)
+        db.session.add(site)
+        db.session.commit()
+        site_id = site.id
+        event_type_id = dimensions.id("event_type", "page_view", create=True)
+        try:
+            with db.engine.connect() as slow, db.engine.connect() as fast:
+                slow_transaction = slow.begin()
+                slow_id = insert_event(slow, site_id, event_type_id)
+                with fast.begin():
+                    fast_id = insert_event(fast, site_id, event_type_id)
+                print(f"slow transaction holds id {slow_id}, fast committed {fast_id}")
+
+                refresh()
+                refresh()
+                for name, position in watermark_positions().items():
+                    if position >= slow_id:
+                        print(f"  {name}: watermark {position} passed open id")
+                        failures += 1
+                slow_transaction.commit()
+
+            # The first refresh settles the ids, the next folds them.
+            for _ in range(3):
+                refresh()
+            for name, events in folded_events(site_id).items():
+                if events != 2:
+                    print(f"  {name}: {events} of 2 events folded")
+                    failures += 1
+        finally:
+            cleanup(site_id)
+
+    if failures:
+        print(f"{failures} check(s) failed.")
+        sys.exit(1)
+    print("No row was skipped by an incremental aggregate.")
+
+
+if __name__ == "__main__":
+    check_watermarks()
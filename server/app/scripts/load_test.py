@@ -0,0 +1,189 @@
+import argparse
+import os
+import signal
+import statistics
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from app import create_app
+from app.utils.auth_utils import generate_jwt
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+
+
+def _children(pid):
+    """
+    `pid` and all its descendants, from /proc.
+    """
+    parents = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The ppid follows the parenthesised command name.
+                parents[int(entry)] = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+    found = [pid]
+    for candidate in found:
+        found.extend(child for child, parent in parents.items() if parent == candidate)
+    return found
+
+
+def rss_mb(pid):
+    """
+    Resident memory of the Gunicorn master and its workers, in MB.
+    """
+    total_kb = 0
+    for process in _children(pid):
+        try:
+            with open(f"/proc/{process}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total_kb += int(line.split()[1])
+        except OSError:
+            continue
+    return total_kb / 1024
+
+
+def start_server(worker_class, workers, threads, port, admission):
+    env = dict(
+        os.environ,
+        GUNICORN_WORKER_CLASS=worker_class,
+        GUNICORN_WORKERS=str(workers),
+        GUNICORN_THREADS=str(threads),
+        GUNICORN_BIND=f"127.0.0.1:{port}",
+        SCHEDULER_ENABLED="false",
+        ADMISSION_ENABLED="true" if admission else "false",
+    )
+    server = subprocess.Popen(
+        ["gunicorn", "--config", "gunicorn.conf.py"], cwd=SERVER_DIR, env=env
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(
+                f"http://127.0.0.1:{port}/api/health-check/live", timeout=1
+            )
+            return server
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.25)
+    server.kill()
+    raise RuntimeError(f"Gunicorn ({worker_class}) did not start on port {port}")
+
+
+def stop_server(server):
+    server.send_signal(signal.SIGTERM)
+    try:
+        server.wait(30)
+    except subprocess.TimeoutExpired:
+        server.kill()
+
+
+def run_load(url, token, clients, duration):
+    """
+    `clients` threads requesting `url` back to back for `duration` seconds.
+    Returns (latencies of 200 responses in ms, status counts).
+    """
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client():
+        request = urllib.request.Request(
+            url, headers={"Authorization": f"Bearer {token}"}
+        )
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=60) as response:
+                    response.read()
+                    status = response.status
+            except urllib.error.HTTPError as e:
+                status = e.code
+            except (urllib.error.URLError, ConnectionError):
+                status = "error"
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+                if status == 200:
+                    latencies.append(elapsed)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, statuses
+
+
+def load_test():
+    """
+    Compare throughput of the sync and gthread Gunicorn worker modes at
+    equal memory: both run --workers processes (memory is per process;
+    threads add little), gthread with --threads request threads each.
+    Starts Gunicorn for each mode against DATABASE_URL, drives --endpoint
+    with --clients concurrent clients for --duration seconds, and reports
+    requests/s, latency percentiles, non-200 responses and resident memory.
+    The token is issued for --user-id, which must exist.
+    """
+    parser = argparse.ArgumentParser(description=load_test.__doc__)
+    parser.add_argument("--endpoint", default="/api/dashboard/overview")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--user-id", type=int, default=1)
+    parser.add_argument(
+        "--admission",
+        action="store_true",
+        help="Keep admission control on (it sheds load in both modes)",
+    )
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        token = generate_jwt(args.user_id)
+
+    modes = [("sync", args.workers, 1), ("gthread", args.workers, args.threads)]
+    print(
+        f"{args.endpoint}, {args.clients} clients, {args.duration:g}s per mode\n"
+        f"  {'mode':<16} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} "
+        f"{'non-200':>8} {'RSS MB':>8}"
+    )
+    for worker_class, workers, threads in modes:
+        server = start_server(
+            worker_class, workers, threads, args.port, args.admission
+        )
+        try:
+            url = f"http://127.0.0.1:{args.port}{args.endpoint}"
+            # Warm-up: connections, prepared statements, caches.
+            run_load(url, token, args.clients, min(5, args.duration))
+            latencies, statuses = run_load(url, token, args.clients, args.duration)
+            memory = rss_mb(server.pid)
+        finally:
+            stop_server(server)
+
+        non_200 = sum(count for status, count in statuses.items() if status != 200)
+        if len(latencies) >= 2:
+            cuts = statistics.quantiles(latencies, n=100)
+            p50, p99 = cuts[49], cuts[98]
+        else:
+            p50 = p99 = float("nan")
+        label = f"{worker_class} {workers}x{threads}"
+        print(
+            f"  {label:<16} {len(latencies) / args.duration:>8.1f} {p50:>8.1f} "
+            f"{p99:>8.1f} {non_200:>8} {memory:>8.0f}"
+        )
+        if non_200:
+            print(f"    {statuses}")
+
+
+if __name__ == "__main__":
+    load_test()
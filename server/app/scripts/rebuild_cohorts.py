@@ -0,0 +1,27 @@
+import time
+
+from app import create_app
+from app.analytics.cohorts import rebuild_cohorts as rebuild
+from app.models import db
+
+
+def rebuild_cohorts():
+    """
+    Backfill the cohort retention tables from the raw metrics. Weeks before
+    the METRICS_RETENTION_DAYS cutoff are kept, since their raw rows may be
+    gone.
+    """
+    app = create_app()
+    with app.app_context():
+        started = time.perf_counter()
+        max_id, since = rebuild(db.session, app.config["METRICS_RETENTION_DAYS"])
+        elapsed = time.perf_counter() - started
+        print(
+            f"Rebuilt cohort tables from the week of {since.isoformat()} up to "
+            f"metrics.id {max_id} in {elapsed:.2f}s"
+        )
+        print(f"Weeks before {since.isoformat()} were kept as they were.")
+
+
+if __name__ == "__main__":
+    rebuild_cohorts()
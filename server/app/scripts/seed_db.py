@@ -2,10 +2,64 @@ import os
 import random
 from datetime import datetime, timedelta, timezone
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import sessionmaker
 
-from app.models import DashboardSummary, Metric, User, db
+from app.models import (
+    AggregationWatermark,
+    CohortRetention,
+    DailyActiveUsers,
+    DashboardSummary,
+    Device,
+    EventType,
+    Location,
+    Metric,
+    MetricQuarterHour,
+    MetricRollup,
+    PropertyTopK,
+    RegistrationCohort,
+    SiteMember,
+    User,
+    UserActivityWeek,
+    UserRegistration,
+    ValueSketch,
+    db,
+)
+from app.models.site import DEFAULT_SITE_ID
+from app.utils.data_version import bump_data_version
+
+
+def random_page_properties(paths, referrers, campaigns):
+    """
+    Page view properties with a skewed path distribution, so a few pages
+    dominate like in real traffic.
+    """
+    rank = int(random.paretovariate(1.1)) - 1
+    properties = {"path": paths[min(rank, len(paths) - 1)]}
+    referrer = random.choice(referrers)
+    if referrer:
+        properties["referrer"] = referrer
+    campaign = random.choice(campaigns)
+    if campaign:
+        properties["campaign"] = campaign
+    return properties
+
+
+def dimension_ids(session, model, names):
+    """
+    Ids of `names` in a dimension table, adding any that are missing.
+    """
+    session.execute(
+        insert(model)
+        .values([{"name": name} for name in names])
+        .on_conflict_do_nothing(index_elements=[model.name])
+    )
+    return dict(
+        session.execute(
+            select(model.name, model.id).where(model.name.in_(names))
+        ).all()
+    )
 
 
 def seed_db():
@@ -18,13 +72,32 @@ def seed_db():
     session = Session()
 
     try:
-        # Clear existing data (optional, for re-seeding)
-        session.query(DashboardSummary).delete()
-        session.query(Metric).delete()
-        session.query(User).delete()
+        # Clear existing data (optional, for re-seeding). TRUNCATE drops the
+        # rows at once instead of deleting (and WAL-logging) them one by one.
+        tables = [
+            model.__tablename__
+            for model in (
+                DailyActiveUsers,
+                CohortRetention,
+                RegistrationCohort,
+                UserActivityWeek,
+                UserRegistration,
+                PropertyTopK,
+                MetricRollup,
+                MetricQuarterHour,
+                ValueSketch,
+                AggregationWatermark,
+                DashboardSummary,
+                Metric,
+                SiteMember,
+                User,
+            )
+        ]
+        session.execute(text(f"TRUNCATE {', '.join(tables)} RESTART IDENTITY"))
 
         # Insert dummy data for dashboard_summary (remains static for this example)
         summary_data = DashboardSummary(
+            site_id=DEFAULT_SITE_ID,
             views="721K",
             views_change="11.02%",
             views_type="increase",
@@ -48,6 +121,31 @@ def seed_db():
         devices = ["Windows", "Mac", "iOS", "Android", "Linux", "Other"]
         locations = ["United States", "Canada", "Mexico", "Other"]
         event_types = ["page_view", "user_login", "new_registration"]
+        device_ids = list(dimension_ids(session, Device, devices).values())
+        location_ids = list(dimension_ids(session, Location, locations).values())
+        event_type_ids = dimension_ids(session, EventType, event_types)
+        paths = ["/", "/pricing", "/features", "/blog", "/docs", "/signup"] + [
+            f"/blog/post-{i}" for i in range(200)
+        ]
+        referrers = ["google.com", "twitter.com", "news.ycombinator.com", None]
+        campaigns = ["spring_sale", "newsletter", "launch", None, None, None]
+
+        # Users who registered before the seeded window, so logins and page
+        # views can be attributed from the first day.
+        existing_users = [
+            User(
+                name=f"Seed User {i}",
+                email=f"seed-user-{i}@example.com",
+                created_at=start_date - timedelta(days=random.randint(1, 365)),
+            )
+            for i in range(200)
+        ]
+        session.add_all(existing_users)
+        session.flush()
+        user_ids = [user.id for user in existing_users]
+        session.add_all(
+            SiteMember(user_id=user_id, site_id=DEFAULT_SITE_ID) for user_id in user_ids
+        )
 
         BATCH_SIZE = 10000
         metrics_to_add = []
@@ -64,9 +162,18 @@ def seed_db():
                     Metric(
                         timestamp=current_date
                         + timedelta(minutes=random.randint(0, 1440)),
-                        event_type="page_view",
-                        device=random.choice(devices),
-                        location=random.choice(locations),
+                        event_type_id=event_type_ids["page_view"],
+                        # Roughly a third of page views are anonymous
+                        user_id=random.choice(user_ids)
+                        if random.random() < 0.7
+                        else None,
+                        device_id=random.choice(device_ids),
+                        location_id=random.choice(location_ids),
+                        # Page load time in milliseconds
+                        value=round(random.lognormvariate(6.5, 0.5), 1),
+                        properties=random_page_properties(
+                            paths, referrers, campaigns
+                        ),
                     )
                 )
                 count += 1
@@ -80,9 +187,10 @@ def seed_db():
                     Metric(
                         timestamp=current_date
                         + timedelta(minutes=random.randint(0, 1440)),
-                        event_type="user_login",
-                        device=random.choice(devices),
-                        location=random.choice(locations),
+                        event_type_id=event_type_ids["user_login"],
+                        user_id=random.choice(user_ids),
+                        device_id=random.choice(device_ids),
+                        location_id=random.choice(location_ids),
                     )
                 )
                 count += 1
@@ -91,14 +199,26 @@ def seed_db():
                     session.commit()
                     metrics_to_add = []
                     print(f"Inserted {count} metrics...")
-            for _ in range(num_new_registrations):
+            new_users = [
+                User(
+                    name=f"Seed User {len(user_ids) + i}",
+                    email=f"seed-user-{len(user_ids) + i}@example.com",
+                    created_at=current_date
+                    + timedelta(minutes=random.randint(0, 1440)),
+                )
+                for i in range(num_new_registrations)
+            ]
+            session.add_all(new_users)
+            session.flush()
+            for new_user in new_users:
+                user_ids.append(new_user.id)
                 metrics_to_add.append(
                     Metric(
-                        timestamp=current_date
-                        + timedelta(minutes=random.randint(0, 1440)),
-                        event_type="new_registration",
-                        device=random.choice(devices),
-                        location=random.choice(locations),
+                        timestamp=new_user.created_at,
+                        event_type_id=event_type_ids["new_registration"],
+                        user_id=new_user.id,
+                        device_id=random.choice(device_ids),
+                        location_id=random.choice(location_ids),
                     )
                 )
                 count += 1
@@ -115,6 +235,7 @@ def seed_db():
             session.commit()
             print(f"Inserted {count} metrics (final batch).")
         session.commit()
+        bump_data_version(session)
         print("Database seeded successfully with dummy raw metrics data.")
 
     except Exception as e:
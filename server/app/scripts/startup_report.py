@@ -0,0 +1,30 @@
+import sys
+import time
+
+
+def startup_report():
+    """
+    Create the app once and print how long each startup phase took.
+    Run with `python -X importtime` for a per-module import breakdown.
+    """
+    started = time.perf_counter()
+    from app import create_app
+
+    app = create_app()
+    elapsed = (time.perf_counter() - started) * 1000
+
+    startup = app.extensions["startup"]
+    print(
+        f"create_app() ready in {elapsed:.1f} ms "
+        f"(database ready: {startup['db_ready']})"
+    )
+    for entry in startup["timings"]:
+        print(f"  {entry['phase']:<24} {entry['ms']:>9.2f} ms")
+
+    heavy_modules = ["flask_restx", "google.oauth2", "app.routes.api_docs"]
+    loaded = [name for name in heavy_modules if name in sys.modules]
+    print(f"Heavy optional modules loaded at startup: {', '.join(loaded) or 'none'}")
+
+
+if __name__ == "__main__":
+    startup_report()
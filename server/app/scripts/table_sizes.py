@@ -0,0 +1,40 @@
+import argparse
+
+from app import create_app
+from app.models import db
+from app.utils.online_migrations import RELATION_SIZES_SQL
+
+KINDS = {"r": "table", "i": "index", "p": "table"}
+
+
+def table_sizes():
+    """
+    Print the on-disk size of tables and each of their indexes, e.g. before
+    and after a schema change such as dictionary-encoding metrics
+    dimensions. Dropped columns only free heap space once rows are
+    rewritten (VACUUM FULL or pg_repack); indexes shrink immediately.
+    """
+    parser = argparse.ArgumentParser(description=table_sizes.__doc__)
+    parser.add_argument(
+        "tables",
+        nargs="*",
+        default=["metrics", "event_types", "devices", "locations"],
+    )
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        for table in args.tables:
+            rows = db.session.execute(RELATION_SIZES_SQL, {"table": table}).all()
+            if not rows:
+                print(f"{table}: not found")
+                continue
+            total = sum(row.bytes for row in rows)
+            print(f"{table}: {total / 1024**2:,.1f} MB")
+            for row in rows:
+                kind = KINDS.get(row.kind, row.kind)
+                print(f"  {kind:<6} {row.name:<40} {row.bytes / 1024**2:>10,.1f} MB")
+
+
+if __name__ == "__main__":
+    table_sizes()
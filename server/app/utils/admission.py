@@ -0,0 +1,325 @@
+"""
+Admission control and load shedding per route class.
+
+Every route except the health checks belongs to a class (auth, cheap, heavy,
+ingest). A class admits at most `limit` requests at once across all workers
+on the host. Each admitted request holds an flock on one of the class's slot
+files, so the kernel releases the slot if a worker dies. With sync workers
+this keeps a burst of heavy analytics from occupying every worker while
+logins and cheap reads wait behind it.
+
+A request that finds no free slot waits for one for up to the class's
+queue timeout, holding one of `queue` waiting slots. It is shed with 503
+and Retry-After when:
+- the queue is full,
+- the wait times out, or
+- the worker's database pool is nearly exhausted (ADMISSION_POOL_SHED_RATIO).
+
+Shedding fast frees the worker at once instead of letting it stall.
+
+Dashboard routes are not admitted as whole views: a 304, a result shared
+with a concurrent identical request or read from another worker needs no
+slot. serve_dashboard_query (app.utils.result_cache) takes the slot around
+the computation itself with admitted(), and serves the last good result
+when it is shed.
+
+Limits adapt to latency (AIMD). Every ADJUST_EVERY requests a worker
+compares its moving average latency for the class with the class's target.
+It cuts the limit by a quarter when the average is above the target and
+adds one slot (up to the configured limit) when it is below. Per-class
+counters (admitted, queued, shed by reason, in flight, limit, latency) are
+in /api/health-check/stats.
+"""
+
+import fcntl
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import current_app, request
+
+from app.models import db
+from app.utils.counters import counters
+from app.utils.response import standard_response
+
+# Endpoints not listed take their blueprint's class; health checks are never
+# limited so probes keep answering under load.
+BLUEPRINT_CLASSES = {"auth": "auth", "dashboard": "heavy", "metrics": "cheap"}
+ENDPOINT_CLASSES = {
+    "metrics.post_metrics": "ingest",
+    "dashboard.get_summary_data": "cheap",
+    "dashboard.get_active_users": "cheap",
+    "dashboard.get_retention": "cheap",
+    "dashboard.get_cohorts": "cheap",
+    "dashboard.get_top_properties": "cheap",
+    "dashboard.get_value_distribution": "cheap",
+}
+EXEMPT_BLUEPRINTS = ("health_check",)
+# Blueprints whose views admit only their computation (see admitted()).
+COMPUTATION_BLUEPRINTS = ("dashboard",)
+
+ADJUST_EVERY = 20
+LATENCY_ALPHA = 0.2  # weight of the newest request in the moving average
+DECREASE_FACTOR = 0.75
+
+
+def parse_class_settings(value):
+    """
+    Parse "auth=8,cheap=16" into {"auth": 8, "cheap": 16}.
+    """
+    settings = {}
+    for item in value.split(","):
+        name, _, number = item.partition("=")
+        if name.strip() and number.strip():
+            settings[name.strip()] = int(number)
+    return settings
+
+
+class Shed(Exception):
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class SlotSet:
+    """
+    `size` lock files shared by the workers on a host; holding an flock on
+    one is holding a slot. File descriptors are opened per process (flocks
+    on a descriptor inherited across fork would be shared), and a thread
+    lock per slot keeps two threads of one process off the same slot.
+    """
+
+    def __init__(self, directory, name, size):
+        self.size = size
+        self.paths = [os.path.join(directory, f"{name}.{i}.lock") for i in range(size)]
+        self._pid = None
+        self._fds = []
+        self._thread_locks = []
+        self._open_lock = threading.Lock()
+
+    def _open(self):
+        with self._open_lock:
+            if self._pid != os.getpid():
+                self._fds = [
+                    os.open(path, os.O_RDWR | os.O_CREAT, 0o600) for path in self.paths
+                ]
+                self._thread_locks = [threading.Lock() for _ in self.paths]
+                self._pid = os.getpid()
+
+    def try_acquire(self, limit=None):
+        """
+        Take a free slot among the first `limit` without blocking; returns
+        its index or None.
+        """
+        if self._pid != os.getpid():
+            self._open()
+        limit = min(self.size, limit or self.size)
+        start = random.randrange(limit) if limit else 0
+        for offset in range(limit):
+            index = (start + offset) % limit
+            if not self._thread_locks[index].acquire(blocking=False):
+                continue
+            try:
+                fcntl.flock(self._fds[index], fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return index
+            except BlockingIOError:
+                self._thread_locks[index].release()
+        return None
+
+    def release(self, index):
+        fcntl.flock(self._fds[index], fcntl.LOCK_UN)
+        self._thread_locks[index].release()
+
+
+def pool_usage():
+    """
+    Fraction of this worker's database pool (including overflow) in use.
+    """
+    pool = db.engine.pool
+    if not hasattr(pool, "checkedout"):
+        return 0.0
+    capacity = pool.size() + max(getattr(pool, "_max_overflow", 0), 0)
+    return pool.checkedout() / capacity if capacity else 0.0
+
+
+class RouteClass:
+    def __init__(self, name, directory, limit, queue, timeout_ms, target_ms):
+        self.name = name
+        self.slots = SlotSet(directory, name, limit)
+        self.queue = SlotSet(directory, f"{name}.queue", queue)
+        self.max_limit = limit
+        self.limit = float(limit)
+        self.timeout = timeout_ms / 1000
+        self.target = target_ms / 1000
+        self.latency = None
+        self._completed = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        counters.set(f"admission.{name}.limit", limit)
+
+    def retry_after(self):
+        return max(1, math.ceil(self.latency or self.timeout))
+
+    def _shed(self, reason):
+        counters.incr(f"admission.{self.name}.shed.{reason}")
+        raise Shed(reason, self.retry_after())
+
+    def _admitted(self, slot, counter):
+        counters.incr(f"admission.{self.name}.{counter}")
+        with self._lock:
+            self._in_flight += 1
+            counters.set(f"admission.{self.name}.in_flight", self._in_flight)
+        return slot
+
+    def admit(self, pool_shed_ratio):
+        """
+        Take a slot, waiting in the queue if none is free. Returns the slot
+        for release(), or raises Shed.
+        """
+        if pool_shed_ratio and pool_usage() >= pool_shed_ratio:
+            self._shed("pool")
+        slot = self.slots.try_acquire(int(self.limit))
+        if slot is not None:
+            return self._admitted(slot, "admitted")
+
+        waiting = self.queue.try_acquire() if self.queue.size else None
+        if waiting is None:
+            self._shed("queue_full")
+        try:
+            deadline = time.monotonic() + self.timeout
+            delay = 0.002
+            while time.monotonic() < deadline:
+                time.sleep(min(delay, max(deadline - time.monotonic(), 0)))
+                delay = min(delay * 2, 0.05)
+                slot = self.slots.try_acquire(int(self.limit))
+                if slot is not None:
+                    return self._admitted(slot, "queued")
+        finally:
+            self.queue.release(waiting)
+        self._shed("queue_timeout")
+
+    def release(self, slot, elapsed):
+        self.slots.release(slot)
+        with self._lock:
+            self._in_flight -= 1
+            self.latency = (
+                elapsed
+                if self.latency is None
+                else LATENCY_ALPHA * elapsed + (1 - LATENCY_ALPHA) * self.latency
+            )
+            self._completed += 1
+            if self._completed % ADJUST_EVERY == 0:
+                if self.latency > self.target:
+                    self.limit = max(1.0, self.limit * DECREASE_FACTOR)
+                else:
+                    self.limit = min(float(self.max_limit), self.limit + 1)
+            counters.set(f"admission.{self.name}.in_flight", self._in_flight)
+            counters.set(f"admission.{self.name}.limit", round(self.limit, 2))
+            counters.set(
+                f"admission.{self.name}.latency_ms", round(self.latency * 1000, 1)
+            )
+
+
+def route_class_for(endpoint):
+    """
+    Name of the class `endpoint` belongs to, or None if it is not limited.
+    """
+    blueprint = endpoint.partition(".")[0]
+    if blueprint in EXEMPT_BLUEPRINTS or endpoint == "static":
+        return None
+    return ENDPOINT_CLASSES.get(endpoint, BLUEPRINT_CLASSES.get(blueprint))
+
+
+@contextmanager
+def admitted():
+    """
+    Hold a slot of the current endpoint's class for the block; raises Shed.
+    A no-op when admission is disabled or the endpoint is not limited.
+    """
+    classes = current_app.extensions.get("admission", {})
+    route_class = classes.get(route_class_for(request.endpoint or ""))
+    if route_class is None:
+        yield
+        return
+    slot = route_class.admit(current_app.config["ADMISSION_POOL_SHED_RATIO"])
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        route_class.release(slot, time.perf_counter() - started)
+
+
+def shed_response(shed):
+    response, status = standard_response(
+        False, None, "Server is busy, please retry later.", 503
+    )
+    response.headers["Retry-After"] = str(shed.retry_after)
+    return response, status
+
+
+def _admitted(view, route_class, pool_shed_ratio):
+    @wraps(view)
+    def admitted_view(*args, **kwargs):
+        try:
+            slot = route_class.admit(pool_shed_ratio)
+        except Shed as e:
+            return shed_response(e)
+
+        started = time.perf_counter()
+        try:
+            return view(*args, **kwargs)
+        finally:
+            route_class.release(slot, time.perf_counter() - started)
+
+    return admitted_view
+
+
+def init_admission(app):
+    """
+    Wrap every limited view with its class's admission control, except
+    those of COMPUTATION_BLUEPRINTS, which call admitted() themselves. Call
+    after the blueprints are registered (and after init_profiling, so shed
+    requests are not profiled).
+    """
+    if not app.config["ADMISSION_ENABLED"]:
+        return
+    config = app.config
+    settings = {
+        key: parse_class_settings(config[key])
+        for key in (
+            "ADMISSION_LIMITS",
+            "ADMISSION_QUEUE_LENGTHS",
+            "ADMISSION_QUEUE_TIMEOUTS_MS",
+            "ADMISSION_TARGET_LATENCY_MS",
+        )
+    }
+    directory = config["ADMISSION_DIR"] or os.path.join(
+        tempfile.gettempdir(), "analytics-admission"
+    )
+    os.makedirs(directory, exist_ok=True)
+
+    classes = {
+        name: RouteClass(
+            name,
+            directory,
+            limit,
+            settings["ADMISSION_QUEUE_LENGTHS"].get(name, 0),
+            settings["ADMISSION_QUEUE_TIMEOUTS_MS"].get(name, 0),
+            settings["ADMISSION_TARGET_LATENCY_MS"].get(name, 1000),
+        )
+        for name, limit in settings["ADMISSION_LIMITS"].items()
+    }
+    app.extensions["admission"] = classes
+    for endpoint, view in app.view_functions.items():
+        name = route_class_for(endpoint)
+        blueprint = endpoint.partition(".")[0]
+        if name in classes and blueprint not in COMPUTATION_BLUEPRINTS:
+            app.view_functions[endpoint] = _admitted(
+                view, classes[name], config["ADMISSION_POOL_SHED_RATIO"]
+            )
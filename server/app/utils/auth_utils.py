@@ -2,14 +2,27 @@
 Authentication utility functions for JWT generation and token-required decorator.
 """
 
+import time
 from datetime import datetime, timedelta, timezone
 from functools import wraps
 
 import jwt
-from flask import current_app, g, request
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event, select
+from sqlalchemy.orm import make_transient_to_detached
 
-from app.models import User, db
+from app.models import SiteMember, User, db
+from app.models.site import DEFAULT_SITE_ID
+from app.utils.profiling import record_phase
 from app.utils.response import standard_response
+from app.utils.shared_cache import cache_get_json, cache_set_json, get_shared_cache
+
+# Columns kept in the shared cache for authenticated lookups; the password
+# hash is left out and loads lazily if anything reads it.
+CACHED_USER_FIELDS = ("id", "name", "email", "google_id")
+# Selects the site a request reads or writes; without it, the default site.
+SITE_HEADER = "X-Site-Id"
+MAX_SITE_ID = 32767  # sites.id is a smallint
 
 
 def generate_jwt(user_id):
@@ -26,17 +39,114 @@ def generate_jwt(user_id):
     return jwt.encode(payload, current_app.config["SECRET_KEY"], algorithm="HS256")
 
 
+def decode_jwt(token):
+    """
+    Verify a token's signature and expiry and return its payload. Raises
+    jwt.InvalidTokenError (or its subclass ExpiredSignatureError).
+    """
+    return jwt.decode(token, current_app.config["SECRET_KEY"], algorithms=["HS256"])
+
+
+def bearer_token():
+    """
+    The token from an `Authorization: Bearer <token>` header, or None.
+    """
+    if "Authorization" not in request.headers:
+        return None
+    return request.headers["Authorization"].split(" ")[1]  # Bearer <token>
+
+
+def _user_cache_key(user_id):
+    return f"auth:user:{user_id}"
+
+
+def load_user(user_id):
+    """
+    Fetch the user for a verified token, from the shared cache when
+    possible. A cached user is attached to the session without a query.
+    """
+    ttl = current_app.config["AUTH_USER_CACHE_TTL"]
+    fields = cache_get_json(_user_cache_key(user_id)) if ttl else None
+    if fields is not None:
+        created_at = fields.pop("created_at")
+        user = User(**fields)
+        user.created_at = created_at and datetime.fromisoformat(created_at)
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+
+    user = db.session.get(User, user_id)
+    if user is not None and ttl:
+        fields = {name: getattr(user, name) for name in CACHED_USER_FIELDS}
+        fields["created_at"] = user.created_at and user.created_at.isoformat()
+        cache_set_json(_user_cache_key(user_id), fields, ex=ttl)
+    return user
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_cached_user(mapper, connection, target):
+    if has_app_context():
+        get_shared_cache().delete(_user_cache_key(target.id))
+
+
+def _user_sites_cache_key(user_id):
+    return f"auth:sites:{user_id}"
+
+
+def user_site_ids(user_id):
+    """
+    Ids of the sites the user is a member of, from the shared cache when
+    possible.
+    """
+    ttl = current_app.config["AUTH_USER_CACHE_TTL"]
+    site_ids = cache_get_json(_user_sites_cache_key(user_id)) if ttl else None
+    if site_ids is None:
+        site_ids = (
+            db.session.execute(
+                select(SiteMember.site_id).where(SiteMember.user_id == user_id)
+            )
+            .scalars()
+            .all()
+        )
+        if ttl:
+            cache_set_json(_user_sites_cache_key(user_id), site_ids, ex=ttl)
+    return site_ids
+
+
+@event.listens_for(SiteMember, "after_insert")
+@event.listens_for(SiteMember, "after_delete")
+def _invalidate_cached_sites(mapper, connection, target):
+    if has_app_context():
+        get_shared_cache().delete(_user_sites_cache_key(target.user_id))
+
+
+def requested_site_id():
+    """
+    The site id from the X-Site-Id header (the default site without one),
+    or None if the header is not a valid id.
+    """
+    value = request.headers.get(SITE_HEADER)
+    if value is None:
+        return DEFAULT_SITE_ID
+    if not (value.isascii() and value.isdigit()):
+        return None
+    if not 1 <= int(value) <= MAX_SITE_ID:
+        return None
+    return int(value)
+
+
 def token_required(f):
     """
     Decorator to require JWT authentication for Flask routes.
-    Attaches the current user to Flask's global context (g.current_user).
+    Attaches the current user to Flask's global context (g.current_user),
+    and the site selected by the X-Site-Id header, which the user must be a
+    member of, as g.site_id.
     """
 
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = None
-        if "Authorization" in request.headers:
-            token = request.headers["Authorization"].split(" ")[1]  # Bearer <token>
+        started = time.perf_counter()
+        token = bearer_token()
 
         if not token:
             return standard_response(
@@ -44,15 +154,24 @@ def token_required(f):
             )
 
         try:
-            data = jwt.decode(
-                token, current_app.config["SECRET_KEY"], algorithms=["HS256"]
-            )
-            current_user = db.session.get(User, data["user_id"])
+            data = decode_jwt(token)
+            current_user = load_user(data["user_id"])
             if not current_user:
                 return standard_response(
                     False, None, "Invalid Token: User not found!", 401
                 )
             g.current_user = current_user  # Store user object in Flask's global context
+            site_id = requested_site_id()
+            if site_id is None:
+                return standard_response(
+                    False, None, f"Invalid {SITE_HEADER} header!", 400
+                )
+            if site_id not in user_site_ids(current_user.id):
+                return standard_response(
+                    False, None, "You are not a member of this site!", 403
+                )
+            g.site_id = site_id
+            record_phase("auth", started)
         except jwt.ExpiredSignatureError:
             return standard_response(False, None, "Token has expired!", 401)
         except jwt.InvalidTokenError:
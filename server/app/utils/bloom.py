@@ -0,0 +1,108 @@
+"""
+Bloom filters for remembering recently seen event idempotency keys.
+"""
+
+import hashlib
+import math
+import threading
+import time
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter sized for `capacity` keys at `error_rate`
+    false positives. Uses double hashing over one blake2b digest.
+    """
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        # Optimal bits m = -n ln p / (ln 2)^2 and hash count k = m/n ln 2.
+        bits = -capacity * math.log(error_rate) / math.log(2) ** 2
+        self.size = max(8, math.ceil(bits))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def __contains__(self, key):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def estimated_error_rate(self):
+        """
+        False-positive rate at the current fill, (1 - e^(-kn/m))^k.
+        """
+        return (1 - math.exp(-self.hashes * self.count / self.size)) ** self.hashes
+
+    @property
+    def memory_bytes(self):
+        return len(self.bits)
+
+
+class RotatingBloomFilter:
+    """
+    Keys seen in the last one to two `rotate_seconds` periods. Two
+    generations are checked; adds go to the current one, and every period
+    the older generation is dropped, so memory stays bounded without ever
+    deleting single keys.
+    """
+
+    def __init__(self, capacity, error_rate, rotate_seconds):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.rotate_seconds = rotate_seconds
+        self._lock = threading.Lock()
+        self._current = BloomFilter(capacity, error_rate)
+        self._previous = BloomFilter(capacity, error_rate)
+        self._rotated_at = time.monotonic()
+
+    def _maybe_rotate(self):
+        if time.monotonic() - self._rotated_at >= self.rotate_seconds:
+            self._previous = self._current
+            self._current = BloomFilter(self.capacity, self.error_rate)
+            self._rotated_at = time.monotonic()
+
+    def __contains__(self, key):
+        with self._lock:
+            self._maybe_rotate()
+            return key in self._current or key in self._previous
+
+    def add(self, key):
+        with self._lock:
+            self._maybe_rotate()
+            if self._current.count >= self.capacity:
+                # Over capacity the error rate climbs quickly; start fresh.
+                self._previous = self._current
+                self._current = BloomFilter(self.capacity, self.error_rate)
+                self._rotated_at = time.monotonic()
+            self._current.add(key)
+
+    def stats(self):
+        with self._lock:
+            current, previous = self._current, self._previous
+            # A key is a false positive if either generation says yes.
+            error_rate = 1 - (1 - current.estimated_error_rate()) * (
+                1 - previous.estimated_error_rate()
+            )
+            return {
+                "configured_error_rate": self.error_rate,
+                "estimated_error_rate": round(error_rate, 6),
+                "capacity_per_generation": self.capacity,
+                "keys": current.count + previous.count,
+                "hashes": current.hashes,
+                "memory_bytes": current.memory_bytes + previous.memory_bytes,
+                "rotate_seconds": self.rotate_seconds,
+            }
@@ -0,0 +1,45 @@
+"""
+Process-local operational counters exposed by /api/health-check/stats.
+"""
+
+import os
+import threading
+from collections import defaultdict
+
+
+class Counters:
+    """
+    Thread-safe named counters. Values are per worker process; the stats
+    endpoint reports the pid so scrapes from different workers can be summed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = defaultdict(float)
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self._values[name] += amount
+
+    def set(self, name, value):
+        with self._lock:
+            self._values[name] = value
+
+    def get(self, name):
+        return self._values.get(name, 0)
+
+    def snapshot(self, prefix=None):
+        with self._lock:
+            items = dict(self._values)
+        if prefix:
+            items = {k: v for k, v in items.items() if k.startswith(prefix)}
+        return {
+            "pid": os.getpid(),
+            "counters": {
+                k: int(v) if float(v).is_integer() else v
+                for k, v in sorted(items.items())
+            },
+        }
+
+
+counters = Counters()
@@ -0,0 +1,110 @@
+"""
+Data-version ETags for dashboard responses.
+
+Every write that changes what the dashboard shows (event ingest, aggregate
+refreshes, retention, seeding) bumps the `data_version` sequence once it has
+committed. Bumping first would let a reader pair the new version with the
+old data and keep that copy until the next write. A sequence is not
+transactional, so bumping takes no row lock and concurrent ingest requests
+do not queue on it; reading the current version is one O(1) query shared by
+every worker and replica.
+
+Dashboard responses carry a weak ETag built from the version, the path, the
+query parameters and the site. A request whose If-None-Match matches is answered with
+304 after only the token's signature and the user's membership of the site
+(cached in the shared cache) are checked: no user lookup and no aggregate
+SQL.
+"""
+
+import hashlib
+import json
+from functools import wraps
+
+import jwt
+from flask import g, make_response, request
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from app.models import db
+from app.utils.auth_utils import (
+    bearer_token,
+    decode_jwt,
+    requested_site_id,
+    user_site_ids,
+)
+from app.utils.counters import counters
+
+SEQUENCE = "data_version"
+
+
+def bump_data_version(session):
+    """
+    Mark dashboard data as changed. Call after the write has committed.
+    """
+    session.execute(text(f"SELECT nextval('{SEQUENCE}')"))
+    session.commit()
+
+
+def current_data_version():
+    return db.session.execute(text(f"SELECT last_value FROM {SEQUENCE}")).scalar()
+
+
+def dashboard_etag(version):
+    """
+    ETag value for the current request's data at `version`. The site is
+    part of it, so one site's tag never validates another site's data.
+    """
+    args = sorted(request.args.items(multi=True))
+    digest = hashlib.sha1(
+        json.dumps([request.path, args, requested_site_id()]).encode()
+    ).hexdigest()
+    return f"{version}-{digest[:16]}"
+
+
+def _token_is_for_site():
+    """
+    Whether the bearer token is valid and its user is a member of the
+    requested site, so a user removed from a site cannot keep learning
+    whether its data changed.
+    """
+    try:
+        token = bearer_token()
+        data = decode_jwt(token) if token else None
+    except (IndexError, jwt.InvalidTokenError):
+        return False
+    return bool(data) and requested_site_id() in user_site_ids(data["user_id"])
+
+
+def conditional_get(f):
+    """
+    Decorator for dashboard GET routes, placed above @token_required: answer
+    304 when the client already has the data for the current version, and
+    tag fresh 200 responses with an ETag. The version is read before the
+    route runs, so data written meanwhile gets a newer tag next time rather
+    than hiding behind this one. Stale fallbacks (see app.utils.result_cache)
+    and error responses are not tagged.
+    """
+
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        try:
+            version = current_data_version()
+        except DBAPIError:
+            # The route's stale-result fallback handles an unavailable database.
+            db.session.rollback()
+            return f(*args, **kwargs)
+
+        etag = dashboard_etag(version)
+        if request.if_none_match.contains_weak(etag) and _token_is_for_site():
+            counters.incr("dashboard.not_modified")
+            response = make_response("", 304)
+        else:
+            response = make_response(f(*args, **kwargs))
+            if response.status_code != 200 or g.get("dashboard_stale"):
+                return response
+        response.set_etag(etag, weak=True)
+        # Cache, but revalidate with If-None-Match on every use.
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
+
+    return decorated
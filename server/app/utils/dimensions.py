@@ -0,0 +1,128 @@
+"""
+In-process name <-> id maps for the metrics dimension tables.
+
+metrics stores event type, device and location as smallint ids. The
+dictionary tables are tiny and rows are never changed or deleted, so each
+worker loads a table once and keeps it; an unknown name or id triggers a
+reload (another worker may have added it), and ingest creates missing names.
+
+Names come from clients, and every new one costs a reload in every worker
+and one of the 32767 smallint ids. So ingest creates at most
+INGEST_MAX_NEW_NAMES per batch and dimension and stops at
+DIMENSION_MAX_NAMES per table; the names it refuses are stored as OTHER and
+counted in ingest.refused_<kind>_names.
+"""
+
+import threading
+
+from flask import current_app
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.models import Device, EventType, Location, Metric, db
+from app.utils.counters import counters
+
+DIMENSIONS = {
+    "event_type": (EventType, Metric.event_type_id),
+    "device": (Device, Metric.device_id),
+    "location": (Location, Metric.location_id),
+}
+# Stands in for names ingest did not create.
+OTHER = "Other"
+
+
+def dimension_column(kind):
+    """
+    The metrics column holding ids for `kind`.
+    """
+    return DIMENSIONS[kind][1]
+
+
+class DimensionCache:
+    """
+    Thread-safe per-worker dictionaries, one pair of maps per dimension.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = {kind: {} for kind in DIMENSIONS}
+        self._names = {kind: {} for kind in DIMENSIONS}
+
+    def _load(self, kind):
+        model = DIMENSIONS[kind][0]
+        rows = db.session.execute(select(model.id, model.name)).all()
+        with self._lock:
+            self._ids[kind] = {name: value_id for value_id, name in rows}
+            self._names[kind] = {value_id: name for value_id, name in rows}
+
+    def _create(self, kind, names):
+        model = DIMENSIONS[kind][0]
+        # Own transaction: a name created here must not disappear with a
+        # rolled-back ingest while this worker keeps its id.
+        with db.engine.begin() as connection:
+            connection.execute(
+                insert(model)
+                .values([{"name": name} for name in sorted(names)])
+                .on_conflict_do_nothing(index_elements=[model.name])
+            )
+
+    def ids(self, kind, names, create=False):
+        """
+        Map names to ids. Unknown names map to None unless `create` adds
+        them to the dictionary table, within the limits above; names over
+        them map to OTHER's id.
+        """
+        config = current_app.config
+        known = self._ids[kind]
+        missing = {name for name in names if name is not None and name not in known}
+        refused = set()
+        if (
+            create
+            and missing
+            and OTHER in known
+            and len(known) >= config["DIMENSION_MAX_NAMES"]
+        ):
+            # Full: refuse without a reload per batch.
+            refused, missing = missing, set()
+        if missing:
+            self._load(kind)
+            known = self._ids[kind]
+            missing = {name for name in missing if name not in known}
+            if missing and create:
+                room = min(
+                    config["INGEST_MAX_NEW_NAMES"],
+                    config["DIMENSION_MAX_NAMES"] - len(known),
+                )
+                new = set(sorted(missing)[: max(room, 0)])
+                refused = missing - new
+                if refused and OTHER not in known:
+                    new.add(OTHER)
+                if new:
+                    self._create(kind, new)
+                    self._load(kind)
+                    known = self._ids[kind]
+        if refused:
+            counters.incr(f"ingest.refused_{kind}_names", len(refused))
+        return {name: known.get(OTHER if name in refused else name) for name in names}
+
+    def id(self, kind, name, create=False):
+        if name is None:
+            return None
+        return self.ids(kind, [name], create)[name]
+
+    def name(self, kind, value_id):
+        if value_id is None:
+            return None
+        names = self._names[kind]
+        if value_id not in names:
+            self._load(kind)
+            names = self._names[kind]
+        return names.get(value_id)
+
+    def clear(self):
+        with self._lock:
+            self._ids = {kind: {} for kind in DIMENSIONS}
+            self._names = {kind: {} for kind in DIMENSIONS}
+
+
+dimensions = DimensionCache()
@@ -0,0 +1,198 @@
+"""
+Ingest enrichment: raw User-Agent strings and client IPs to the device and
+location buckets the dashboard charts use.
+
+User-Agents come from a small set of browsers and OS versions, so the
+classifier is a few substring checks behind an LRU cache. IPs are looked up
+in a sorted range table that is memory-mapped (shared by all workers through
+the page cache, nothing parsed at startup) and binary-searched with bisect.
+
+IP table file layout (little-endian, built by `poetry run build-ip-table`):
+
+    header   magic b"IPRT", version u16, reserved u16, v4 count u32, v6 count u32
+    IPv4     starts u32[n4], ends u32[n4], location u8[n4], zero padding to 4
+    IPv6     starts 16-byte big-endian[n6], ends [n6], location u8[n6]
+
+Ranges are inclusive and sorted by start; addresses outside every range
+map to "Other".
+"""
+
+import bisect
+import mmap
+import socket
+import struct
+import sys
+from functools import lru_cache
+
+from flask import current_app
+
+from app.utils.health import register_readiness_probe
+
+DEVICES = ("Windows", "Mac", "iOS", "Android", "Linux", "Other")
+LOCATIONS = ("United States", "Canada", "Mexico", "Other")
+OTHER = "Other"
+
+MAGIC = b"IPRT"
+VERSION = 1
+HEADER = struct.Struct("<4sHHII")
+_V4_MAPPED = b"\0" * 10 + b"\xff\xff"
+
+# Checked in order: iPads and iPhones also say "Mac OS X", Android says Linux.
+_DEVICE_MARKERS = (
+    ("iOS", ("iPhone", "iPad", "iPod")),
+    ("Android", ("Android",)),
+    ("Windows", ("Windows",)),
+    ("Mac", ("Macintosh", "Mac OS X")),
+    ("Linux", ("Linux", "X11", "CrOS")),
+)
+
+
+@lru_cache(maxsize=65536)
+def classify_user_agent(user_agent):
+    """
+    Map a User-Agent string to one of DEVICES.
+    """
+    for device, markers in _DEVICE_MARKERS:
+        for marker in markers:
+            if marker in user_agent:
+                return device
+    return OTHER
+
+
+class _FixedWidthKeys:
+    """
+    Read-only sequence over fixed-width byte strings in a buffer, so bisect
+    can search 16-byte IPv6 keys in place.
+    """
+
+    def __init__(self, buffer, offset, count, width):
+        self.buffer = buffer
+        self.offset = offset
+        self.count = count
+        self.width = width
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        start = self.offset + index * self.width
+        return self.buffer[start : start + self.width]
+
+
+class IPRangeTable:
+    """
+    Memory-mapped IP range table (see the module docstring for the layout).
+    """
+
+    def __init__(self, path):
+        if sys.byteorder != "little":
+            raise RuntimeError("IP range tables are little-endian")
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, n4, n6 = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} IP range table")
+
+        view = memoryview(self._mmap)
+        offset = HEADER.size
+        self._v4_starts = view[offset : offset + 4 * n4].cast("I")
+        offset += 4 * n4
+        self._v4_ends = view[offset : offset + 4 * n4].cast("I")
+        offset += 4 * n4
+        self._v4_locations = view[offset : offset + n4]
+        offset += n4 + (-n4 % 4)
+        self._v6_starts = _FixedWidthKeys(self._mmap, offset, n6, 16)
+        offset += 16 * n6
+        self._v6_ends = _FixedWidthKeys(self._mmap, offset, n6, 16)
+        offset += 16 * n6
+        self._v6_locations = view[offset : offset + n6]
+        self.ranges = n4 + n6
+
+    def lookup(self, ip):
+        """
+        Location bucket for an IPv4 or IPv6 address string.
+        """
+        try:
+            packed = socket.inet_aton(ip) if ":" not in ip else None
+        except OSError:
+            return OTHER
+        if packed is not None:
+            key = int.from_bytes(packed, "big")
+            starts, ends = self._v4_starts, self._v4_ends
+            locations = self._v4_locations
+        else:
+            try:
+                key = socket.inet_pton(socket.AF_INET6, ip)
+            except OSError:
+                return OTHER
+            if key.startswith(_V4_MAPPED):
+                return self.lookup(socket.inet_ntoa(key[12:]))
+            starts, ends = self._v6_starts, self._v6_ends
+            locations = self._v6_locations
+        index = bisect.bisect_right(starts, key) - 1
+        if index >= 0 and key <= ends[index]:
+            return LOCATIONS[locations[index]]
+        return OTHER
+
+
+def write_ip_table(path, v4_ranges, v6_ranges):
+    """
+    Write a table from (start, end, location) ranges. IPv4 bounds are ints,
+    IPv6 bounds are 16-byte packed addresses; both must be sorted and
+    non-overlapping.
+    """
+    index = {name: i for i, name in enumerate(LOCATIONS)}
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, len(v4_ranges), len(v6_ranges)))
+        f.write(struct.pack(f"<{len(v4_ranges)}I", *(r[0] for r in v4_ranges)))
+        f.write(struct.pack(f"<{len(v4_ranges)}I", *(r[1] for r in v4_ranges)))
+        f.write(bytes(index[r[2]] for r in v4_ranges))
+        f.write(b"\0" * (-len(v4_ranges) % 4))
+        f.write(b"".join(r[0] for r in v6_ranges))
+        f.write(b"".join(r[1] for r in v6_ranges))
+        f.write(bytes(index[r[2]] for r in v6_ranges))
+
+
+class Enricher:
+    """
+    Fills in missing device and location from `user_agent` and `ip`.
+    Without an IP table, locations are left as sent.
+    """
+
+    def __init__(self, ip_table=None):
+        self.ip_table = ip_table
+
+    def enrich(self, event):
+        if event.get("device") is None and event.get("user_agent"):
+            event["device"] = classify_user_agent(event["user_agent"])
+        if event.get("location") is None and event.get("ip") and self.ip_table:
+            event["location"] = self.ip_table.lookup(event["ip"])
+        return event
+
+    def stats(self):
+        cache = classify_user_agent.cache_info()
+        return {
+            "ip_ranges": self.ip_table.ranges if self.ip_table else 0,
+            "user_agent_cache_hits": cache.hits,
+            "user_agent_cache_misses": cache.misses,
+            "user_agent_cache_size": cache.currsize,
+        }
+
+
+def get_enricher():
+    return current_app.extensions["enricher"]
+
+
+def enrichment_probe():
+    """
+    Readiness detail: IP table size and User-Agent cache hit counts.
+    """
+    return get_enricher().stats()
+
+
+def init_enrichment(app):
+    path = app.config["ENRICH_IP_TABLE"]
+    enricher = Enricher(IPRangeTable(path) if path else None)
+    app.extensions["enricher"] = enricher
+    register_readiness_probe(app, "ingest_enrichment", enrichment_probe, critical=False)
+    return enricher
@@ -0,0 +1,201 @@
+"""
+Parallel fan-out of long-range aggregate queries.
+
+One statement over a year of metrics runs on a single Postgres backend.
+fan_out() splits the range into chunks (calendar months, see month_chunks)
+that run concurrently on separate pooled connections; the caller merges the
+partial aggregates. One call runs at most FANOUT_CONCURRENCY chunks at a
+time, and a worker process at most FANOUT_MAX_WORKERS across all calls, so
+fan-out cannot drain the connection pool.
+
+All chunks share the caller's statement timeout as one deadline. When a
+chunk fails, the deadline passes or the calling thread is interrupted,
+chunks not started yet are dropped and running ones are cancelled on the
+server, so an abandoned request does not leave queries behind.
+
+run_concurrently() uses the same threads for whole computations (functions
+using db.session) that one response needs side by side, such as the parts
+of the dashboard overview.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from flask import current_app, g
+from sqlalchemy import text
+
+from app.models import db
+from app.utils.counters import counters
+from app.utils.profiling import record_phase
+from app.utils.result_cache import set_statement_timeout
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor(max_workers):
+    global _executor, _executor_pid
+    with _executor_lock:
+        # Threads do not survive fork; a preloaded master's pool is useless.
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers, thread_name_prefix="fanout")
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def month_chunks(start, end):
+    """
+    Split [start, end) at calendar month boundaries.
+    """
+    chunks = []
+    current = start
+    while current < end:
+        month_start = current.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        next_month = (month_start + timedelta(days=32)).replace(day=1)
+        chunks.append((current, min(next_month, end)))
+        current = min(next_month, end)
+    return chunks
+
+
+class FanOutCancelled(Exception):
+    pass
+
+
+class _Calls:
+    """
+    Connections of one fan_out() call that are running a statement, so they
+    can be cancelled from the calling thread.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = {}
+        self.cancelled = False
+
+    def cancel(self):
+        with self.lock:
+            self.cancelled = True
+            connections = list(self.running.values())
+        for dbapi_connection in connections:
+            try:
+                dbapi_connection.cancel()
+            except Exception:
+                pass
+        return len(connections)
+
+
+def _run_chunk(engine, statement_for, chunk, deadline, calls):
+    with engine.connect() as connection:
+        dbapi_connection = connection.connection.dbapi_connection
+        with calls.lock:
+            if calls.cancelled:
+                raise FanOutCancelled()
+            calls.running[chunk] = dbapi_connection
+        try:
+            remaining = max(1, int((deadline - time.monotonic()) * 1000))
+            with connection.begin():
+                connection.execute(text(f"SET LOCAL statement_timeout = {remaining}"))
+                return connection.execute(statement_for(*chunk)).all()
+        finally:
+            with calls.lock:
+                calls.running.pop(chunk, None)
+
+
+def fan_out(chunks, statement_for, timeout_ms=None, concurrency=None):
+    """
+    Run `statement_for(chunk_start, chunk_end)` for every chunk on its own
+    connection and return the row lists in chunk order. `timeout_ms`
+    defaults to the statement timeout set for the current dashboard query.
+    The first chunk error (e.g. a statement timeout) is raised after the
+    other chunks are cancelled.
+    """
+    config = current_app.config
+    concurrency = concurrency or config["FANOUT_CONCURRENCY"]
+    if timeout_ms is None:
+        timeout_ms = g.get("statement_timeout_ms")
+    if timeout_ms is None:
+        timeout_ms = config["DASHBOARD_REFRESH_TIMEOUT_MS"]
+    executor = _get_executor(config["FANOUT_MAX_WORKERS"])
+    engine = db.engine
+    deadline = time.monotonic() + timeout_ms / 1000
+    calls = _Calls()
+
+    started = time.perf_counter()
+    pending = list(enumerate(chunks))
+    futures = {}
+    results = [None] * len(chunks)
+    try:
+        while pending or futures:
+            while pending and len(futures) < concurrency:
+                index, chunk = pending.pop(0)
+                future = executor.submit(
+                    _run_chunk, engine, statement_for, chunk, deadline, calls
+                )
+                futures[future] = index
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[futures.pop(future)] = future.result()
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        cancelled = calls.cancel()
+        counters.incr("fanout.aborted")
+        counters.incr("fanout.cancelled_statements", cancelled)
+        raise
+    finally:
+        # Chunks run on other threads; the caller spends this time on SQL.
+        record_phase("sql", started)
+    counters.incr("fanout.calls")
+    counters.incr("fanout.chunks", len(chunks))
+    return results
+
+
+def _run_function(app, function, deadline):
+    with app.app_context():
+        try:
+            remaining = max(1, int((deadline - time.monotonic()) * 1000))
+            set_statement_timeout(remaining)
+            return function()
+        finally:
+            db.session.remove()
+
+
+def run_concurrently(functions, timeout_ms=None, concurrency=None):
+    """
+    Call independent `functions` (which may use db.session) at the same
+    time, each in its own app context, session and pooled connection, and
+    return their results in order. They share the caller's statement timeout
+    as one deadline. When one raises, calls not started yet are dropped and
+    the error is raised. With FANOUT_CONCURRENCY=1 they run one after
+    another on the caller's session. The functions must not fan out
+    themselves: they would wait for the threads they occupy.
+    """
+    config = current_app.config
+    concurrency = concurrency or config["FANOUT_CONCURRENCY"]
+    if concurrency <= 1:
+        return [function() for function in functions]
+    if timeout_ms is None:
+        timeout_ms = g.get("statement_timeout_ms")
+    if timeout_ms is None:
+        timeout_ms = config["DASHBOARD_REFRESH_TIMEOUT_MS"]
+    executor = _get_executor(config["FANOUT_MAX_WORKERS"])
+    app = current_app._get_current_object()
+    deadline = time.monotonic() + timeout_ms / 1000
+
+    started = time.perf_counter()
+    futures = [
+        executor.submit(_run_function, app, function, deadline)
+        for function in functions
+    ]
+    try:
+        return [future.result() for future in futures]
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
+    finally:
+        record_phase("sql", started)
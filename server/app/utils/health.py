@@ -0,0 +1,158 @@
+"""
+Readiness probes for the health check endpoints.
+
+Each component (database, connection pool, ...) registers a probe. Probes are
+run together and the combined result is cached for a short interval, so load
+balancers and orchestrators can poll readiness as often as they like without
+adding load on the database.
+"""
+
+import threading
+import time
+from datetime import datetime, timezone
+
+from flask import current_app
+from sqlalchemy import text
+
+from app.models import db
+
+STATUS_OK = "ok"
+STATUS_DEGRADED = "degraded"
+STATUS_DOWN = "down"
+
+
+class ReadinessProbes:
+    """
+    Registry of readiness probes with a time-based result cache.
+    A probe is a callable returning a dict of details. It may set "status" to
+    "degraded" to report a soft failure; raising marks it "down" when the
+    probe is critical and "degraded" otherwise.
+    """
+
+    def __init__(self, ttl=5.0, slow_ms=500):
+        self.ttl = ttl
+        self.slow_ms = slow_ms
+        self._probes = {}
+        self._lock = threading.Lock()
+        self._cached = None
+        self._cached_at = 0.0
+
+    def register(self, name, check, critical=True):
+        self._probes[name] = (check, critical)
+        self._cached = None
+
+    def _run_probe(self, check, critical):
+        started = time.perf_counter()
+        try:
+            details = check() or {}
+            status = details.pop("status", STATUS_OK)
+        except Exception as e:
+            # Only the exception type: the endpoint is unauthenticated.
+            details = {"error": type(e).__name__}
+            status = STATUS_DOWN if critical else STATUS_DEGRADED
+        latency_ms = (time.perf_counter() - started) * 1000
+        if status == STATUS_OK and latency_ms > self.slow_ms:
+            status = STATUS_DEGRADED
+        return {"status": status, "latency_ms": round(latency_ms, 2), **details}
+
+    def _run_all(self):
+        components = {
+            name: self._run_probe(check, critical)
+            for name, (check, critical) in self._probes.items()
+        }
+        statuses = {component["status"] for component in components.values()}
+        if STATUS_DOWN in statuses:
+            overall = STATUS_DOWN
+        elif STATUS_DEGRADED in statuses:
+            overall = STATUS_DEGRADED
+        else:
+            overall = STATUS_OK
+        return {
+            "status": overall,
+            "checked_at": datetime.now(timezone.utc).isoformat(),
+            "components": components,
+        }
+
+    def _expired(self):
+        return self._cached is None or time.monotonic() - self._cached_at >= self.ttl
+
+    def check(self):
+        """
+        Return the cached readiness result, re-running the probes when it is
+        older than the TTL. Concurrent callers share a single probe run.
+        """
+        if self._expired():
+            with self._lock:
+                if self._expired():
+                    self._cached = self._run_all()
+                    self._cached_at = time.monotonic()
+        age_ms = (time.monotonic() - self._cached_at) * 1000
+        return {**self._cached, "age_ms": round(age_ms, 2)}
+
+
+def get_readiness_probes(app):
+    return app.extensions["readiness_probes"]
+
+
+def register_readiness_probe(app, name, check, critical=True):
+    """
+    Register a readiness probe on the app. Extensions call this during
+    create_app to add their own components to /api/health-check/ready.
+    """
+    get_readiness_probes(app).register(name, check, critical)
+
+
+def database_probe():
+    """
+    Round trip to the database, reporting replication lag on standbys.
+    """
+    with db.engine.connect() as connection:
+        row = connection.execute(
+            text(
+                "SELECT pg_is_in_recovery() AS in_recovery, "
+                "EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) "
+                "AS replication_lag"
+            )
+        ).one()
+    details = {"in_recovery": row.in_recovery}
+    if row.in_recovery:
+        lag = float(row.replication_lag or 0)
+        details["replication_lag_seconds"] = round(lag, 3)
+        if lag > current_app.config["READINESS_MAX_REPLICATION_LAG"]:
+            details["status"] = STATUS_DEGRADED
+    return details
+
+
+def pool_probe():
+    """
+    Report connection pool usage without touching the database.
+    """
+    pool = db.engine.pool
+    if not hasattr(pool, "checkedout"):
+        return {"pool": type(pool).__name__}
+    size = pool.size()
+    checked_out = pool.checkedout()
+    overflow = pool.overflow()
+    # QueuePool.overflow() is negative until the pool has been filled once.
+    capacity = size + getattr(pool, "_max_overflow", 0)
+    details = {
+        "size": size,
+        "checked_out": checked_out,
+        "overflow": max(overflow, 0),
+        "capacity": capacity,
+    }
+    if capacity > 0 and checked_out >= capacity:
+        details["status"] = STATUS_DEGRADED
+    return details
+
+
+def init_health(app):
+    """
+    Create the readiness registry and register the built-in probes.
+    """
+    app.extensions["readiness_probes"] = ReadinessProbes(
+        ttl=app.config["READINESS_CACHE_TTL"],
+        slow_ms=app.config["READINESS_SLOW_MS"],
+    )
+    register_readiness_probe(app, "database", database_probe)
+    register_readiness_probe(app, "pool", pool_probe, critical=False)
@@ -0,0 +1,107 @@
+"""
+Duplicate suppression for ingested events.
+
+Events may carry an `idempotency_key`; the database enforces it with a
+unique index per site, key and UTC day of the event timestamp. In front of
+that each worker keeps a rotating Bloom filter of recently seen (site, key,
+day) triples:
+
+- "verify" (default): filter hits are still inserted and left to the unique
+  index; the filter only measures how often it would have been right.
+- "reject": filter hits are looked up in the unique index (one indexed read
+  per batch) and only the stored ones are dropped before the insert. A
+  false positive (at INGEST_BLOOM_ERROR_RATE) costs that read, never the
+  event.
+- "off": no filter, the unique index alone deduplicates.
+"""
+
+from flask import current_app
+
+from app.utils.bloom import RotatingBloomFilter
+from app.utils.counters import counters
+from app.utils.health import register_readiness_probe
+
+MODE_REJECT = "reject"
+MODE_VERIFY = "verify"
+MODE_OFF = "off"
+
+
+def dedup_key(site_id, key, timestamp):
+    """
+    The filter key of an event: what the unique index on metrics compares,
+    the site, the idempotency key and the UTC day of the (naive UTC)
+    timestamp.
+    """
+    return f"{site_id}:{key}:{timestamp.date().isoformat()}"
+
+
+class RecentKeys:
+    """
+    The per-worker filter of recently ingested idempotency keys.
+    """
+
+    def __init__(self, mode, capacity, error_rate, rotate_seconds):
+        if mode not in (MODE_REJECT, MODE_VERIFY, MODE_OFF):
+            raise ValueError(f"Unknown INGEST_DEDUP_MODE: {mode!r}")
+        self.mode = mode
+        self.filter = None
+        if mode != MODE_OFF:
+            self.filter = RotatingBloomFilter(capacity, error_rate, rotate_seconds)
+
+    def split(self, keys):
+        """
+        Split keys into (to insert, seen by the filter). Seen keys are only
+        returned in reject mode, for the caller to confirm against the
+        database; they may be false positives.
+        """
+        if self.filter is None:
+            return list(keys), []
+        fresh, seen = [], []
+        for key in keys:
+            (seen if key in self.filter else fresh).append(key)
+        counters.incr("ingest.bloom_hits", len(seen))
+        if self.mode == MODE_VERIFY:
+            return fresh + seen, []
+        return fresh, seen
+
+    def remember(self, keys, inserted):
+        """
+        Add keys to the filter after an insert. In verify mode, count the
+        filter hits that the database accepted as new (false positives).
+        """
+        if self.filter is None:
+            return
+        if self.mode == MODE_VERIFY:
+            false_positives = sum(1 for key in inserted if key in self.filter)
+            counters.incr("ingest.bloom_false_positives", false_positives)
+        for key in keys:
+            self.filter.add(key)
+
+    def stats(self):
+        stats = {"mode": self.mode}
+        if self.filter is not None:
+            stats.update(self.filter.stats())
+        return stats
+
+
+def get_recent_keys():
+    return current_app.extensions["idempotency_keys"]
+
+
+def ingest_dedup_probe():
+    """
+    Readiness detail: the duplicate filter's mode, size and error rate.
+    """
+    return get_recent_keys().stats()
+
+
+def init_idempotency(app):
+    recent_keys = RecentKeys(
+        app.config["INGEST_DEDUP_MODE"],
+        app.config["INGEST_BLOOM_CAPACITY"],
+        app.config["INGEST_BLOOM_ERROR_RATE"],
+        app.config["INGEST_BLOOM_ROTATE_SECONDS"],
+    )
+    app.extensions["idempotency_keys"] = recent_keys
+    register_readiness_probe(app, "ingest_dedup", ingest_dedup_probe, critical=False)
+    return recent_keys
@@ -0,0 +1,385 @@
+"""
+Lock-safe building blocks for Alembic migrations on large tables.
+
+Plain DDL on `metrics` takes locks that block ingest for as long as the
+statement runs (or, worse, queues behind a long transaction while holding
+everyone else up). Migrations touching a table in LARGE_TABLES use these
+helpers instead; `poetry run check-migrations` enforces it.
+
+- create_index_concurrently / drop_index_concurrently run outside the
+  migration transaction and clean up an INVALID index left by a failed run.
+- add_column adds a nullable column under a lock_timeout guard;
+  backfill_in_batches fills it in short autocommitted batches.
+- add_foreign_key / set_not_null add the constraint NOT VALID and
+  validate it separately, which scans without blocking writes.
+- set_lock_timeout guards any other DDL in the migration transaction.
+- log_relation_sizes logs table and index sizes, e.g. before and after.
+
+`alembic -x dry_run=true upgrade head` runs the pending migrations in a
+transaction that is rolled back; the helpers only log estimates from table
+statistics, and op.execute() only EXPLAINs DML (see dry_run_execute).
+"""
+
+import json
+import logging
+import re
+import time
+from contextlib import contextmanager
+
+import sqlalchemy as sa
+from alembic import context, op
+from sqlalchemy.exc import DBAPIError, OperationalError
+
+LARGE_TABLES = {"metrics"}
+DEFAULT_LOCK_TIMEOUT_MS = 3000
+LOCK_RETRIES = 5
+LOCK_NOT_AVAILABLE = "55P03"  # SQLSTATE raised when lock_timeout expires
+
+# Rough throughput for dry-run estimates; override with
+# -x index_mb_per_second=... and -x backfill_rows_per_second=...
+INDEX_BUILD_MB_PER_SECOND = 40
+BACKFILL_ROWS_PER_SECOND = 20000
+
+log = logging.getLogger("alembic.online")
+
+_DML = re.compile(r"^\s*(WITH|SELECT|INSERT|UPDATE|DELETE)\b", re.IGNORECASE)
+
+
+def _x_argument(name, default=None):
+    return context.get_x_argument(as_dictionary=True).get(name, default)
+
+
+def is_dry_run():
+    return str(_x_argument("dry_run", "false")).lower() == "true"
+
+
+def table_stats(table):
+    """
+    Planner statistics for `table`: estimated rows and heap/total bytes.
+    """
+    return (
+        op.get_bind()
+        .execute(
+            sa.text(
+                """
+                SELECT greatest(c.reltuples, 0)::bigint AS rows,
+                       pg_relation_size(c.oid) AS heap_bytes,
+                       pg_total_relation_size(c.oid) AS total_bytes
+                FROM pg_class c WHERE c.oid = to_regclass(:table)
+                """
+            ),
+            {"table": table},
+        )
+        .one_or_none()
+    )
+
+
+RELATION_SIZES_SQL = sa.text(
+    """
+    SELECT c.relname AS name, c.relkind AS kind, pg_relation_size(c.oid) AS bytes
+    FROM pg_class c
+    WHERE c.oid = to_regclass(:table)
+       OR c.oid IN (
+           SELECT indexrelid FROM pg_index WHERE indrelid = to_regclass(:table)
+       )
+    ORDER BY c.relkind DESC, c.relname
+    """
+)
+
+
+def log_relation_sizes(table, label):
+    """
+    Log the heap size of `table` and of each of its indexes.
+    """
+    if context.is_offline_mode():
+        return
+    for row in op.get_bind().execute(RELATION_SIZES_SQL, {"table": table}):
+        log.info("%s: %-40s %10.1f MB", label, row.name, row.bytes / 1024**2)
+
+
+def _estimate(action, table, seconds_for):
+    stats = table_stats(table)
+    if stats is None:
+        log.info("[dry run] %s: table %s does not exist yet", action, table)
+        return
+    log.info(
+        "[dry run] %s: %s has ~%s rows, %.1f MB heap; estimated %.0fs",
+        action,
+        table,
+        stats.rows,
+        stats.heap_bytes / 1024**2,
+        seconds_for(stats),
+    )
+
+
+def dry_run_execute(sql, execution_options=None):
+    """
+    Stands in for the migration context's execute(), which op.execute()
+    calls, in a dry run (see migrations/env.py). DML is only EXPLAINed and
+    the planner's estimate logged; other statements (DDL, SET, functions)
+    are skipped. So a dry run neither scans nor writes a large table, and
+    takes no lock stronger than planning needs.
+    """
+    statement = str(sql).strip()
+    summary = statement.splitlines()[0][:80] if statement else ""
+    if not _DML.match(statement):
+        log.info("[dry run] skip: %s", summary)
+        return
+    bind = op.get_bind()
+    try:
+        with bind.begin_nested():
+            plan = bind.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}").scalar()
+    except DBAPIError as e:
+        log.info("[dry run] %s: no estimate (%s)", summary, e.orig)
+        return
+    plan = (json.loads(plan) if isinstance(plan, str) else plan)[0]["Plan"]
+    log.info(
+        "[dry run] %s: ~%s rows, cost %.0f",
+        summary,
+        plan["Plan Rows"],
+        plan["Total Cost"],
+    )
+
+
+def set_lock_timeout(milliseconds=DEFAULT_LOCK_TIMEOUT_MS):
+    """
+    Make DDL in the current migration transaction give up after
+    `milliseconds` instead of waiting for (and blocking behind) other locks.
+    """
+    op.execute(f"SET LOCAL lock_timeout = {int(milliseconds)}")
+
+
+@contextmanager
+def _autocommit(lock_timeout_ms):
+    with op.get_context().autocommit_block():
+        op.execute(f"SET lock_timeout = {int(lock_timeout_ms)}")
+        try:
+            yield op.get_bind()
+        finally:
+            op.execute("RESET lock_timeout")
+
+
+def _retry_on_lock_timeout(action, fn, retries=LOCK_RETRIES):
+    for attempt in range(1, retries + 1):
+        try:
+            return fn()
+        except OperationalError as e:
+            if getattr(e.orig, "pgcode", None) != LOCK_NOT_AVAILABLE:
+                raise
+            if attempt == retries:
+                raise
+            log.warning("%s: lock timeout, retry %s/%s", action, attempt, retries)
+            time.sleep(attempt)
+
+
+def _drop_invalid_index(bind, index_name, table):
+    if context.is_offline_mode():
+        return
+    invalid = bind.execute(
+        sa.text(
+            """
+            SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE c.relname = :name AND NOT i.indisvalid
+            """
+        ),
+        {"name": index_name},
+    ).scalar()
+    if invalid:
+        log.warning("Dropping invalid index %s left by an earlier run", index_name)
+        op.drop_index(index_name, table_name=table, postgresql_concurrently=True)
+
+
+def create_index_concurrently(
+    index_name, table, columns, lock_timeout_ms=DEFAULT_LOCK_TIMEOUT_MS, **kw
+):
+    """
+    CREATE INDEX CONCURRENTLY outside the migration transaction. Writes
+    continue during the build; a lock timeout is retried.
+    """
+    if is_dry_run():
+        rate = float(_x_argument("index_mb_per_second", INDEX_BUILD_MB_PER_SECOND))
+        _estimate(
+            f"create index {index_name}",
+            table,
+            lambda stats: stats.heap_bytes / 1024**2 / rate,
+        )
+        return
+
+    def build():
+        with _autocommit(lock_timeout_ms) as bind:
+            _drop_invalid_index(bind, index_name, table)
+            op.create_index(
+                index_name,
+                table,
+                columns,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+                **kw,
+            )
+
+    _retry_on_lock_timeout(f"create index {index_name}", build)
+
+
+def drop_index_concurrently(index_name, table, lock_timeout_ms=DEFAULT_LOCK_TIMEOUT_MS):
+    """
+    DROP INDEX CONCURRENTLY outside the migration transaction.
+    """
+    if is_dry_run():
+        log.info("[dry run] drop index %s on %s", index_name, table)
+        return
+
+    def drop():
+        with _autocommit(lock_timeout_ms):
+            op.drop_index(
+                index_name,
+                table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
+
+    _retry_on_lock_timeout(f"drop index {index_name}", drop)
+
+
+def add_column(table, column, lock_timeout_ms=DEFAULT_LOCK_TIMEOUT_MS):
+    """
+    Add a nullable column without a default, which only touches the
+    catalog. Fill it with backfill_in_batches; add NOT NULL afterwards as a
+    NOT VALID check constraint validated separately.
+    """
+    if not column.nullable or column.server_default is not None:
+        raise ValueError(
+            f"add_column({table}.{column.name}): add it nullable without a "
+            "server default, then backfill in batches"
+        )
+    if is_dry_run():
+        log.info("[dry run] add column %s.%s (catalog only)", table, column.name)
+        return
+    set_lock_timeout(lock_timeout_ms)
+    op.add_column(table, column)
+
+
+def backfill_in_batches(
+    table,
+    assignments,
+    where,
+    batch_size=5000,
+    sleep=0.0,
+    key="id",
+    lock_timeout_ms=DEFAULT_LOCK_TIMEOUT_MS,
+):
+    """
+    UPDATE `table` SET `assignments` for rows matching `where`, walking the
+    primary key in batches of `batch_size`. Each batch commits on its own,
+    so row locks are held briefly and progress survives an interruption
+    (`where` should exclude rows already filled, e.g. "col IS NULL").
+    Returns the number of rows updated.
+    """
+    if is_dry_run():
+        rate = float(_x_argument("backfill_rows_per_second", BACKFILL_ROWS_PER_SECOND))
+        _estimate(
+            f"backfill {table} SET {assignments}",
+            table,
+            lambda stats: stats.rows / rate,
+        )
+        return 0
+    if context.is_offline_mode():
+        raise RuntimeError("backfill_in_batches() cannot run in --sql mode")
+
+    statement = sa.text(
+        f"""
+        WITH batch AS (
+            SELECT {key} FROM {table}
+            WHERE {key} > :last_key AND ({where})
+            ORDER BY {key}
+            LIMIT :batch_size
+        ),
+        updated AS (
+            UPDATE {table} SET {assignments}
+            WHERE {key} IN (SELECT {key} FROM batch)
+            RETURNING {key}
+        )
+        SELECT max({key}) AS last_key, count(*) AS updated FROM updated
+        """
+    )
+    last_key, total, batches = 0, 0, 0
+    started = time.perf_counter()
+    with _autocommit(lock_timeout_ms) as bind:
+        while True:
+            result = _retry_on_lock_timeout(
+                f"backfill {table}",
+                lambda: bind.execute(
+                    statement, {"last_key": last_key, "batch_size": batch_size}
+                ).one(),
+            )
+            if not result.updated:
+                break
+            last_key = result.last_key
+            total += result.updated
+            batches += 1
+            if batches % 20 == 0:
+                elapsed = time.perf_counter() - started
+                log.info(
+                    "Backfill %s: %s rows (%.0f rows/s, at %s %s)",
+                    table,
+                    total,
+                    total / elapsed,
+                    key,
+                    last_key,
+                )
+            if sleep:
+                time.sleep(sleep)
+    return total
+
+
+def _validate_constraint(table, name, lock_timeout_ms):
+    # VALIDATE takes SHARE UPDATE EXCLUSIVE: reads and writes carry on.
+    with _autocommit(lock_timeout_ms):
+        op.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {name}")
+
+
+def add_foreign_key(
+    name,
+    table,
+    referent,
+    local_columns,
+    remote_columns,
+    lock_timeout_ms=DEFAULT_LOCK_TIMEOUT_MS,
+):
+    """
+    Add a foreign key NOT VALID (catalog only, new rows are checked), then
+    validate existing rows outside the migration transaction.
+    """
+    if is_dry_run():
+        log.info("[dry run] add foreign key %s on %s (NOT VALID)", name, table)
+        return
+    set_lock_timeout(lock_timeout_ms)
+    op.create_foreign_key(
+        name,
+        table,
+        referent,
+        local_columns,
+        remote_columns,
+        postgresql_not_valid=True,
+    )
+    _validate_constraint(table, name, lock_timeout_ms)
+
+
+def set_not_null(table, column, lock_timeout_ms=DEFAULT_LOCK_TIMEOUT_MS):
+    """
+    SET NOT NULL without a long ACCESS EXCLUSIVE scan: a validated
+    `column IS NOT NULL` check lets Postgres skip the scan, and the check
+    is dropped again afterwards.
+    """
+    if is_dry_run():
+        log.info("[dry run] set %s.%s NOT NULL (validated check)", table, column)
+        return
+    check = f"ck_{table}_{column}_not_null"
+    set_lock_timeout(lock_timeout_ms)
+    op.execute(
+        f"ALTER TABLE {table} ADD CONSTRAINT {check} "
+        f"CHECK ({column} IS NOT NULL) NOT VALID"
+    )
+    _validate_constraint(table, check, lock_timeout_ms)
+    set_lock_timeout(lock_timeout_ms)
+    op.alter_column(table, column, nullable=False)
+    op.drop_constraint(check, table, type_="check")
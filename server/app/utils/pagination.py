@@ -0,0 +1,32 @@
+"""
+Opaque cursors for keyset pagination.
+"""
+
+import base64
+import json
+from datetime import datetime
+
+from marshmallow import ValidationError
+
+
+def encode_cursor(timestamp, row_id):
+    """
+    Encode the sort key of the last row on a page as a URL-safe token.
+    """
+    raw = json.dumps([timestamp.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    Decode a token from encode_cursor back into (timestamp, id).
+    Raises ValidationError for anything that is not a valid cursor.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(row_id, int):
+            raise ValueError(row_id)
+        return datetime.fromisoformat(timestamp), row_id
+    except (ValueError, TypeError):
+        raise ValidationError({"cursor": ["Invalid cursor."]})
@@ -0,0 +1,195 @@
+"""
+Server-side prepared statements for hot dashboard queries.
+
+A PreparedStatement is written once as SQL with :named parameters. The
+first time a pooled connection runs it, the statement is sent with PREPARE;
+later requests on that connection only send EXECUTE with the parameters, so
+Postgres skips parsing and, once it settles on a generic plan, planning.
+Which statements a connection has prepared is kept in the pool's per
+connection `info`, which lives exactly as long as the server session.
+
+Every statement is filtered by site_id, and a few sites hold most of the
+rows. A generic plan is costed for an average site, which suits the many
+small ones but not the large ones. So for sites the planner's statistics
+list with at least PREPARED_CUSTOM_PLAN_SHARE of metrics (large_sites()),
+the transaction runs with plan_cache_mode = force_custom_plan and the
+statements are planned for their parameters; the rest keep the generic
+plan.
+
+execute_all() runs several independent statements for one response. With
+psycopg 3 they go out in pipeline mode, one network round trip for all of
+them; psycopg2 has no pipeline, so missing PREPAREs are batched into one
+round trip and the EXECUTEs follow one by one.
+
+Session-level prepared statements do not work behind a transaction-mode
+connection pooler such as PgBouncer; set PREPARED_STATEMENTS=false there.
+"""
+
+import re
+import time
+from collections import namedtuple
+
+from flask import current_app
+from sqlalchemy import text
+
+from app.models import db
+from app.utils.counters import counters
+from app.utils.profiling import record_phase
+
+_PARAMETER = re.compile(r"(?<![:\w]):(\w+)")
+
+# For the current transaction only, so other statements on the pooled
+# connection keep the default.
+CUSTOM_PLANS_SQL = "SET LOCAL plan_cache_mode = force_custom_plan"
+
+# The most common site_id values in metrics and their share of its rows, as
+# last measured by ANALYZE.
+SITE_SHARES_SQL = text(
+    """
+    SELECT unnest(most_common_vals::text::bigint[]) AS site_id,
+           unnest(most_common_freqs) AS share
+    FROM pg_stats
+    WHERE schemaname = current_schema()
+      AND tablename = 'metrics'
+      AND attname = 'site_id'
+    """
+)
+LARGE_SITES_TTL = 300  # seconds
+
+_large_sites = (None, frozenset())  # (monotonic time loaded, site ids)
+
+
+class PreparedStatement:
+    def __init__(self, name, sql):
+        self.name = name
+        self.sql = sql
+        self.parameters = []
+
+        def positional(match):
+            if match.group(1) not in self.parameters:
+                self.parameters.append(match.group(1))
+            return f"${self.parameters.index(match.group(1)) + 1}"
+
+        self.prepare_sql = f"PREPARE {name} AS {_PARAMETER.sub(positional, sql)}"
+        self.execute_sql = f"EXECUTE {name}"
+        if self.parameters:
+            placeholders = ", ".join(["%s"] * len(self.parameters))
+            self.execute_sql += f"({placeholders})"
+        # psycopg 3 prepares natively; it only needs driver placeholders.
+        self.driver_sql = _PARAMETER.sub(r"%(\1)s", sql.replace("%", "%%"))
+        self._row = None
+
+    def values(self, params):
+        return [params[name] for name in self.parameters]
+
+    def rows(self, cursor):
+        if self._row is None:
+            self._row = namedtuple("Row", [column[0] for column in cursor.description])
+        return [self._row(*row) for row in cursor.fetchall()]
+
+
+def _connection():
+    """
+    The session's pooled connection, in the session's transaction (so
+    SET LOCAL statement_timeout applies).
+    """
+    return db.session.connection().connection
+
+
+def large_sites():
+    """
+    Ids of the sites planned with custom plans, reloaded every
+    LARGE_SITES_TTL seconds per worker.
+    """
+    global _large_sites
+    loaded_at, sites = _large_sites
+    if loaded_at is None or time.monotonic() - loaded_at >= LARGE_SITES_TTL:
+        share = current_app.config["PREPARED_CUSTOM_PLAN_SHARE"]
+        sites = frozenset(
+            site_id
+            for site_id, fraction in db.session.execute(SITE_SHARES_SQL)
+            if fraction >= share
+        )
+        _large_sites = (time.monotonic(), sites)
+    return sites
+
+
+def execute_all(calls):
+    """
+    Run [(PreparedStatement, params), ...] on the session's connection and
+    return one row list per call.
+    """
+    if not current_app.config["PREPARED_STATEMENTS"]:
+        return [
+            db.session.execute(db.text(statement.sql), params).all()
+            for statement, params in calls
+        ]
+
+    custom = any(params.get("site_id") in large_sites() for _, params in calls)
+    if custom:
+        counters.incr("prepared.custom_plans")
+    connection = _connection()
+    dbapi_connection = connection.dbapi_connection
+    # The driver cursor bypasses SQLAlchemy's events, so time it here.
+    started = time.perf_counter()
+    if hasattr(dbapi_connection, "pipeline"):
+        results = _execute_pipeline(dbapi_connection, calls, custom)
+        record_phase("sql", started)
+        return results
+
+    # Sent ahead of the first query below rather than in a round trip of
+    # its own; a multi-statement string is sent as one query.
+    setup = [CUSTOM_PLANS_SQL] if custom else []
+    prepared = connection.info.get("prepared_statements", set())
+    if prepared is None:
+        # An earlier PREPARE batch failed partway; start over.
+        setup.append("DEALLOCATE ALL")
+        prepared = set()
+    statements = {statement.name: statement for statement, _ in calls}
+    missing = statements.keys() - prepared
+    with dbapi_connection.cursor() as cursor:
+        if missing:
+            setup.extend(statements[name].prepare_sql for name in sorted(missing))
+            try:
+                cursor.execute(";\n".join(setup))
+            except Exception:
+                # PREPARE is not transactional: the statements before the
+                # failing one exist on the connection now.
+                connection.info["prepared_statements"] = None
+                raise
+            setup = []
+            counters.incr("prepared.prepares", len(missing))
+            counters.incr("prepared.round_trips")
+        connection.info["prepared_statements"] = prepared | missing
+        results = []
+        for statement, params in calls:
+            cursor.execute(
+                ";\n".join(setup + [statement.execute_sql]), statement.values(params)
+            )
+            setup = []
+            results.append(statement.rows(cursor))
+    counters.incr("prepared.executes", len(calls))
+    counters.incr("prepared.round_trips", len(calls))
+    record_phase("sql", started)
+    return results
+
+
+def _execute_pipeline(dbapi_connection, calls, custom):
+    cursors = []
+    with dbapi_connection.pipeline():
+        if custom:
+            dbapi_connection.execute(CUSTOM_PLANS_SQL)
+        for statement, params in calls:
+            cursors.append(
+                dbapi_connection.execute(statement.driver_sql, params, prepare=True)
+            )
+    counters.incr("prepared.executes", len(calls))
+    counters.incr("prepared.pipelines")
+    counters.incr("prepared.round_trips")
+    return [
+        statement.rows(cursor) for (statement, _), cursor in zip(calls, cursors)
+    ]
+
+
+def execute(statement, params):
+    return execute_all([(statement, params)])[0]
@@ -0,0 +1,331 @@
+"""
+On-demand profiling of single requests.
+
+A request is profiled when it carries the admin token (PROFILE_ADMIN_TOKEN)
+in an `X-Profile-Token` header or a `profile` query parameter, or when it is
+picked by PROFILE_SAMPLE_RATE. While the view runs, a sampler thread records
+the request thread's Python stack every PROFILE_INTERVAL_MS, and the wall
+time is split into auth, SQL, Python compute and serialization.
+
+Each profile is written to PROFILE_DIR as a collapsed-stack file (one
+"frame;frame;... count" line per distinct stack, the input of flamegraph.pl,
+speedscope and inferno) plus a JSON summary. The directory keeps at most
+PROFILE_MAX_FILES profiles, oldest removed first, and is shared by the
+workers on a host; /api/health-check/profiles lists it.
+
+Requests that are not profiled only pay for the opt-in check. SQL listeners
+are attached only while a profile is running, and the auth, SQL and
+serialization timers elsewhere are a perf_counter() call and a check of
+`_active`.
+"""
+
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from functools import wraps
+from itertools import count
+from urllib.parse import urlencode
+
+from flask import current_app, g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from werkzeug.datastructures import ImmutableMultiDict
+
+from app.utils.counters import counters
+
+PHASES = ("auth", "sql", "compute", "serialization")
+TOKEN_HEADER = "X-Profile-Token"
+TOKEN_ARG = "profile"
+PROFILE_ID_PATTERN = re.compile(r"^[0-9]{8}T[0-9]{6}-[0-9]+-[0-9]+$")
+
+_lock = threading.Lock()
+_active = 0  # profiles running in this process
+_profiles = {}  # request thread ident -> RequestProfile
+_ids = count(1)
+
+
+def record_phase(name, started):
+    """
+    Add the time since `started` (a perf_counter() value) to phase `name`
+    of the current thread's profile, if it is being profiled.
+    """
+    if _active:
+        profile = _profiles.get(threading.get_ident())
+        if profile is not None:
+            profile.phases[name] += time.perf_counter() - started
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, many):
+    if threading.get_ident() in _profiles:
+        conn.info.setdefault("profile_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, many):
+    started = conn.info.get("profile_started")
+    if started:
+        record_phase("sql", started.pop())
+
+
+def _collapse(frame, stop_code):
+    """
+    "module:function;..." from the outermost frame below the profiling
+    wrapper down to `frame`.
+    """
+    names = []
+    while frame is not None and frame.f_code is not stop_code:
+        module = frame.f_globals.get("__name__", "?")
+        names.append(f"{module}:{frame.f_code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class RequestProfile:
+    """
+    Stack samples and phase timings for one request thread.
+    """
+
+    def __init__(self, interval, stop_code):
+        self.thread_id = threading.get_ident()
+        self.interval = interval
+        self.stop_code = stop_code
+        self.phases = defaultdict(float)
+        self.stacks = defaultdict(int)
+        self.samples = 0
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(
+            target=self._sample, name="profile-sampler", daemon=True
+        )
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = _collapse(frame, self.stop_code)
+            # Taken while the request thread was already in stop().
+            if self._stop.is_set():
+                break
+            self.stacks[stack] += 1
+            self.samples += 1
+
+    def start(self):
+        global _active
+        with _lock:
+            if not _active:
+                event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+                event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+            _active += 1
+            _profiles[self.thread_id] = self
+        self._sampler.start()
+
+    def stop(self):
+        global _active
+        self._stop.set()
+        self._sampler.join()
+        with _lock:
+            _profiles.pop(self.thread_id, None)
+            _active -= 1
+            if not _active:
+                event.remove(Engine, "before_cursor_execute", _before_cursor_execute)
+                event.remove(Engine, "after_cursor_execute", _after_cursor_execute)
+
+    def collapsed(self):
+        return "".join(
+            f"{stack} {samples}\n"
+            for stack, samples in sorted(self.stacks.items())
+            if stack
+        )
+
+
+class ProfileStore:
+    """
+    Profiles as <id>.json (summary) and <id>.folded (collapsed stacks) in
+    one directory, capped at `max_files` profiles.
+    """
+
+    def __init__(self, directory, max_files):
+        self.directory = directory
+        self.max_files = max_files
+
+    def new_id(self):
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        return f"{stamp}-{os.getpid()}-{next(_ids):06d}"
+
+    def _path(self, profile_id, suffix):
+        return os.path.join(self.directory, profile_id + suffix)
+
+    def save(self, profile_id, summary, collapsed):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path(profile_id, ".folded"), "w") as f:
+            f.write(collapsed)
+        # The summary last: listing only shows profiles whose stacks exist.
+        with open(self._path(profile_id, ".json"), "w") as f:
+            json.dump(summary, f)
+        self._prune()
+
+    def _ids(self):
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        # Ids start with the UTC time, so this is newest first.
+        return sorted(
+            (name[: -len(".json")] for name in names if name.endswith(".json")),
+            reverse=True,
+        )
+
+    def _prune(self):
+        for profile_id in self._ids()[self.max_files :]:
+            for suffix in (".json", ".folded"):
+                try:
+                    os.unlink(self._path(profile_id, suffix))
+                except FileNotFoundError:
+                    pass  # pruned by another worker
+
+    def list(self, limit):
+        summaries = []
+        for profile_id in self._ids()[:limit]:
+            try:
+                with open(self._path(profile_id, ".json")) as f:
+                    summaries.append(json.load(f))
+            except (FileNotFoundError, ValueError):
+                continue
+        return summaries
+
+    def collapsed(self, profile_id):
+        """
+        The collapsed stacks of a profile, or None if it does not exist.
+        """
+        if not PROFILE_ID_PATTERN.match(profile_id):
+            return None
+        try:
+            with open(self._path(profile_id, ".folded")) as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+
+def is_admin_request():
+    """
+    Whether the request carries the profiling admin token.
+    """
+    token = current_app.config["PROFILE_ADMIN_TOKEN"]
+    supplied = request.headers.get(TOKEN_HEADER) or request.args.get(TOKEN_ARG)
+    return bool(token and supplied) and hmac.compare_digest(
+        supplied.encode(), token.encode()
+    )
+
+
+def _without_token_arg():
+    # Query schemas reject unknown parameters.
+    request.args = ImmutableMultiDict(
+        [
+            (key, value)
+            for key, value in request.args.items(multi=True)
+            if key != TOKEN_ARG
+        ]
+    )
+
+
+def _summary(profile_id, reason, response, started_at, wall, profile):
+    phases = {name: profile.phases.get(name, 0.0) for name in PHASES}
+    phases["compute"] = max(
+        0.0, wall - phases["auth"] - phases["sql"] - phases["serialization"]
+    )
+    user = g.get("current_user")
+    return {
+        "id": profile_id,
+        "reason": reason,
+        "method": request.method,
+        "path": request.path,
+        # Rebuilt from the arguments: the raw query string can hold the token.
+        "query": urlencode(
+            [
+                (key, value)
+                for key, value in request.args.items(multi=True)
+                if key != TOKEN_ARG
+            ]
+        ),
+        "endpoint": request.endpoint,
+        "user_id": user.id if user is not None else None,
+        "status": response.status_code if response is not None else 500,
+        "started_at": started_at.isoformat(),
+        "wall_ms": round(wall * 1000, 2),
+        "phases_ms": {name: round(value * 1000, 2) for name, value in phases.items()},
+        "samples": profile.samples,
+        "interval_ms": profile.interval * 1000,
+        "pid": os.getpid(),
+    }
+
+
+def _profiled(view, store, sample_rate, interval):
+    @wraps(view)
+    def profiled_view(*args, **kwargs):
+        if is_admin_request():
+            reason = "admin"
+            _without_token_arg()
+        elif sample_rate and random.random() < sample_rate:
+            reason = "sampled"
+        else:
+            return view(*args, **kwargs)
+
+        profile = RequestProfile(interval, sys._getframe().f_code)
+        profile.start()
+        response = None
+        started_at = datetime.now(timezone.utc)
+        started = time.perf_counter()
+        try:
+            response = current_app.make_response(view(*args, **kwargs))
+        finally:
+            wall = time.perf_counter() - started
+            profile.stop()
+            profile_id = store.new_id()
+            try:
+                store.save(
+                    profile_id,
+                    _summary(profile_id, reason, response, started_at, wall, profile),
+                    profile.collapsed(),
+                )
+                counters.incr(f"profiling.{reason}")
+            except OSError:
+                current_app.logger.exception("Could not save profile %s", profile_id)
+                profile_id = None
+        if profile_id and reason == "admin":
+            response.headers["X-Profile-Id"] = profile_id
+        return response
+
+    return profiled_view
+
+
+def get_profile_store():
+    return current_app.extensions["profiles"]
+
+
+def init_profiling(app):
+    """
+    Wrap every registered view except the health checks (probes and the
+    profile listing). Call after the blueprints are registered.
+    """
+    directory = app.config["PROFILE_DIR"] or os.path.join(
+        tempfile.gettempdir(), "analytics-profiles"
+    )
+    store = ProfileStore(directory, app.config["PROFILE_MAX_FILES"])
+    app.extensions["profiles"] = store
+    if not (app.config["PROFILE_ADMIN_TOKEN"] or app.config["PROFILE_SAMPLE_RATE"]):
+        return
+    for endpoint, view in app.view_functions.items():
+        if endpoint != "static" and not endpoint.startswith("health_check."):
+            app.view_functions[endpoint] = _profiled(
+                view,
+                store,
+                app.config["PROFILE_SAMPLE_RATE"],
+                app.config["PROFILE_INTERVAL_MS"] / 1000,
+            )
@@ -0,0 +1,274 @@
+"""
+Token-bucket rate limiting for Flask routes.
+
+Buckets live either in process memory or in a memory-mapped file shared by
+every gunicorn worker on the host. Limits are checked before the request body
+is parsed, so a rejected request costs a hash lookup rather than a password
+hash.
+"""
+
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, request
+
+from app.utils.counters import counters
+from app.utils.response import standard_response
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+# Default rate of every limit applied with @rate_limit, by name; filled in as
+# the routes are imported.
+LIMITS = {}
+
+
+def parse_rate(rate):
+    """
+    Parse a rate like "10/minute" into (capacity, tokens per second).
+    Raises ValueError for anything else.
+    """
+    count, _, period = rate.partition("/")
+    seconds = PERIODS.get(period.strip().rstrip("s"))
+    try:
+        capacity = float(count)
+    except ValueError:
+        capacity = 0
+    if seconds is None or not capacity > 0 or math.isinf(capacity):
+        raise ValueError(f"Invalid rate {rate!r}, expected e.g. '10/minute'")
+    return capacity, capacity / seconds
+
+
+def _refill(tokens, updated, now, capacity, refill_rate):
+    if updated == 0:
+        return capacity
+    return min(capacity, tokens + (now - updated) * refill_rate)
+
+
+def _take(tokens, cost, refill_rate):
+    """
+    Return (allowed, new token count, seconds until the request would pass).
+    """
+    if tokens >= cost:
+        return True, tokens - cost, 0
+    return False, tokens, (cost - tokens) / refill_rate
+
+
+class MemoryBucketStore:
+    """
+    Buckets held in a dict. Only limits requests within one worker process.
+    """
+
+    def __init__(self, max_keys=100_000):
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, refill_rate, cost=1):
+        now = time.time()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, 0))
+            tokens = _refill(tokens, updated, now, capacity, refill_rate)
+            allowed, tokens, retry_after = _take(tokens, cost, refill_rate)
+            if len(self._buckets) >= self.max_keys:
+                # Dicts keep insertion order and buckets are re-inserted on
+                # every access, so the first key is the least recently used.
+                self._buckets.pop(next(iter(self._buckets)))
+            self._buckets[key] = (tokens, now)
+        return allowed, retry_after
+
+
+class MmapBucketStore:
+    """
+    Buckets in a fixed-size open-addressing table inside a memory-mapped
+    file, shared by all processes that open the same path. Updates are
+    serialised with flock, which the kernel releases if a worker dies.
+
+    When every slot in a key's probe window is taken, the least recently
+    updated one is reused, so the table never grows and a flood of distinct
+    keys only evicts idle buckets.
+    """
+
+    SLOT = struct.Struct("<Qdd")  # key hash, tokens, last update
+    PROBES = 8
+
+    def __init__(self, path, slots=65536):
+        self.path = path
+        self.slots = slots
+        self._lock = threading.Lock()
+        self._pid = None
+        self._file = None
+        self._map = None
+
+    def _open(self):
+        # The lock and the mapping must belong to this process: a file
+        # descriptor inherited across fork shares its flock with the parent.
+        if self._pid == os.getpid():
+            return
+        size = self.slots * self.SLOT.size
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(fd).st_size < size:
+            os.ftruncate(fd, size)
+        self._file = fd
+        self._map = mmap.mmap(fd, size)
+        self._pid = os.getpid()
+
+    @staticmethod
+    def _hash(key):
+        digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "little") or 1
+
+    def _find_slot(self, key_hash):
+        start = key_hash % self.slots
+        victim, victim_updated = start, math.inf
+        for i in range(self.PROBES):
+            index = (start + i) % self.slots
+            slot_hash, tokens, updated = self.SLOT.unpack_from(
+                self._map, index * self.SLOT.size
+            )
+            if slot_hash == key_hash:
+                return index, tokens, updated
+            if slot_hash == 0:
+                return index, 0.0, 0
+            if updated < victim_updated:
+                victim, victim_updated = index, updated
+        return victim, 0.0, 0
+
+    def take(self, key, capacity, refill_rate, cost=1):
+        key_hash = self._hash(key)
+        now = time.time()
+        with self._lock:
+            self._open()
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+            try:
+                index, tokens, updated = self._find_slot(key_hash)
+                tokens = _refill(tokens, updated, now, capacity, refill_rate)
+                allowed, tokens, retry_after = _take(tokens, cost, refill_rate)
+                self.SLOT.pack_into(
+                    self._map, index * self.SLOT.size, key_hash, tokens, now
+                )
+            finally:
+                fcntl.flock(self._file, fcntl.LOCK_UN)
+        return allowed, retry_after
+
+
+class RateLimiter:
+    """
+    Checks named limits against a bucket store and keeps counters per limit.
+    `overrides` maps limit names to rates like "10/minute"; they are parsed
+    here, so a bad one fails when the limiter is created.
+    """
+
+    def __init__(self, store, overrides=None):
+        self.store = store
+        self.overrides = {
+            name: parse_rate(rate) for name, rate in (overrides or {}).items()
+        }
+
+    def hit(self, name, rate, key):
+        """
+        `rate` is the limit's default as (capacity, tokens per second).
+        """
+        capacity, refill_rate = self.overrides.get(name, rate)
+        allowed, retry_after = self.store.take(f"{name}:{key}", capacity, refill_rate)
+        counters.incr(f"rate_limit.{name}.{'allowed' if allowed else 'rejected'}")
+        return allowed, retry_after
+
+
+def client_ip():
+    """
+    Key function: the client address, honouring X-Forwarded-For only when
+    RATE_LIMIT_TRUST_PROXY is set (i.e. behind a trusted reverse proxy).
+    """
+    if current_app.config["RATE_LIMIT_TRUST_PROXY"] and request.access_route:
+        return request.access_route[0]
+    return request.remote_addr or "unknown"
+
+
+def request_email():
+    """
+    Key function: the email in the JSON body, for per-account limits.
+    Parses the body but runs before validation and password hashing.
+    """
+    body = request.get_json(silent=True)
+    email = body.get("email") if isinstance(body, dict) else None
+    if not isinstance(email, str):
+        return None
+    return email.strip().lower() or None
+
+
+def rate_limit(name, rate, key=client_ip):
+    """
+    Decorator to apply a token-bucket limit to a route.
+    `rate` is the default like "10/minute" and can be overridden through the
+    RATE_LIMITS setting. Requests whose key function returns None are not
+    limited by this decorator. Rejected requests get a 429 with Retry-After.
+    """
+    default = parse_rate(rate)
+    LIMITS[name] = rate
+
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            limiter = current_app.extensions.get("rate_limiter")
+            bucket_key = key() if limiter else None
+            if bucket_key is not None:
+                allowed, retry_after = limiter.hit(name, default, bucket_key)
+                if not allowed:
+                    body, status = standard_response(
+                        False,
+                        None,
+                        "Too many requests. Please try again later.",
+                        429,
+                    )
+                    return body, status, {"Retry-After": str(math.ceil(retry_after))}
+            return f(*args, **kwargs)
+
+        return decorated
+
+    return decorator
+
+
+def parse_overrides(value):
+    """
+    Parse "login:ip=20/minute,login:account=5/minute" into a dict. Raises
+    ValueError for an entry without a rate or naming an unknown limit.
+    """
+    overrides = {}
+    for item in (value or "").split(","):
+        if not item.strip():
+            continue
+        name, _, rate = item.partition("=")
+        if not name.strip() or not rate.strip():
+            raise ValueError(f"Invalid RATE_LIMITS entry {item.strip()!r}")
+        if name.strip() not in LIMITS:
+            raise ValueError(
+                f"Unknown rate limit {name.strip()!r} in RATE_LIMITS; "
+                f"known: {', '.join(sorted(LIMITS))}"
+            )
+        overrides[name.strip()] = rate.strip()
+    return overrides
+
+
+def init_rate_limiter(app):
+    # Validated even when disabled, so a typo cannot wait for the day rate
+    # limiting is turned on.
+    overrides = parse_overrides(app.config["RATE_LIMITS"])
+    if not app.config["RATE_LIMIT_ENABLED"]:
+        return
+    if app.config["RATE_LIMIT_STORAGE"] == "mmap":
+        path = app.config["RATE_LIMIT_MMAP_PATH"] or os.path.join(
+            "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(),
+            "analytics-rate-limit",
+        )
+        store = MmapBucketStore(path, slots=app.config["RATE_LIMIT_SLOTS"])
+    else:
+        store = MemoryBucketStore(max_keys=app.config["RATE_LIMIT_SLOTS"])
+    app.extensions["rate_limiter"] = RateLimiter(store, overrides)
@@ -1,7 +1,11 @@
+import time
+
 from flask import jsonify
 
+from app.utils.profiling import record_phase
+
 
-def standard_response(success, data=None, message=None, status_code=200):
+def standard_response(success, data=None, message=None, status_code=200, meta=None):
     """
     Standardize API responses.
     Args:
@@ -9,12 +13,19 @@ def standard_response(success, data=None, message=None, status_code=200):
         data (dict or list, optional): The response data.
         message (str, optional): A message for the client.
         status_code (int): HTTP status code.
+        meta (dict, optional): Extra information about the data, such as
+            whether it is stale. Omitted from the body when not given.
     Returns:
         Flask Response: JSON response with standard structure.
     """
+    started = time.perf_counter()
     response = {
         "success": success,
         "data": data,
         "message": message,
     }
-    return jsonify(response), status_code
+    if meta is not None:
+        response["meta"] = meta
+    response = jsonify(response)
+    record_phase("serialization", started)
+    return response, status_code
@@ -0,0 +1,213 @@
+"""
+Stale-while-revalidate serving for dashboard queries.
+
+Every dashboard computation runs under a per-class statement_timeout. Its
+last good result is kept; when the database is slow or failing, the route
+answers with that result marked stale (with its age) and refreshes it in the
+background, instead of blocking the worker or returning a 500.
+"""
+
+import json
+import threading
+import time
+
+from flask import current_app, g
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError, SQLAlchemyError
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+
+from app.models import db
+from app.utils.admission import Shed, admitted, shed_response
+from app.utils.counters import counters
+from app.utils.health import register_readiness_probe
+from app.utils.response import standard_response
+from app.utils.scheduler import JobTimeout
+from app.utils.shared_cache import cache_get_json, cache_set_json, get_shared_cache
+
+QUERY_CANCELED = "57014"  # Postgres SQLSTATE for statement_timeout
+
+
+class LastGoodResults:
+    """
+    Last successful result per cache key, kept in the shared cache so every
+    worker on the host can serve it.
+    """
+
+    prefix = "dashboard:"
+
+    def get(self, key):
+        entry = cache_get_json(self.prefix + key)
+        return (entry["data"], entry["stored_at"]) if entry else None
+
+    def set(self, key, data):
+        cache_set_json(
+            self.prefix + key,
+            {"data": data, "stored_at": time.time()},
+            ex=current_app.config["DASHBOARD_RESULT_TTL"],
+        )
+
+
+last_good_results = LastGoodResults()
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+
+def cache_key(name, site_id, params):
+    return f"{name}:{site_id}:{json.dumps(params, sort_keys=True, default=str)}"
+
+
+def set_statement_timeout(milliseconds):
+    """
+    Limit every statement in the current transaction to `milliseconds`.
+    The value is also kept on `g` for work running on other connections
+    (see app.utils.fanout).
+    """
+    db.session.execute(text(f"SET LOCAL statement_timeout = {int(milliseconds)}"))
+    g.statement_timeout_ms = int(milliseconds)
+
+
+def _timeout_for(query_class):
+    return current_app.config["DASHBOARD_STATEMENT_TIMEOUTS"][query_class]
+
+
+def _failure_kind(error):
+    """
+    Counter suffix for a failed computation: "shed" when admission control
+    turned it away, "timeout" when it ran out of time (statement timeout, no
+    pooled connection in time, a cancelled fan-out, a job deadline), "error"
+    otherwise.
+    """
+    # Imported here: app.utils.fanout imports this module.
+    from app.utils.fanout import FanOutCancelled
+
+    if isinstance(error, Shed):
+        return "shed"
+    if isinstance(error, DBAPIError):
+        pgcode = getattr(error.orig, "pgcode", None)
+        return "timeout" if pgcode == QUERY_CANCELED else "error"
+    if isinstance(error, (PoolTimeout, FanOutCancelled, JobTimeout)):
+        return "timeout"
+    return "error"
+
+
+def _refresh_in_background(app, name, key, compute):
+    with _refreshing_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+
+    def run():
+        try:
+            with app.app_context():
+                try:
+                    set_statement_timeout(app.config["DASHBOARD_REFRESH_TIMEOUT_MS"])
+                    data = compute()
+                    if data is not None:
+                        last_good_results.set(key, data)
+                    counters.incr(f"dashboard.{name}.refreshed")
+                except Exception:
+                    counters.incr(f"dashboard.{name}.refresh_failed")
+                    app.logger.exception("Background refresh of %s failed", name)
+                finally:
+                    db.session.remove()
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(key)
+
+    threading.Thread(target=run, name=f"refresh-{name}", daemon=True).start()
+
+
+def serve_dashboard_query(name, query_class, params, compute, message):
+    """
+    Run `compute()` under the statement timeout for `query_class` and return
+    a standard response. Concurrent identical calls share one execution
+    (see app.utils.single_flight); only that execution takes an admission
+    slot (see app.utils.admission). If it fails (a timeout, a database error
+    or any other exception), serve the last good result for the same
+    parameters marked as stale and refresh it in the background. Without
+    one, database failures and timeouts get a 503 and other exceptions are
+    raised. A computation shed by admission control is served stale too,
+    without a background refresh, or else gets a 503 with Retry-After.
+    `compute` returning None means "not found" (404).
+    Results are shared and cached per site (g.site_id, set by
+    token_required), never across sites.
+    """
+    key = cache_key(name, g.site_id, params)
+
+    def run():
+        with admitted():
+            set_statement_timeout(_timeout_for(query_class))
+            return compute()
+
+    try:
+        data, shared = current_app.extensions["single_flight"].do(key, run)
+    except Exception as e:
+        db.session.rollback()
+        failure = _failure_kind(e)
+        counters.incr(f"dashboard.{name}.{failure}")
+        unexpected = failure == "error" and not isinstance(e, SQLAlchemyError)
+        cached = last_good_results.get(key)
+        if cached is None:
+            if unexpected:
+                raise
+            if failure == "shed":
+                return shed_response(e)
+            current_app.logger.warning("Dashboard query %s failed: %s", name, e)
+            return standard_response(
+                False, None, "Dashboard data is temporarily unavailable.", 503
+            )
+        data, stored_at = cached
+        counters.incr(f"dashboard.{name}.stale")
+        g.dashboard_stale = True
+        # A refresh now would add the load the request was shed for.
+        if failure != "shed":
+            current_app.logger.warning(
+                "Dashboard query %s failed, serving stale: %r",
+                name,
+                e,
+                exc_info=unexpected,
+            )
+            _refresh_in_background(
+                current_app._get_current_object(), name, key, compute
+            )
+        return standard_response(
+            True,
+            data,
+            message,
+            200,
+            meta={"stale": True, "age_seconds": round(time.time() - stored_at, 1)},
+        )
+
+    if data is None:
+        return standard_response(False, None, "No data found", 404)
+    last_good_results.set(key, data)
+    counters.incr(f"dashboard.{name}.{'coalesced' if shared else 'fresh'}")
+    return standard_response(True, data, message, 200)
+
+
+def result_cache_probe():
+    """
+    Readiness detail: how many entries the shared cache holds for serving
+    stale results if the database became unavailable.
+    """
+    entries = get_shared_cache().dbsize()
+    return {"entries": entries, "warm": entries > 0}
+
+
+def parse_statement_timeouts(value):
+    """
+    Parse "light=2000,standard=5000,heavy=15000" into a dict of milliseconds.
+    """
+    timeouts = {}
+    for item in value.split(","):
+        name, _, ms = item.partition("=")
+        if name.strip() and ms.strip():
+            timeouts[name.strip()] = int(ms)
+    return timeouts
+
+
+def init_result_cache(app):
+    timeouts = app.config["DASHBOARD_STATEMENT_TIMEOUTS"]
+    if isinstance(timeouts, str):
+        app.config["DASHBOARD_STATEMENT_TIMEOUTS"] = parse_statement_timeouts(timeouts)
+    register_readiness_probe(app, "result_cache", result_cache_probe, critical=False)
@@ -0,0 +1,359 @@
+"""
+In-process scheduler for background maintenance jobs.
+
+Every worker (and every replica) runs the same scheduler thread, but a job
+slot is executed exactly once: the runner takes a Postgres advisory lock for
+the job, and under that lock claims the slot in scheduled_jobs unless another
+process already ran it. Slots are deterministic (interval slots are aligned
+to the epoch, cron slots are UTC wall-clock times), so all processes agree on
+them; jitter only spreads out who tries first.
+
+Timeouts are enforced in the database: while a job runs, every transaction
+it begins gets `SET LOCAL statement_timeout` for the remaining budget, and a
+transaction begun after the deadline raises JobTimeout.
+"""
+
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import event, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from app.models import ScheduledJob, db
+from app.utils.counters import counters
+
+ADVISORY_LOCK_NAMESPACE = 7301  # first key of pg_try_advisory_lock(int, int)
+QUERY_CANCELED = "57014"
+EPOCH = datetime(1970, 1, 1)
+
+
+def utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class JobTimeout(Exception):
+    pass
+
+
+class Interval:
+    """
+    Run every `seconds`, on slots aligned to the Unix epoch.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def next_after(self, after):
+        elapsed = (after - EPOCH).total_seconds()
+        return EPOCH + timedelta(seconds=(elapsed // self.seconds + 1) * self.seconds)
+
+    def __str__(self):
+        return f"every {self.seconds}s"
+
+
+class Cron:
+    """
+    Standard five-field cron expression ("minute hour day month weekday"),
+    evaluated in UTC. Fields accept *, lists, ranges and steps; weekday 0 or 7
+    is Sunday. As in cron, when both day and weekday are restricted a time
+    matching either one runs.
+    """
+
+    FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expression):
+        parts = expression.split()
+        if len(parts) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expression!r}")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            self._parse(part, low, high)
+            for part, (low, high) in zip(parts, self.FIELDS)
+        )
+        self.weekdays = {day % 7 for day in weekdays}
+        self.any_day = parts[2] == "*"
+        self.any_weekday = parts[4] == "*"
+
+    @staticmethod
+    def _parse(field, low, high):
+        values = set()
+        for part in field.split(","):
+            span, _, step = part.partition("/")
+            if span == "*":
+                start, end = low, high
+            elif "-" in span:
+                start, end = (int(value) for value in span.split("-"))
+            else:
+                start = int(span)
+                end = high if step else start
+            if not low <= start <= end <= high:
+                raise ValueError(f"Cron field out of range: {field!r}")
+            values.update(range(start, end + 1, int(step) if step else 1))
+        return values
+
+    def _day_matches(self, moment):
+        day_ok = moment.day in self.days
+        weekday_ok = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.any_day and self.any_weekday:
+            return True
+        if self.any_day:
+            return weekday_ok
+        if self.any_weekday:
+            return day_ok
+        return day_ok or weekday_ok
+
+    def next_after(self, after):
+        moment = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = moment + timedelta(days=366 * 5)
+        while moment < limit:
+            if moment.month not in self.months:
+                year, month = divmod(moment.month, 12)
+                moment = datetime(moment.year + year, month + 1, 1)
+            elif not self._day_matches(moment):
+                moment = datetime(moment.year, moment.month, moment.day) + timedelta(
+                    days=1
+                )
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment
+        raise ValueError(f"Cron expression never matches: {self.expression!r}")
+
+    def __str__(self):
+        return f"cron {self.expression}"
+
+
+class Job:
+    """
+    A named maintenance job. `func` is called with no arguments inside an
+    app context and uses db.session like any other code.
+    """
+
+    def __init__(self, name, func, schedule, timeout=300, jitter=0):
+        self.name = name
+        self.func = func
+        self.schedule = schedule
+        self.timeout = timeout
+        self.jitter = jitter
+
+
+_job_deadline = threading.local()
+
+
+@event.listens_for(Session, "after_begin")
+def _apply_job_deadline(session, transaction, connection):
+    deadline = getattr(_job_deadline, "at", None)
+    if deadline is None:
+        return
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise JobTimeout("Job exceeded its timeout")
+    connection.exec_driver_sql(
+        f"SET LOCAL statement_timeout = {max(int(remaining * 1000), 1)}"
+    )
+
+
+def _claim_slot(name, slot):
+    state = db.session.get(ScheduledJob, name)
+    if state is None:
+        state = ScheduledJob(name=name, runs=0, failures=0)
+        db.session.add(state)
+    elif state.last_slot_at is not None and state.last_slot_at >= slot:
+        db.session.rollback()
+        return False
+    state.last_slot_at = slot
+    state.last_started_at = utcnow()
+    db.session.commit()
+    return True
+
+
+def _record_run(name, status, duration_ms, error):
+    state = db.session.get(ScheduledJob, name)
+    state.last_finished_at = utcnow()
+    state.last_duration_ms = duration_ms
+    state.last_status = status
+    state.runs += 1
+    if status == "ok":
+        state.last_success_at = state.last_finished_at
+        state.last_error = None
+    else:
+        state.failures += 1
+        state.last_error = error[:255]
+    db.session.commit()
+
+
+def run_job(job, slot, logger):
+    """
+    Run one slot of `job` if this process wins it. Returns the run status,
+    or None if another process holds the job or already ran the slot.
+    """
+    with db.engine.connect() as lock_conn:
+        key = {"namespace": ADVISORY_LOCK_NAMESPACE, "name": job.name}
+        locked = lock_conn.execute(
+            text("SELECT pg_try_advisory_lock(:namespace, hashtext(:name))"), key
+        ).scalar()
+        lock_conn.commit()
+        if not locked:
+            counters.incr(f"scheduler.{job.name}.skipped")
+            return None
+        try:
+            if not _claim_slot(job.name, slot):
+                counters.incr(f"scheduler.{job.name}.skipped")
+                return None
+
+            status, error = "ok", None
+            started = time.perf_counter()
+            _job_deadline.at = time.monotonic() + job.timeout
+            try:
+                job.func()
+            except Exception as e:
+                db.session.rollback()
+                timed_out = isinstance(e, JobTimeout) or (
+                    isinstance(e, DBAPIError)
+                    and getattr(e.orig, "pgcode", None) == QUERY_CANCELED
+                )
+                status = "timeout" if timed_out else "failed"
+                error = f"{type(e).__name__}: {e}"
+                logger.exception("Scheduled job %s %s", job.name, status)
+            finally:
+                _job_deadline.at = None
+            duration_ms = (time.perf_counter() - started) * 1000
+
+            _record_run(job.name, status, duration_ms, error)
+            counters.incr(f"scheduler.{job.name}.{status}")
+            counters.set(f"scheduler.{job.name}.last_duration_ms", round(duration_ms))
+            if status == "ok":
+                counters.set(f"scheduler.{job.name}.last_success", time.time())
+            return status
+        finally:
+            lock_conn.execute(
+                text("SELECT pg_advisory_unlock(:namespace, hashtext(:name))"), key
+            )
+            lock_conn.commit()
+            db.session.remove()
+
+
+class Scheduler:
+    """
+    Polls the job list from a daemon thread and starts each due slot in its
+    own thread. A job still running in this process skips new slots.
+    """
+
+    def __init__(self, app, jobs, poll_interval=1.0):
+        self.app = app
+        self.jobs = {job.name: job for job in jobs}
+        self.poll_interval = poll_interval
+        self._plan = {}
+        self._running = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def _next(self, job, after):
+        slot = job.schedule.next_after(after)
+        return slot, slot + timedelta(seconds=random.uniform(0, job.jitter))
+
+    def start(self):
+        """
+        Start the scheduler thread (again, if called in a forked child).
+        """
+        if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        now = utcnow()
+        self._plan = {name: self._next(job, now) for name, job in self.jobs.items()}
+        self._running = set()
+        self._stop.clear()
+        self._pid = os.getpid()
+        self._thread = threading.Thread(
+            target=self._loop, name="scheduler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.wait(self.poll_interval):
+            now = utcnow()
+            for name, job in self.jobs.items():
+                slot, fire_at = self._plan[name]
+                if now < fire_at:
+                    continue
+                # Missed slots are not replayed: plan from now, not from slot.
+                self._plan[name] = self._next(job, max(slot, now))
+                self._launch(job, slot)
+
+    def _launch(self, job, slot):
+        with self._lock:
+            if job.name in self._running:
+                counters.incr(f"scheduler.{job.name}.overlap_skipped")
+                return
+            self._running.add(job.name)
+        threading.Thread(
+            target=self._run, args=(job, slot), name=f"job-{job.name}", daemon=True
+        ).start()
+
+    def _run(self, job, slot):
+        try:
+            with self.app.app_context():
+                run_job(job, slot, self.app.logger)
+        except Exception:
+            self.app.logger.exception("Scheduler could not run %s", job.name)
+        finally:
+            with self._lock:
+                self._running.discard(job.name)
+
+    def status(self):
+        """
+        Shared run history from scheduled_jobs, plus this worker's plan.
+        """
+        states = {
+            state.name: state
+            for state in db.session.execute(db.select(ScheduledJob)).scalars()
+        }
+        jobs = []
+        for name, job in self.jobs.items():
+            state = states.get(name)
+            planned = self._plan.get(name)
+            jobs.append(
+                {
+                    "name": name,
+                    "schedule": str(job.schedule),
+                    "timeout_s": job.timeout,
+                    "next_slot": planned[0].isoformat() if planned else None,
+                    "running_here": name in self._running,
+                    "last_started_at": _iso(state, "last_started_at"),
+                    "last_success_at": _iso(state, "last_success_at"),
+                    "last_duration_ms": state and state.last_duration_ms,
+                    "last_status": state and state.last_status,
+                    "last_error": state and state.last_error,
+                    "runs": state.runs if state else 0,
+                    "failures": state.failures if state else 0,
+                }
+            )
+        return {"enabled": self._thread is not None, "jobs": jobs}
+
+
+def _iso(state, field):
+    value = getattr(state, field) if state else None
+    return value.isoformat() if value else None
+
+
+def init_scheduler(app, jobs):
+    """
+    Build the scheduler and store it on the app. It is started here unless
+    SCHEDULER_AUTOSTART is off, which gunicorn.conf.py does under --preload
+    so that the thread is started in each worker after the fork instead.
+    """
+    scheduler = Scheduler(app, jobs, app.config["SCHEDULER_POLL_INTERVAL"])
+    app.extensions["scheduler"] = scheduler
+    if app.config["SCHEDULER_ENABLED"] and app.config["SCHEDULER_AUTOSTART"]:
+        scheduler.start()
+    return scheduler
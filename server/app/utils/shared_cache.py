@@ -0,0 +1,322 @@
+"""
+Key-value cache shared by all worker processes on a host.
+
+Backends expose the subset of the Redis client API the app uses (get, set
+with ex/nx, delete, incr, expire, ttl, dbsize), so a Redis server can be
+swapped in through SHARED_CACHE_URL without touching callers:
+
+    memory://                      per-process dict (development)
+    sqlite:////var/cache/app.db    SQLite file in WAL mode, memory-mapped
+                                   reads, shared by every worker on the host
+    redis://host:6379/0            Redis (needs the `redis` package)
+
+Values are bytes, as with Redis; str and int values are encoded on write.
+"""
+
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from itertools import count
+
+from flask import current_app
+
+
+def _encode(value):
+    if isinstance(value, bytes):
+        return value
+    return str(value).encode()
+
+
+class MemoryCache:
+    """
+    Process-local cache with the same interface, bounded to `max_entries`
+    (least recently written are evicted first).
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+
+    def _live(self, key, now):
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= now:
+            del self._entries[key]
+            return None
+        return entry
+
+    def get(self, key):
+        with self._lock:
+            entry = self._live(key, time.time())
+            return entry[0] if entry else None
+
+    def set(self, key, value, ex=None, nx=False):
+        now = time.time()
+        with self._lock:
+            if nx and self._live(key, now):
+                return None
+            self._entries.pop(key, None)
+            while len(self._entries) >= self.max_entries:
+                self._entries.popitem(last=False)
+            self._entries[key] = (_encode(value), now + ex if ex else None)
+            return True
+
+    def delete(self, *keys):
+        with self._lock:
+            return sum(self._entries.pop(key, None) is not None for key in keys)
+
+    def incr(self, key, amount=1):
+        with self._lock:
+            entry = self._live(key, time.time())
+            value = int(entry[0]) + amount if entry else amount
+            self._entries[key] = (_encode(value), entry[1] if entry else None)
+            return value
+
+    def expire(self, key, seconds):
+        with self._lock:
+            entry = self._live(key, time.time())
+            if entry is None:
+                return False
+            self._entries[key] = (entry[0], time.time() + seconds)
+            return True
+
+    def ttl(self, key):
+        with self._lock:
+            entry = self._live(key, time.time())
+            if entry is None:
+                return -2
+            return -1 if entry[1] is None else int(entry[1] - time.time())
+
+    def dbsize(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class SQLiteCache:
+    """
+    Cache in a SQLite database file shared by all processes on the host.
+
+    WAL mode lets readers proceed while one writer commits, every mutation
+    is a single statement or an IMMEDIATE transaction (so updates such as
+    incr are atomic across workers), and reads go through a memory-mapped
+    view of the file. Expired rows are purged, and the table trimmed back to
+    `max_entries` least recently written first, every `sweep_every` writes.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS entries (
+            key TEXT PRIMARY KEY,
+            value BLOB NOT NULL,
+            expires_at REAL,
+            written_at REAL NOT NULL
+        )
+    """
+
+    def __init__(
+        self, path, max_entries=10000, mmap_size=64 * 1024 * 1024, sweep_every=100
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.mmap_size = mmap_size
+        self.sweep_every = sweep_every
+        self._local = threading.local()
+        # next() on a count is atomic, so request threads never share a
+        # write number and only one of them sweeps at each multiple.
+        self._writes = count(1)
+        with self._connection() as conn:
+            conn.execute(self.SCHEMA)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_entries_written_at "
+                "ON entries (written_at)"
+            )
+
+    def _connection(self):
+        # One connection per thread, reopened after fork.
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _wrote(self, conn):
+        if next(self._writes) % self.sweep_every == 0:
+            self.sweep(conn)
+
+    def sweep(self, conn=None):
+        """
+        Drop expired entries, then the oldest writes beyond `max_entries`.
+        """
+        conn = conn or self._connection()
+        conn.execute(
+            "DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at <= ?",
+            (time.time(),),
+        )
+        conn.execute(
+            """
+            DELETE FROM entries WHERE key IN (
+                SELECT key FROM entries ORDER BY written_at DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_entries,),
+        )
+
+    def get(self, key):
+        row = (
+            self._connection()
+            .execute(
+                "SELECT value FROM entries WHERE key = ? "
+                "AND (expires_at IS NULL OR expires_at > ?)",
+                (key, time.time()),
+            )
+            .fetchone()
+        )
+        return row[0] if row else None
+
+    def set(self, key, value, ex=None, nx=False):
+        now = time.time()
+        expires_at = now + ex if ex else None
+        conn = self._connection()
+        if nx:
+            cursor = conn.execute(
+                """
+                INSERT INTO entries (key, value, expires_at, written_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET
+                    value = excluded.value,
+                    expires_at = excluded.expires_at,
+                    written_at = excluded.written_at
+                WHERE entries.expires_at IS NOT NULL AND entries.expires_at <= ?
+                """,
+                (key, _encode(value), expires_at, now, now),
+            )
+            if not cursor.rowcount:
+                return None
+        else:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, expires_at, written_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, _encode(value), expires_at, now),
+            )
+        self._wrote(conn)
+        return True
+
+    def delete(self, *keys):
+        if not keys:
+            return 0
+        placeholders = ", ".join("?" for _ in keys)
+        return (
+            self._connection()
+            .execute(f"DELETE FROM entries WHERE key IN ({placeholders})", keys)
+            .rowcount
+        )
+
+    def incr(self, key, amount=1):
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT value, expires_at FROM entries WHERE key = ? "
+                "AND (expires_at IS NULL OR expires_at > ?)",
+                (key, now),
+            ).fetchone()
+            value = int(row[0]) + amount if row else amount
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, expires_at, written_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, _encode(value), row[1] if row else None, now),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._wrote(conn)
+        return value
+
+    def expire(self, key, seconds):
+        now = time.time()
+        cursor = self._connection().execute(
+            "UPDATE entries SET expires_at = ? WHERE key = ? "
+            "AND (expires_at IS NULL OR expires_at > ?)",
+            (now + seconds, key, now),
+        )
+        return cursor.rowcount > 0
+
+    def ttl(self, key):
+        row = (
+            self._connection()
+            .execute(
+                "SELECT expires_at FROM entries WHERE key = ? "
+                "AND (expires_at IS NULL OR expires_at > ?)",
+                (key, time.time()),
+            )
+            .fetchone()
+        )
+        if row is None:
+            return -2
+        return -1 if row[0] is None else int(row[0] - time.time())
+
+    def dbsize(self):
+        return (
+            self._connection()
+            .execute(
+                "SELECT count(*) FROM entries "
+                "WHERE expires_at IS NULL OR expires_at > ?",
+                (time.time(),),
+            )
+            .fetchone()[0]
+        )
+
+
+def create_cache(url, max_entries=10000):
+    """
+    Build a cache backend from a URL (see the module docstring).
+    """
+    scheme, _, rest = url.partition("://")
+    if scheme == "memory":
+        return MemoryCache(max_entries)
+    if scheme == "sqlite":
+        path = rest[1:] if rest.startswith("/") else rest
+        return SQLiteCache(
+            path or os.path.join(tempfile.gettempdir(), "analytics-cache.sqlite3"),
+            max_entries,
+        )
+    if scheme in ("redis", "rediss", "unix"):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError(
+                "SHARED_CACHE_URL points at Redis but the redis package is not "
+                "installed."
+            ) from e
+        return redis.Redis.from_url(url)
+    raise ValueError(f"Unsupported SHARED_CACHE_URL scheme: {scheme!r}")
+
+
+def get_shared_cache():
+    return current_app.extensions["shared_cache"]
+
+
+def cache_get_json(key):
+    value = get_shared_cache().get(key)
+    return json.loads(value) if value is not None else None
+
+
+def cache_set_json(key, value, ex=None):
+    get_shared_cache().set(key, json.dumps(value, separators=(",", ":")), ex=ex)
+
+
+def init_shared_cache(app):
+    cache = create_cache(
+        app.config["SHARED_CACHE_URL"], app.config["SHARED_CACHE_MAX_ENTRIES"]
+    )
+    app.extensions["shared_cache"] = cache
+    return cache
@@ -0,0 +1,161 @@
+"""
+Request coalescing (single-flight) for identical computations.
+
+When many requests ask for the same result at once, one caller (the leader)
+computes it and the others wait for and share that result. `SingleFlight`
+coalesces threads within a worker; `FileSingleFlight` additionally holds an
+flock on a lock file, so only one gunicorn worker recomputes and the rest
+read the result it wrote next to the lock. Keys are hashed onto a fixed set
+of lock files, so the directory does not grow with the number of keys.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.completed = False
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key inside one process.
+    """
+
+    def __init__(self, wait=30):
+        self.wait = wait
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """
+        Run `fn()` unless a call for `key` is already in flight, in which case
+        wait for it. Returns (result, shared); exceptions raised by the leader
+        are re-raised in every waiter. A waiter that gives up after `wait`
+        seconds, or whose leader was interrupted (SystemExit, greenlet exit),
+        runs `fn()` itself.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            if call.done.wait(self.wait):
+                if call.error is not None:
+                    raise call.error
+                if call.completed:
+                    return call.result, True
+            return fn(), False
+
+        try:
+            call.result = fn()
+            call.completed = True
+            return call.result, False
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+
+class FileSingleFlight(SingleFlight):
+    """
+    Coalesce calls across processes on one host. Threads are coalesced
+    in-process first, so each worker sends at most one caller to the lock
+    file. The leader writes its JSON result with its key beside the lock; a
+    worker that acquires the lock after it finds a result for its key
+    written since it started waiting and uses that instead of recomputing.
+
+    Keys share `stripes` lock files. Two keys on one stripe wait for each
+    other, which is rare enough with the default to cost little.
+    """
+
+    def __init__(self, directory, wait=30, stripes=1024):
+        super().__init__(wait)
+        self.directory = directory
+        self.stripes = stripes
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, key):
+        digest = hashlib.sha1(key.encode()).digest()
+        stripe = int.from_bytes(digest[:8], "little") % self.stripes
+        base = os.path.join(self.directory, f"stripe-{stripe}")
+        return base + ".lock", base + ".json"
+
+    def _acquire(self, fd, deadline):
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    return False
+                time.sleep(0.01)
+
+    def _read_since(self, path, key, since):
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("key") != key or entry["written_at"] < since:
+            return None
+        return entry
+
+    def _write(self, path, key, result):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"key": key, "written_at": time.time(), "result": result}, f)
+        os.replace(tmp, path)
+
+    def _do_locked(self, key, fn):
+        started = time.time()
+        lock_path, result_path = self._paths(key)
+        fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if not self._acquire(fd, time.monotonic() + self.wait):
+                return fn(), False
+            entry = self._read_since(result_path, key, started)
+            if entry is not None:
+                return entry["result"], True
+            result = fn()
+            self._write(result_path, key, result)
+            return result, False
+        finally:
+            os.close(fd)
+
+    def do(self, key, fn):
+        (result, shared_across), shared = super().do(
+            key, lambda: self._do_locked(key, fn)
+        )
+        return result, shared or shared_across
+
+
+def init_single_flight(app):
+    """
+    Build the single-flight group used for dashboard computations from
+    SINGLE_FLIGHT_MODE ("process" or "host") and store it on the app.
+    """
+    wait = app.config["SINGLE_FLIGHT_WAIT"]
+    if app.config["SINGLE_FLIGHT_MODE"] == "host":
+        directory = app.config["SINGLE_FLIGHT_DIR"] or os.path.join(
+            tempfile.gettempdir(), "analytics-single-flight"
+        )
+        flights = FileSingleFlight(directory, wait)
+    else:
+        flights = SingleFlight(wait)
+    app.extensions["single_flight"] = flights
+    return flights
@@ -0,0 +1,93 @@
+"""
+Startup helpers: phase timing, database readiness probing and fork safety.
+"""
+
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.models import db
+
+
+class StartupTimer:
+    """
+    Record how long each phase of application startup takes.
+    The breakdown is stored on the app so it can be logged or reported later.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = []
+
+    def record(self, name, seconds):
+        self.phases.append((name, seconds))
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    @property
+    def total(self):
+        return time.perf_counter() - self.started
+
+    def report(self):
+        """
+        Return the timings as a list of dicts, slowest phase first.
+        """
+        return [
+            {"phase": name, "ms": round(seconds * 1000, 2)}
+            for name, seconds in sorted(self.phases, key=lambda p: p[1], reverse=True)
+        ]
+
+    def format(self):
+        lines = [f"Startup finished in {self.total * 1000:.1f} ms"]
+        for entry in self.report():
+            lines.append(f"  {entry['phase']:<24} {entry['ms']:>9.2f} ms")
+        return "\n".join(lines)
+
+
+def probe_database(app, retries=0, delay=1.0):
+    """
+    Check that the database accepts connections, retrying with backoff.
+    Returns True when the database answered, False otherwise. Never exits
+    the process: a database that is still starting up only makes the app
+    "not ready" until a later probe succeeds.
+    """
+    attempt = 0
+    while True:
+        try:
+            with app.app_context():
+                with db.engine.connect() as connection:
+                    connection.execute(text("SELECT 1"))
+            return True
+        except OperationalError as e:
+            if attempt >= retries:
+                app.logger.warning("Database is not reachable: %s", e)
+                return False
+            attempt += 1
+            app.logger.info(
+                "Database not reachable yet (attempt %d/%d), retrying in %.1fs",
+                attempt,
+                retries,
+                delay,
+            )
+            time.sleep(delay)
+            delay = min(delay * 2, 30)
+
+
+def dispose_engine_pools(app, close=True):
+    """
+    Drop every pooled connection held by the app's engines.
+    Call with close=True in the parent before forking, and with close=False
+    in a freshly forked child so it never reuses (or closes) sockets that
+    belong to the parent.
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=close)
@@ -1,6 +1,13 @@
+import re
+from datetime import datetime, timedelta
 from typing import TypedDict
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
-from marshmallow import Schema, fields
+from marshmallow import Schema, ValidationError, fields, validate
+
+from app.models.metric import INDEXED_PROPERTY_KEYS
+
+PROPERTY_KEY_PATTERN = re.compile(r"^[A-Za-z0-9_]{1,50}$")
 
 
 class SignupSchema(Schema):
@@ -24,6 +31,127 @@ class GoogleLoginSchema(Schema):
     id_token = fields.String(required=True)
 
 
+class ActiveUsersQuerySchema(Schema):
+    """Schema for active-user count query parameters."""
+
+    date = fields.Date(load_default=None)
+
+
+class RetentionQuerySchema(Schema):
+    """Schema for N-day retention query parameters."""
+
+    date = fields.Date(required=True)
+    days = fields.Integer(load_default=7, validate=validate.Range(min=1, max=90))
+
+
+class CohortsQuerySchema(Schema):
+    """Schema for cohort retention query parameters."""
+
+    weeks = fields.Integer(load_default=12, validate=validate.Range(min=1, max=52))
+
+
+class TopPropertiesQuerySchema(Schema):
+    """Schema for top property values query parameters."""
+
+    key = fields.String(required=True, validate=validate.OneOf(INDEXED_PROPERTY_KEYS))
+    limit = fields.Integer(load_default=20, validate=validate.Range(min=1, max=100))
+    days = fields.Integer(load_default=30, validate=validate.Range(min=1, max=365))
+
+
+class ValueDistributionQuerySchema(Schema):
+    """Schema for value distribution query parameters."""
+
+    event_type = fields.String(required=True, validate=validate.Length(min=1, max=50))
+    device = fields.String(load_default=None, validate=validate.Length(max=50))
+    location = fields.String(load_default=None, validate=validate.Length(max=50))
+    start = fields.DateTime(load_default=None)
+    end = fields.DateTime(load_default=None)
+    bins = fields.Integer(load_default=20, validate=validate.Range(min=1, max=100))
+
+
+class MetricsQuerySchema(Schema):
+    """Schema for raw event listing query parameters."""
+
+    event_type = fields.String(load_default=None, validate=validate.Length(max=50))
+    device = fields.String(load_default=None, validate=validate.Length(max=50))
+    location = fields.String(load_default=None, validate=validate.Length(max=50))
+    user_id = fields.Integer(load_default=None)
+    start = fields.DateTime(load_default=None)
+    end = fields.DateTime(load_default=None)
+    limit = fields.Integer(load_default=100, validate=validate.Range(min=1, max=500))
+    cursor = fields.String(load_default=None)
+
+
+class MetricEventSchema(Schema):
+    """Schema for one ingested event."""
+
+    event_type = fields.String(required=True, validate=validate.Length(min=1, max=50))
+    timestamp = fields.DateTime(load_default=None)
+    user_id = fields.Integer(load_default=None)
+    device = fields.String(load_default=None, validate=validate.Length(max=50))
+    location = fields.String(load_default=None, validate=validate.Length(max=50))
+    value = fields.Float(load_default=1.0)
+    properties = fields.Dict(
+        keys=fields.String(validate=validate.Regexp(PROPERTY_KEY_PATTERN)),
+        load_default=None,
+    )
+    idempotency_key = fields.String(
+        load_default=None, validate=validate.Length(min=1, max=64)
+    )
+    # Not stored; used to fill in device and location when those are omitted.
+    user_agent = fields.String(load_default=None, validate=validate.Length(max=1024))
+    ip = fields.String(load_default=None, validate=validate.Length(max=45))
+
+
+class IngestSchema(Schema):
+    """Schema for a batch of ingested events."""
+
+    events = fields.List(
+        fields.Nested(MetricEventSchema),
+        required=True,
+        validate=validate.Length(min=1, max=1000),
+    )
+
+
+def parse_property_filters(args):
+    """
+    Parse repeated `filter=key:value` query parameters into a dict of event
+    properties, matched with JSONB containment so the GIN index is used.
+    Raises ValidationError on malformed filters.
+    """
+    properties = {}
+    for item in args.getlist("filter"):
+        key, sep, value = item.partition(":")
+        if not sep or not PROPERTY_KEY_PATTERN.match(key) or not value:
+            raise ValidationError(
+                {"filter": [f"Invalid filter '{item}', expected key:value."]}
+            )
+        properties[key] = value
+    return properties
+
+
+
+def parse_time_zone(args):
+    """
+    Parse the `tz` query parameter (an IANA name such as Europe/Berlin) into
+    a ZoneInfo, or None when it is absent. Raises ValidationError for unknown
+    zones and for offsets that are not whole quarter hours, which the
+    quarter-hour aggregates cannot split at.
+    """
+    name = args.get("tz")
+    if not name:
+        return None
+    try:
+        zone = ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValidationError({"tz": [f"Unknown time zone '{name}'."]})
+    if datetime.now(zone).utcoffset() % timedelta(minutes=15):
+        raise ValidationError(
+            {"tz": [f"Time zone '{name}' is not a whole quarter hour from UTC."]}
+        )
+    return zone
+
+
 class SignupData(TypedDict):
     """TypedDict for validated signup data."""
 
@@ -0,0 +1,45 @@
+"""
+Gunicorn configuration for production.
+
+With GUNICORN_PRELOAD enabled (the default) the application is imported once
+in the master process and workers are forked from it, which shares the
+imported code between workers and makes restarts fast. Engine pools are
+disposed in post_fork so a worker never reuses a connection opened by the
+master. For the same reason the maintenance scheduler thread is not started
+in the master (threads do not survive fork) but in each worker.
+
+Two worker modes are supported: sync (one request per worker process) and
+gthread (GUNICORN_THREADS request threads per process). Compare them with
+`poetry run load-test`.
+"""
+
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("GUNICORN_WORKERS", "4"))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "sync")
+# Request threads per worker. More than one runs the gthread worker (Gunicorn
+# switches a sync worker to gthread), which keeps serving while a thread
+# waits on the database; the app's DB pool is sized from this setting.
+threads = int(os.getenv("GUNICORN_THREADS", "1"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "2"))
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+wsgi_app = "run:app"
+
+if preload_app:
+    os.environ.setdefault("SCHEDULER_AUTOSTART", "false")
+
+
+def post_fork(server, worker):
+    if not server.cfg.preload_app:
+        return
+    # The app module is already imported in the master, so this is a
+    # sys.modules lookup rather than a second import.
+    from run import app
+
+    from app.utils.startup import dispose_engine_pools
+
+    dispose_engine_pools(app, close=False)
+    if app.config["SCHEDULER_ENABLED"]:
+        app.extensions["scheduler"].start()
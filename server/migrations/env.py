@@ -6,9 +6,25 @@ from dotenv import load_dotenv
 from sqlalchemy import engine_from_config, pool
 
 from app.models import Base
+from app.models.aggregation_watermark import AggregationWatermark
+from app.models.cohort_retention import (
+    CohortRetention,
+    RegistrationCohort,
+    UserActivityWeek,
+    UserRegistration,
+)
+from app.models.daily_active_users import DailyActiveUsers
 from app.models.dashboard_summary import DashboardSummary
+from app.models.dimension import Device, EventType, Location
 from app.models.metric import Metric
+from app.models.metric_quarter_hour import MetricQuarterHour
+from app.models.metric_rollup import MetricRollup
+from app.models.property_top_k import PropertyTopK
+from app.models.scheduled_job import ScheduledJob
+from app.models.site import Site, SiteMember
 from app.models.user import User
+from app.models.value_sketch import ValueSketch
+from app.utils.online_migrations import dry_run_execute, is_dry_run
 
 # Load environment variables
 load_dotenv()
@@ -86,6 +102,16 @@ def run_migrations_online() -> None:
     with connectable.connect() as connection:
         context.configure(connection=connection, target_metadata=target_metadata)
 
+        if is_dry_run():
+            # Run everything in one transaction and roll it back; the helpers
+            # in app.utils.online_migrations only log estimates in this mode,
+            # and op.execute() only EXPLAINs.
+            context.get_context().impl.execute = dry_run_execute
+            with connection.begin() as transaction:
+                context.run_migrations()
+                transaction.rollback()
+            return
+
         with context.begin_transaction():
             context.run_migrations()
 
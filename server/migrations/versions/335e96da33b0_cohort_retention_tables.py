@@ -0,0 +1,52 @@
+"""cohort retention tables
+
+Revision ID: 335e96da33b0
+Revises: 4a210b588be3
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '335e96da33b0'
+down_revision: Union[str, Sequence[str], None] = '4a210b588be3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'registration_cohorts',
+        sa.Column('cohort_week', sa.Date(), nullable=False),
+        sa.Column('users', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('cohort_week'),
+    )
+    op.create_table(
+        'cohort_retention',
+        sa.Column('cohort_week', sa.Date(), nullable=False),
+        sa.Column('activity_week', sa.Date(), nullable=False),
+        sa.Column('users', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('cohort_week', 'activity_week'),
+    )
+    op.create_table(
+        'user_activity_weeks',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('week', sa.Date(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ['user_id'],
+            ['users.id'],
+        ),
+        sa.PrimaryKeyConstraint('user_id', 'week'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('user_activity_weeks')
+    op.drop_table('cohort_retention')
+    op.drop_table('registration_cohorts')
@@ -0,0 +1,44 @@
+"""daily active user bitmaps
+
+Revision ID: 4a210b588be3
+Revises: ae8bf8e6b2ce
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '4a210b588be3'
+down_revision: Union[str, Sequence[str], None] = 'ae8bf8e6b2ce'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'aggregation_watermarks',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('last_metric_id', sa.BigInteger(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('name'),
+    )
+    op.create_table(
+        'daily_active_users',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('bitmap', sa.LargeBinary(), nullable=False),
+        sa.Column('cardinality', sa.Integer(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('day'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('daily_active_users')
+    op.drop_table('aggregation_watermarks')
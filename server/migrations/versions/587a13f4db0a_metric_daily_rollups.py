@@ -0,0 +1,37 @@
+"""metric daily rollups
+
+Revision ID: 587a13f4db0a
+Revises: dfa8a8830567
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '587a13f4db0a'
+down_revision: Union[str, Sequence[str], None] = 'dfa8a8830567'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'metric_daily_rollups',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('event_type', sa.String(length=50), nullable=False),
+        sa.Column('device', sa.String(length=50), nullable=False),
+        sa.Column('location', sa.String(length=50), nullable=False),
+        sa.Column('events', sa.BigInteger(), nullable=False),
+        sa.Column('value_sum', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('day', 'event_type', 'device', 'location'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('metric_daily_rollups')
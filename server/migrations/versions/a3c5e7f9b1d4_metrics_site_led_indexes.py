@@ -0,0 +1,67 @@
+"""metrics site-led indexes
+
+Re-leads the property expression indexes with site_id and drops the
+single-column device_id and location_id indexes, which no query reads: a
+site's charts by device or location go through
+ix_metrics_site_id_event_type_id_timestamp.
+
+The remaining global indexes stay global on purpose: timestamp serves the
+cross-site cohort rebuild, user_id the foreign key from users, and the GIN
+index on properties cannot hold a btree column; the planner ANDs it with a
+site-led index.
+
+Revision ID: a3c5e7f9b1d4
+Revises: e7f9a1b3c5d7
+Create Date: 2026-10-20 12:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from app.utils.online_migrations import (
+    create_index_concurrently,
+    drop_index_concurrently,
+    log_relation_sizes,
+)
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c5e7f9b1d4'
+down_revision: Union[str, Sequence[str], None] = 'e7f9a1b3c5d7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXED_PROPERTY_KEYS = ('path', 'referrer', 'campaign')
+DIMENSION_INDEXES = [
+    ('ix_metrics_device_id', ['device_id']),
+    ('ix_metrics_location_id', ['location_id']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    log_relation_sizes('metrics', 'before')
+    for key in INDEXED_PROPERTY_KEYS:
+        create_index_concurrently(
+            f'ix_metrics_site_id_property_{key}',
+            'metrics',
+            [sa.text('site_id'), sa.text(f"(properties ->> '{key}')")],
+        )
+        drop_index_concurrently(f'ix_metrics_property_{key}', 'metrics')
+    for index, _ in DIMENSION_INDEXES:
+        drop_index_concurrently(index, 'metrics')
+    log_relation_sizes('metrics', 'after')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for index, columns in DIMENSION_INDEXES:
+        create_index_concurrently(index, 'metrics', columns)
+    for key in INDEXED_PROPERTY_KEYS:
+        create_index_concurrently(
+            f'ix_metrics_property_{key}',
+            'metrics',
+            [sa.text(f"(properties ->> '{key}')")],
+        )
+        drop_index_concurrently(f'ix_metrics_site_id_property_{key}', 'metrics')
@@ -0,0 +1,37 @@
+"""value sketches
+
+Revision ID: a8d0f2b4c6e7
+Revises: f6b8d0a2c4e5
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8d0f2b4c6e7'
+down_revision: Union[str, Sequence[str], None] = 'f6b8d0a2c4e5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'value_sketches',
+        sa.Column('hour', sa.DateTime(), nullable=False),
+        sa.Column('event_type_id', sa.SmallInteger(), nullable=False),
+        sa.Column('device_id', sa.SmallInteger(), nullable=False),
+        sa.Column('location_id', sa.SmallInteger(), nullable=False),
+        sa.Column('count', sa.BigInteger(), nullable=False),
+        sa.Column('sketch', sa.LargeBinary(), nullable=False),
+        sa.PrimaryKeyConstraint('hour', 'event_type_id', 'device_id', 'location_id'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('value_sketches')
@@ -0,0 +1,40 @@
+"""user registrations
+
+Cohort sizes count each user once per site. Existing sizes counted every
+registration event; run `poetry run rebuild-cohorts` after upgrading to
+recount the weeks still covered by raw metrics and fill this table.
+
+Revision ID: b5d7f9a1c3e6
+Revises: a3c5e7f9b1d4
+Create Date: 2026-10-20 14:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5d7f9a1c3e6'
+down_revision: Union[str, Sequence[str], None] = 'a3c5e7f9b1d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'user_registrations',
+        sa.Column('site_id', sa.SmallInteger(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('cohort_week', sa.Date(), nullable=False),
+        sa.ForeignKeyConstraint(['site_id'], ['sites.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('site_id', 'user_id'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('user_registrations')
@@ -0,0 +1,41 @@
+"""scheduled jobs
+
+Revision ID: b7c41e9d2f60
+Revises: 587a13f4db0a
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7c41e9d2f60'
+down_revision: Union[str, Sequence[str], None] = '587a13f4db0a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'scheduled_jobs',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('last_slot_at', sa.DateTime(), nullable=True),
+        sa.Column('last_started_at', sa.DateTime(), nullable=True),
+        sa.Column('last_finished_at', sa.DateTime(), nullable=True),
+        sa.Column('last_success_at', sa.DateTime(), nullable=True),
+        sa.Column('last_duration_ms', sa.Float(), nullable=True),
+        sa.Column('last_status', sa.String(length=20), nullable=True),
+        sa.Column('last_error', sa.String(length=255), nullable=True),
+        sa.Column('runs', sa.Integer(), nullable=False),
+        sa.Column('failures', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('name'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('scheduled_jobs')
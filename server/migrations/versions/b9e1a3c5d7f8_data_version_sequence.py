@@ -0,0 +1,28 @@
+"""data version sequence
+
+Revision ID: b9e1a3c5d7f8
+Revises: a8d0f2b4c6e7
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'b9e1a3c5d7f8'
+down_revision: Union[str, Sequence[str], None] = 'a8d0f2b4c6e7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Bumped after writes that change dashboard data (app.utils.data_version).
+    op.execute('CREATE SEQUENCE data_version')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute('DROP SEQUENCE data_version')
@@ -0,0 +1,42 @@
+"""metric quarter hours
+
+Revision ID: c1d3e5f7a9b2
+Revises: b9e1a3c5d7f8
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'c1d3e5f7a9b2'
+down_revision: Union[str, Sequence[str], None] = 'b9e1a3c5d7f8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'metric_quarter_hours',
+        sa.Column('bucket', sa.DateTime(), nullable=False),
+        sa.Column('event_type_id', sa.SmallInteger(), nullable=False),
+        sa.Column('device_id', sa.SmallInteger(), nullable=False),
+        sa.Column('location_id', sa.SmallInteger(), nullable=False),
+        sa.Column('events', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint(
+            'bucket', 'event_type_id', 'device_id', 'location_id'
+        ),
+    )
+    # Bumped when events older than a day are folded into the buckets, which
+    # invalidates cached closed periods (app.analytics.local_time).
+    op.execute('CREATE SEQUENCE closed_period_revision')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute('DROP SEQUENCE closed_period_revision')
+    op.drop_table('metric_quarter_hours')
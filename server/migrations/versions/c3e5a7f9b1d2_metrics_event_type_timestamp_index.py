@@ -0,0 +1,32 @@
+"""metrics event_type timestamp index
+
+Revision ID: c3e5a7f9b1d2
+Revises: b7c41e9d2f60
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from app.utils.online_migrations import (
+    create_index_concurrently,
+    drop_index_concurrently,
+)
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e5a7f9b1d2'
+down_revision: Union[str, Sequence[str], None] = 'b7c41e9d2f60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    create_index_concurrently(
+        'ix_metrics_event_type_timestamp', 'metrics', ['event_type', 'timestamp']
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    drop_index_concurrently('ix_metrics_event_type_timestamp', 'metrics')
@@ -0,0 +1,186 @@
+"""sites
+
+Revision ID: d2e4f6a8b0c1
+Revises: c1d3e5f7a9b2
+Create Date: 2026-10-19 23:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+from app.utils.online_migrations import (
+    add_column,
+    add_foreign_key,
+    backfill_in_batches,
+    create_index_concurrently,
+    drop_index_concurrently,
+    log_relation_sizes,
+    set_lock_timeout,
+    set_not_null,
+)
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2e4f6a8b0c1'
+down_revision: Union[str, Sequence[str], None] = 'c1d3e5f7a9b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+DEFAULT_SITE_ID = 1
+
+# Aggregate tables and their primary key columns after site_id. They hold a
+# row per day or bucket and dimension, not per event, so they are altered in
+# place: the column gets a default (catalog only) for the existing rows.
+AGGREGATE_TABLES = [
+    ('metric_daily_rollups', ['day', 'event_type', 'device', 'location']),
+    ('value_sketches', ['hour', 'event_type_id', 'device_id', 'location_id']),
+    ('metric_quarter_hours', ['bucket', 'event_type_id', 'device_id', 'location_id']),
+    ('daily_active_users', ['day']),
+    ('property_top_k', ['day', 'key']),
+    ('registration_cohorts', ['cohort_week']),
+    ('cohort_retention', ['cohort_week', 'activity_week']),
+    ('user_activity_weeks', ['user_id', 'week']),
+]
+
+# (new index, columns, old index, columns): the metrics indexes, leading
+# with site_id so one site's range scans skip the other sites' rows.
+METRICS_INDEXES = [
+    (
+        'ix_metrics_site_id_event_type_id_timestamp',
+        ['site_id', 'event_type_id', 'timestamp'],
+        'ix_metrics_event_type_id_timestamp',
+        ['event_type_id', 'timestamp'],
+    ),
+    (
+        'ix_metrics_site_id_timestamp_id',
+        ['site_id', 'timestamp', 'id'],
+        'ix_metrics_timestamp_id',
+        ['timestamp', 'id'],
+    ),
+]
+IDEMPOTENCY_WHERE = 'idempotency_key IS NOT NULL'
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'sites',
+        sa.Column('id', sa.SmallInteger(), sa.Identity(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name'),
+    )
+    op.execute("INSERT INTO sites (name, created_at) VALUES ('default', now())")
+    op.create_table(
+        'site_members',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('site_id', sa.SmallInteger(), nullable=False),
+        sa.ForeignKeyConstraint(['site_id'], ['sites.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('user_id', 'site_id'),
+    )
+    op.execute(
+        'INSERT INTO site_members (user_id, site_id) '
+        f'SELECT id, {DEFAULT_SITE_ID} FROM users'
+    )
+
+    for table, key in AGGREGATE_TABLES:
+        op.add_column(
+            table,
+            sa.Column(
+                'site_id',
+                sa.SmallInteger(),
+                nullable=False,
+                server_default=str(DEFAULT_SITE_ID),
+            ),
+        )
+        op.alter_column(table, 'site_id', server_default=None)
+        op.create_foreign_key(
+            f'{table}_site_id_fkey', table, 'sites', ['site_id'], ['id']
+        )
+        op.drop_constraint(f'{table}_pkey', table, type_='primary')
+        op.create_primary_key(f'{table}_pkey', table, ['site_id', *key])
+    op.add_column(
+        'dashboard_summary',
+        sa.Column('site_id', sa.SmallInteger(), nullable=True),
+    )
+    op.execute(
+        f'UPDATE dashboard_summary SET site_id = {DEFAULT_SITE_ID} '
+        'WHERE id = (SELECT min(id) FROM dashboard_summary)'
+    )
+    op.execute('DELETE FROM dashboard_summary WHERE site_id IS NULL')
+    op.alter_column('dashboard_summary', 'site_id', nullable=False)
+    op.create_foreign_key(
+        'dashboard_summary_site_id_fkey',
+        'dashboard_summary',
+        'sites',
+        ['site_id'],
+        ['id'],
+    )
+    op.create_unique_constraint(
+        'dashboard_summary_site_id_key', 'dashboard_summary', ['site_id']
+    )
+
+    log_relation_sizes('metrics', 'before')
+    add_column('metrics', sa.Column('site_id', sa.SmallInteger(), nullable=True))
+    # Rows written by the previous application version while this runs.
+    set_lock_timeout()
+    op.alter_column('metrics', 'site_id', server_default=str(DEFAULT_SITE_ID))
+    backfill_in_batches('metrics', f'site_id = {DEFAULT_SITE_ID}', 'site_id IS NULL')
+    add_foreign_key('metrics_site_id_fkey', 'metrics', 'sites', ['site_id'], ['id'])
+    set_not_null('metrics', 'site_id')
+
+    for index, columns, old_index, _ in METRICS_INDEXES:
+        create_index_concurrently(index, 'metrics', columns)
+        drop_index_concurrently(old_index, 'metrics')
+    create_index_concurrently(
+        'uq_metrics_site_id_idempotency_key_day',
+        'metrics',
+        [
+            sa.text('site_id'),
+            sa.text('idempotency_key'),
+            sa.text("date_trunc('day', timestamp)"),
+        ],
+        unique=True,
+        postgresql_where=sa.text(IDEMPOTENCY_WHERE),
+    )
+    drop_index_concurrently('uq_metrics_idempotency_key_day', 'metrics')
+    log_relation_sizes('metrics', 'after')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Aggregates of other sites would collide on the old keys; they are
+    # rebuilt from metrics by the refresh jobs. Events of other sites are
+    # kept and become indistinguishable from the default site's.
+    op.execute(f'DELETE FROM dashboard_summary WHERE site_id <> {DEFAULT_SITE_ID}')
+    for table, _ in AGGREGATE_TABLES:
+        op.execute(f'DELETE FROM {table} WHERE site_id <> {DEFAULT_SITE_ID}')
+
+    for index, _, old_index, old_columns in METRICS_INDEXES:
+        create_index_concurrently(old_index, 'metrics', old_columns)
+        drop_index_concurrently(index, 'metrics')
+    create_index_concurrently(
+        'uq_metrics_idempotency_key_day',
+        'metrics',
+        [sa.text('idempotency_key'), sa.text("date_trunc('day', timestamp)")],
+        unique=True,
+        postgresql_where=sa.text(IDEMPOTENCY_WHERE),
+    )
+    drop_index_concurrently('uq_metrics_site_id_idempotency_key_day', 'metrics')
+
+    set_lock_timeout()
+    op.drop_column('metrics', 'site_id')
+    op.drop_constraint(
+        'dashboard_summary_site_id_key', 'dashboard_summary', type_='unique'
+    )
+    op.drop_column('dashboard_summary', 'site_id')
+    for table, key in AGGREGATE_TABLES:
+        op.drop_constraint(f'{table}_pkey', table, type_='primary')
+        op.create_primary_key(f'{table}_pkey', table, key)
+        op.drop_column(table, 'site_id')
+    op.drop_table('site_members')
+    op.drop_table('sites')
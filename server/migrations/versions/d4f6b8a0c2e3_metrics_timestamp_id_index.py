@@ -0,0 +1,30 @@
+"""metrics timestamp id index
+
+Revision ID: d4f6b8a0c2e3
+Revises: c3e5a7f9b1d2
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from app.utils.online_migrations import (
+    create_index_concurrently,
+    drop_index_concurrently,
+)
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4f6b8a0c2e3'
+down_revision: Union[str, Sequence[str], None] = 'c3e5a7f9b1d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    create_index_concurrently('ix_metrics_timestamp_id', 'metrics', ['timestamp', 'id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    drop_index_concurrently('ix_metrics_timestamp_id', 'metrics')
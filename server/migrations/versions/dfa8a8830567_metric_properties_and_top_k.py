@@ -0,0 +1,67 @@
+"""metric properties and top-k sketches
+
+Revision ID: dfa8a8830567
+Revises: 335e96da33b0
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+from app.utils.online_migrations import (
+    add_column,
+    create_index_concurrently,
+    drop_index_concurrently,
+    set_lock_timeout,
+)
+
+# revision identifiers, used by Alembic.
+revision: str = 'dfa8a8830567'
+down_revision: Union[str, Sequence[str], None] = '335e96da33b0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXED_PROPERTY_KEYS = ('path', 'referrer', 'campaign')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    add_column(
+        'metrics',
+        sa.Column('properties', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    )
+    create_index_concurrently(
+        'ix_metrics_properties',
+        'metrics',
+        ['properties'],
+        postgresql_using='gin',
+        postgresql_ops={'properties': 'jsonb_path_ops'},
+    )
+    for key in INDEXED_PROPERTY_KEYS:
+        create_index_concurrently(
+            f'ix_metrics_property_{key}',
+            'metrics',
+            [sa.text(f"(properties ->> '{key}')")],
+        )
+    op.create_table(
+        'property_top_k',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('key', sa.String(length=50), nullable=False),
+        sa.Column('sketch', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('total', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('day', 'key'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('property_top_k')
+    for key in INDEXED_PROPERTY_KEYS:
+        drop_index_concurrently(f'ix_metrics_property_{key}', 'metrics')
+    drop_index_concurrently('ix_metrics_properties', 'metrics')
+    set_lock_timeout()
+    op.drop_column('metrics', 'properties')
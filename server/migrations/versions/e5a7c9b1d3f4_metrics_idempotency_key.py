@@ -0,0 +1,46 @@
+"""metrics idempotency key
+
+Revision ID: e5a7c9b1d3f4
+Revises: d4f6b8a0c2e3
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+from app.utils.online_migrations import (
+    add_column,
+    create_index_concurrently,
+    drop_index_concurrently,
+    set_lock_timeout,
+)
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a7c9b1d3f4'
+down_revision: Union[str, Sequence[str], None] = 'd4f6b8a0c2e3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    add_column(
+        'metrics', sa.Column('idempotency_key', sa.String(length=64), nullable=True)
+    )
+    create_index_concurrently(
+        'uq_metrics_idempotency_key_day',
+        'metrics',
+        [sa.text('idempotency_key'), sa.text("date_trunc('day', timestamp)")],
+        unique=True,
+        postgresql_where=sa.text('idempotency_key IS NOT NULL'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    drop_index_concurrently('uq_metrics_idempotency_key_day', 'metrics')
+    set_lock_timeout()
+    op.drop_column('metrics', 'idempotency_key')
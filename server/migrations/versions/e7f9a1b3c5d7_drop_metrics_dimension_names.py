@@ -0,0 +1,113 @@
+"""drop metrics dimension names
+
+Contract step of f6b8d0a2c4e5: drops the text event_type, device and
+location columns, their indexes and the trigger that kept them in sync with
+the id columns. Run it only once no process of the previous application
+version, which still writes the text columns, is left.
+
+Revision ID: e7f9a1b3c5d7
+Revises: d2e4f6a8b0c1
+Create Date: 2026-10-20 09:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+from app.utils.online_migrations import (
+    add_column,
+    backfill_in_batches,
+    create_index_concurrently,
+    drop_index_concurrently,
+    log_relation_sizes,
+    set_lock_timeout,
+)
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7f9a1b3c5d7'
+down_revision: Union[str, Sequence[str], None] = 'd2e4f6a8b0c1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (metrics text column, dictionary table, metrics id column).
+DIMENSIONS = [
+    ('event_type', 'event_types', 'event_type_id'),
+    ('device', 'devices', 'device_id'),
+    ('location', 'locations', 'location_id'),
+]
+
+# Indexes on the text columns: (name, columns).
+TEXT_INDEXES = [
+    ('ix_metrics_event_type_timestamp', ['event_type', 'timestamp']),
+    ('ix_metrics_event_type', ['event_type']),
+    ('ix_metrics_device', ['device']),
+    ('ix_metrics_location', ['location']),
+]
+
+# The trigger as created by f6b8d0a2c4e5, recreated on downgrade.
+ENCODE_FUNCTION = """
+CREATE OR REPLACE FUNCTION metrics_encode_dimensions() RETURNS trigger AS $$
+BEGIN
+{body}
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+"""
+ENCODE_COLUMN = """
+    IF NEW.{id_column} IS NULL AND NEW.{column} IS NOT NULL THEN
+        INSERT INTO {table} (name) VALUES (NEW.{column}) ON CONFLICT DO NOTHING;
+        SELECT id INTO NEW.{id_column} FROM {table} WHERE name = NEW.{column};
+    ELSIF NEW.{column} IS NULL AND NEW.{id_column} IS NOT NULL THEN
+        SELECT name INTO NEW.{column} FROM {table} WHERE id = NEW.{id_column};
+    END IF;"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    log_relation_sizes('metrics', 'before')
+    for index, _ in TEXT_INDEXES:
+        drop_index_concurrently(index, 'metrics')
+
+    # IF EXISTS: databases that ran f6b8d0a2c4e5 before it was split into
+    # expand and contract steps have already dropped these.
+    # Dropping a column only touches the catalog; its heap space is reused
+    # as rows are updated, or reclaimed at once by VACUUM FULL / pg_repack.
+    set_lock_timeout()
+    op.execute('DROP TRIGGER IF EXISTS metrics_encode_dimensions ON metrics')
+    op.execute('DROP FUNCTION IF EXISTS metrics_encode_dimensions()')
+    for column, _, _ in DIMENSIONS:
+        op.execute(f'ALTER TABLE metrics DROP COLUMN IF EXISTS {column}')
+    log_relation_sizes('metrics', 'after')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for column, _, _ in DIMENSIONS:
+        add_column('metrics', sa.Column(column, sa.String(length=50), nullable=True))
+
+    set_lock_timeout()
+    op.execute(
+        ENCODE_FUNCTION.format(
+            body=''.join(
+                ENCODE_COLUMN.format(column=column, table=table, id_column=id_column)
+                for column, table, id_column in DIMENSIONS
+            )
+        )
+    )
+    op.execute(
+        'CREATE TRIGGER metrics_encode_dimensions BEFORE INSERT ON metrics '
+        'FOR EACH ROW EXECUTE FUNCTION metrics_encode_dimensions()'
+    )
+
+    backfill_in_batches(
+        'metrics',
+        ', '.join(
+            f'{column} = (SELECT name FROM {table} WHERE id = metrics.{id_column})'
+            for column, table, id_column in DIMENSIONS
+        ),
+        'event_type IS NULL',
+    )
+    for index, columns in TEXT_INDEXES:
+        create_index_concurrently(index, 'metrics', columns)
@@ -0,0 +1,187 @@
+"""dictionary-encode metrics dimensions
+
+Expand step: adds the id columns next to the text columns and keeps both
+filled, so the previous and the new application version can write side by
+side. The text columns are dropped by e7f9a1b3c5d7 once every process runs
+the new version.
+
+Revision ID: f6b8d0a2c4e5
+Revises: e5a7c9b1d3f4
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+from app.utils.online_migrations import (
+    add_column,
+    add_foreign_key,
+    backfill_in_batches,
+    create_index_concurrently,
+    drop_index_concurrently,
+    log_relation_sizes,
+    set_lock_timeout,
+    set_not_null,
+)
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6b8d0a2c4e5'
+down_revision: Union[str, Sequence[str], None] = 'e5a7c9b1d3f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (metrics text column, dictionary table, metrics id column, known values).
+# Known values are inserted first so the common ids match across databases.
+DIMENSIONS = [
+    (
+        'event_type',
+        'event_types',
+        'event_type_id',
+        ['page_view', 'user_login', 'new_registration'],
+    ),
+    (
+        'device',
+        'devices',
+        'device_id',
+        ['Windows', 'Mac', 'iOS', 'Android', 'Linux', 'Other'],
+    ),
+    (
+        'location',
+        'locations',
+        'location_id',
+        ['United States', 'Canada', 'Mexico', 'Other'],
+    ),
+]
+
+# Fills ids from names for rows written by the previous application version,
+# and names from ids for rows written by the new one, until the text columns
+# are dropped.
+ENCODE_FUNCTION = """
+CREATE OR REPLACE FUNCTION metrics_encode_dimensions() RETURNS trigger AS $$
+BEGIN
+{body}
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+"""
+ENCODE_COLUMN = """
+    IF NEW.{id_column} IS NULL AND NEW.{column} IS NOT NULL THEN
+        INSERT INTO {table} (name) VALUES (NEW.{column}) ON CONFLICT DO NOTHING;
+        SELECT id INTO NEW.{id_column} FROM {table} WHERE name = NEW.{column};
+    ELSIF NEW.{column} IS NULL AND NEW.{id_column} IS NOT NULL THEN
+        SELECT name INTO NEW.{column} FROM {table} WHERE id = NEW.{id_column};
+    END IF;"""
+
+# Distinct values through the existing per-column index, one index probe
+# per value instead of a scan of metrics.
+DISTINCT_VALUES = """
+INSERT INTO {table} (name)
+WITH RECURSIVE v AS (
+    SELECT min({column}) AS name FROM metrics
+    UNION ALL
+    SELECT (SELECT min({column}) FROM metrics WHERE {column} > v.name)
+    FROM v WHERE v.name IS NOT NULL
+)
+SELECT name FROM v WHERE name IS NOT NULL
+ON CONFLICT (name) DO NOTHING
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    log_relation_sizes('metrics', 'before')
+    for column, table, id_column, known in DIMENSIONS:
+        op.create_table(
+            table,
+            sa.Column('id', sa.SmallInteger(), sa.Identity(), nullable=False),
+            sa.Column('name', sa.String(length=50), nullable=False),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('name'),
+        )
+        op.bulk_insert(
+            sa.table(table, sa.column('name', sa.String)),
+            [{'name': name} for name in known],
+        )
+        op.execute(DISTINCT_VALUES.format(table=table, column=column))
+    # After the scans above, which must not run under the ALTER's lock.
+    for _, _, id_column, _ in DIMENSIONS:
+        add_column('metrics', sa.Column(id_column, sa.SmallInteger(), nullable=True))
+
+    set_lock_timeout()
+    op.execute(
+        ENCODE_FUNCTION.format(
+            body=''.join(
+                ENCODE_COLUMN.format(column=column, table=table, id_column=id_column)
+                for column, table, id_column, _ in DIMENSIONS
+            )
+        )
+    )
+    op.execute(
+        'CREATE TRIGGER metrics_encode_dimensions BEFORE INSERT ON metrics '
+        'FOR EACH ROW EXECUTE FUNCTION metrics_encode_dimensions()'
+    )
+    # Names first written between the scans above and the trigger would be
+    # left with NULL ids. CREATE TRIGGER waited for inserts in flight, so
+    # from here on every name is in a table or gets its id from the trigger.
+    for column, table, _, _ in DIMENSIONS:
+        op.execute(DISTINCT_VALUES.format(table=table, column=column))
+
+    backfill_in_batches(
+        'metrics',
+        ', '.join(
+            f'{id_column} = (SELECT id FROM {table} WHERE name = metrics.{column})'
+            for column, table, id_column, _ in DIMENSIONS
+        ),
+        'event_type_id IS NULL',
+    )
+    for _, table, id_column, _ in DIMENSIONS:
+        add_foreign_key(
+            f'metrics_{id_column}_fkey', 'metrics', table, [id_column], ['id']
+        )
+    set_not_null('metrics', 'event_type_id')
+
+    create_index_concurrently(
+        'ix_metrics_event_type_id_timestamp', 'metrics', ['event_type_id', 'timestamp']
+    )
+    create_index_concurrently('ix_metrics_device_id', 'metrics', ['device_id'])
+    create_index_concurrently('ix_metrics_location_id', 'metrics', ['location_id'])
+
+    # The new application version writes only the ids; the trigger fills
+    # the names. The text columns, their indexes and the trigger stay for
+    # the previous version until e7f9a1b3c5d7.
+    set_lock_timeout()
+    op.alter_column(
+        'metrics', 'event_type', existing_type=sa.String(length=50), nullable=True
+    )
+    log_relation_sizes('metrics', 'after')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Rows the trigger did not cover, e.g. inserted with an unknown id.
+    backfill_in_batches(
+        'metrics',
+        ', '.join(
+            f'{column} = (SELECT name FROM {table} WHERE id = metrics.{id_column})'
+            for column, table, id_column, _ in DIMENSIONS
+        ),
+        'event_type IS NULL',
+    )
+    set_not_null('metrics', 'event_type')
+
+    for index in (
+        'ix_metrics_event_type_id_timestamp',
+        'ix_metrics_device_id',
+        'ix_metrics_location_id',
+    ):
+        drop_index_concurrently(index, 'metrics')
+
+    set_lock_timeout()
+    op.execute('DROP TRIGGER metrics_encode_dimensions ON metrics')
+    op.execute('DROP FUNCTION metrics_encode_dimensions()')
+    for column, table, id_column, _ in DIMENSIONS:
+        op.drop_column('metrics', id_column)
+        op.drop_table(table)